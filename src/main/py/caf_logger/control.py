@@ -0,0 +1,192 @@
+import logging
+import os
+import sys
+import threading
+import traceback
+
+from caf_logger import sampling
+
+DEFAULT_WATCH_INTERVAL = 0.0
+ROOT_LOGGER_NAME = "root"
+CONTROLLED_LOGGER_NAMES = (ROOT_LOGGER_NAME, "WHI", "MDAL")
+
+_control_lock = threading.RLock()
+_watcher = None
+
+
+def _logger(name):
+    return logging.getLogger(None if name == ROOT_LOGGER_NAME else name)
+
+
+def _level_number(level):
+    if isinstance(level, int):
+        return level
+    number = logging.getLevelName(str(level).upper())
+    if not isinstance(number, int):
+        raise ValueError("Unknown level {}".format(level))
+    return number
+
+
+def _level_key_name(key):
+    return logging.getLevelName(key) if isinstance(key, int) else key
+
+
+def _format_rate(rate, burst):
+    return "{:g}/{:g}".format(rate, burst) if burst is not None else "{:g}".format(rate)
+
+
+def _named_handlers():
+    handlers = {}
+    loggers = [logging.getLogger()] + [logger for logger in list(logging.Logger.manager.loggerDict.values())
+                                       if isinstance(logger, logging.Logger)]
+    pending = [handler for logger in loggers for handler in logger.handlers]
+    while pending:
+        handler = pending.pop()
+        if handler.get_name():
+            handlers.setdefault(handler.get_name(), handler)
+        # the handlers behind the queue used in asynchronous mode
+        pending.extend(getattr(handler, 'handlers', ()))
+    return handlers
+
+
+def get_state():
+    levels = {name: logging.getLevelName(_logger(name).level) for name in CONTROLLED_LOGGER_NAMES}
+    for name, logger in list(logging.Logger.manager.loggerDict.items()):
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(logger.level)
+    rules = sampling.current_rules()
+    return {
+        'levels': levels,
+        'handler_levels': {name: logging.getLevelName(handler.level) for name, handler in _named_handlers().items()},
+        'disabled_codes': sorted(rules.disabled),
+        'sampling_ratios': {_level_key_name(key): ratio for key, ratio in rules.ratios.items()},
+        'rate_limits': {_level_key_name(key): _format_rate(*limit) for key, limit in rules.rate_limits.items()},
+    }
+
+
+def apply(levels=None, handler_levels=None, disabled_codes=None, sampling_ratios=None, rate_limits=None):
+    # Everything is validated before anything is changed, so a bad value leaves the current settings untouched.
+    # Levels go through Logger.setLevel, which clears the cached enabled checks of all loggers.
+    with _control_lock:
+        new_levels = {name: _level_number(level) for name, level in (levels or {}).items()}
+        handlers = _named_handlers()
+        new_handler_levels = {}
+        for name, level in (handler_levels or {}).items():
+            if name not in handlers:
+                raise ValueError("Unknown handler {}".format(name))
+            new_handler_levels[handlers[name]] = _level_number(level)
+        current = sampling.current_rules()
+        rules = sampling.SamplingRules(
+            current.ratios if sampling_ratios is None else sampling_ratios,
+            current.rate_limits if rate_limits is None else rate_limits,
+            current.summary_interval,
+            current.disabled if disabled_codes is None else disabled_codes)
+
+        for handler, level in new_handler_levels.items():
+            handler.setLevel(level)
+        for name, level in new_levels.items():
+            _logger(name).setLevel(level)
+        # the rules go last, once they are visible the levels of the same change are as well
+        if disabled_codes is not None or sampling_ratios is not None or rate_limits is not None:
+            sampling.set_rules(rules.ratios, rules.rate_limits, rules.summary_interval, rules.disabled)
+        return get_state()
+
+
+def set_level(logger_name, level):
+    return apply(levels={logger_name: level})
+
+
+def set_code_enabled(log_id, enabled):
+    with _control_lock:
+        disabled = set(sampling.current_rules().disabled)
+        if enabled:
+            disabled.discard(log_id)
+        else:
+            disabled.add(log_id)
+        return apply(disabled_codes=disabled)
+
+
+def read_config_file(config_file):
+    # the runtime controllable settings of an INI logging configuration file, as keyword arguments of apply()
+    import configparser
+    config = configparser.ConfigParser(interpolation=None)
+    if not config.read(config_file):
+        raise ValueError("Cannot read {}".format(config_file))
+    levels = {}
+    for section in config.sections():
+        if section.startswith("logger_") and config.has_option(section, "level"):
+            name = config.get(section, "qualname", fallback=ROOT_LOGGER_NAME if section == "logger_root" else None)
+            if name:
+                levels[name] = config.get(section, "level")
+    handler_levels = {section[len("handler_"):]: config.get(section, "level") for section in config.sections()
+                      if section.startswith("handler_") and config.has_option(section, "level")}
+    caf = config["caf"] if config.has_section("caf") else {}
+    return {
+        'levels': levels,
+        'handler_levels': handler_levels,
+        'disabled_codes': sampling.parse_codes(caf.get('disabled_codes', '')),
+        'sampling_ratios': sampling.parse_spec(caf.get('sampling', '')),
+        'rate_limits': sampling.parse_spec(caf.get('rate_limit', '')),
+    }
+
+
+class ConfigFileWatcher:
+    # Polls the modification time of the configuration file and applies its levels, disabled codes and sampling
+    # settings when it changes. Handlers and formatters are not reloaded.
+
+    def __init__(self, config_file, interval):
+        self.config_file = config_file
+        self.interval = interval
+        self._stop = threading.Event()
+        self._mtime = self._modification_time()
+        self._thread = threading.Thread(target=self._watch, name="CAFConfigFileWatcher", daemon=True)
+        self._thread.start()
+
+    def _modification_time(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            mtime = self._modification_time()
+            if mtime is not None and mtime != self._mtime:
+                self._mtime = mtime
+                self.reload()
+
+    def reload(self):
+        try:
+            apply(**read_config_file(self.config_file))
+        except Exception:
+            print("Failed to apply logging configuration changes from {}".format(self.config_file))
+            traceback.print_exc(file=sys.stdout)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+def watch_config_file(config_file, interval):
+    global _watcher
+    with _control_lock:
+        stop_watching()
+        _watcher = ConfigFileWatcher(config_file, interval)
+        return _watcher
+
+
+def stop_watching():
+    global _watcher
+    with _control_lock:
+        if _watcher is not None:
+            _watcher.stop()
+            _watcher = None
+
+
+def configure(caf_options, config_file=None):
+    stop_watching()
+    interval = float(os.getenv('WHI_CAF_LOGGING_WATCH_INTERVAL',
+                               caf_options.get('watch_interval', DEFAULT_WATCH_INTERVAL)))
+    if interval > 0 and config_file is not None:
+        watch_config_file(config_file, interval)
@@ -0,0 +1,173 @@
+import atexit
+import collections
+import logging
+import threading
+import time
+import weakref
+
+from caf_logger import lazy
+from caf_logger import logging_codes
+
+DEFAULT_WINDOW = 0.0
+DEFAULT_MAX_ENTRIES = 1024
+
+_SUMMARY_FLAG = '_caf_dedup_summary'
+_VALUE_TYPES = frozenset((str, bytes, int, float, bool, type(None)))
+_CONTAINER_TYPES = frozenset((tuple, list, dict, set, frozenset))
+_dedup_filters = weakref.WeakSet()
+
+
+class _Entry:
+    __slots__ = ('record_dict', 'expires', 'started', 'repeated')
+
+    def __init__(self, record, now, window):
+        # the traceback is not kept, it would keep every frame of the first occurrence alive
+        self.record_dict = {key: value for key, value in record.__dict__.items()
+                            if key not in ('exc_info', 'exc_text', 'stack_info', 'created', 'msecs', 'relativeCreated')}
+        self.started = now
+        self.expires = now + window
+        self.repeated = 0
+
+
+class CAFDedupFilter(logging.Filter):
+    # Lets the first of a series of identical records through and drops the repeats that arrive within the window.
+    # When the window closes a single record reports how many were dropped.
+
+    def __init__(self, handler, window, max_entries=DEFAULT_MAX_ENTRIES):
+        super().__init__()
+        if float(window) <= 0:
+            raise ValueError("Dedup window must be positive, got {}".format(window))
+        self.handler = handler
+        self.window = float(window)
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._stop_sweeper = threading.Event()
+        threading.Thread(target=_sweep_periodically, args=(weakref.ref(self), self._stop_sweeper, self.window),
+                         name="CAFDedupSweeper", daemon=True).start()
+        _dedup_filters.add(self)
+
+    def filter(self, record):
+        if getattr(record, _SUMMARY_FLAG, False):
+            return True
+        try:
+            key = _record_key(record)
+        except _NoKey:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            expired = self._pop_expired(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.repeated += 1
+            else:
+                if len(self._entries) >= self.max_entries:
+                    expired.append(self._entries.popitem(last=False)[1])
+                self._entries[key] = _Entry(record, now, self.window)
+        self._emit_summaries(expired, now)
+        return entry is None
+
+    def _pop_expired(self, now):
+        # entries are kept in insertion order and share the same window, so the expired ones are at the front
+        expired = []
+        entries = self._entries
+        while entries:
+            entry = next(iter(entries.values()))
+            if entry.expires > now:
+                break
+            expired.append(entries.popitem(last=False)[1])
+        return expired
+
+    def _emit_summaries(self, entries, now):
+        for entry in entries:
+            if entry.repeated:
+                self.handler.handle(_summary_record(entry, now))
+
+    def flush(self, expired_only=False):
+        now = time.monotonic()
+        with self._lock:
+            if expired_only:
+                entries = self._pop_expired(now)
+            else:
+                entries = list(self._entries.values())
+                self._entries.clear()
+        self._emit_summaries(entries, now)
+
+    def close(self):
+        self._stop_sweeper.set()
+        self.flush()
+
+
+class _NoKey(Exception):
+    pass
+
+
+def _arg_key(arg):
+    # Strings and numbers are their own key. Exceptions and plain containers are keyed by their repr, so a new but equal
+    # exception is a repeat while a reused list or event_info that was changed in between is not. Other values are keyed
+    # by how the message renders them. A lazy value that was not computed yet has no cheap key, the record is then not
+    # collapsed; the event_info of an MDAL event is keyed without bounding or serializing it.
+    arg_type = type(arg)
+    if arg_type in _VALUE_TYPES:
+        return arg
+    if isinstance(arg, lazy.LazyValue):
+        if arg._resolved:
+            return _arg_key(arg._value)
+        if arg_type is lazy.LazyValue or callable(arg._func):
+            raise _NoKey()
+        return _arg_key(arg._func)
+    if arg_type in _CONTAINER_TYPES or isinstance(arg, BaseException):
+        return arg_type, repr(arg)
+    return arg_type, str(arg)
+
+
+def _record_key(record):
+    exc_info = record.exc_info
+    args = record.args
+    if isinstance(args, tuple):
+        args = tuple(map(_arg_key, args))
+    else:
+        args = _arg_key(args)
+    return (record.name, record.levelno, getattr(record, 'log_id', None), getattr(record, 'corr_id', None),
+            record.msg if isinstance(record.msg, str) else str(record.msg), args,
+            _arg_key(getattr(record, 'event', None)), repr(exc_info[1]) if exc_info else None)
+
+
+def _summary_record(entry, now):
+    record = logging.makeLogRecord(entry.record_dict)
+    log_id, msg = logging_codes.WHI_CAF_LOGGER_REPEATED
+    record.args = (record.getMessage(), getattr(record, 'log_id', None), entry.repeated,
+                   int(round(now - entry.started)))
+    # the rendered message already holds the event of a text mode MDAL record
+    record.__dict__.pop('event', None)
+    record.msg = msg
+    record.log_id = log_id
+    setattr(record, _SUMMARY_FLAG, True)
+    return record
+
+
+def _sweep_periodically(filter_ref, stop, interval):
+    while not stop.wait(interval):
+        dedup_filter = filter_ref()
+        if dedup_filter is None:
+            return
+        try:
+            dedup_filter.flush(expired_only=True)
+        except Exception:
+            # reported by the handler, keep sweeping
+            pass
+        del dedup_filter
+
+
+def install_dedup_filter(handler, window, max_entries=DEFAULT_MAX_ENTRIES):
+    dedup_filter = CAFDedupFilter(handler, window, max_entries)
+    handler.addFilter(dedup_filter)
+    return dedup_filter
+
+
+def flush_all():
+    for dedup_filter in list(_dedup_filters):
+        dedup_filter.flush()
+
+
+atexit.register(flush_all)
@@ -0,0 +1,71 @@
+import json
+
+from caf_logger import payload
+
+
+class LazyValue:
+    # A value that is computed when a handler formats the record rather than when it is logged, so records that are
+    # disabled or filtered never compute it. Callables passed as message args or as MDAL event_info are wrapped in it.
+    __slots__ = ('_func', '_value', '_resolved')
+
+    def __init__(self, func):
+        self._func = func
+        self._value = None
+        self._resolved = False
+
+    def resolve(self):
+        if not self._resolved:
+            self._value = self._func()
+            self._func = None
+            self._resolved = True
+        return self._value
+
+    def __format__(self, format_spec):
+        return format(self.resolve(), format_spec)
+
+    def __str__(self):
+        return str(self.resolve())
+
+    def __repr__(self):
+        return repr(self.resolve())
+
+
+class LazyEvent(LazyValue):
+    # The event_info of an MDAL record, bounded by the payload limits of caf_logger.payload when the record is
+    # formatted. A callable event_info is called first.
+    __slots__ = ()
+
+    def resolve(self):
+        if not self._resolved:
+            event_info = self._func() if callable(self._func) else self._func
+            self._value = payload.bound(event_info)
+            self._func = None
+            self._resolved = True
+        return self._value
+
+
+class LazyJson(LazyEvent):
+    # The event_info of a text mode MDAL record, serialized after the message when the message is rendered.
+    __slots__ = ('_text',)
+
+    def __init__(self, event_info):
+        super().__init__(event_info)
+        self._text = None
+
+    def __format__(self, format_spec):
+        if self._text is None:
+            event_info = self.resolve()
+            self._text = ' {}'.format(json.dumps(event_info)) if event_info else ''
+        return self._text
+
+    def __str__(self):
+        return self.__format__('')
+
+
+def lazy_args(args):
+    # classes are callable too, but are logged as they are
+    return tuple(LazyValue(arg) if callable(arg) and not isinstance(arg, type) else arg for arg in args)
+
+
+def resolve(value):
+    return value.resolve() if isinstance(value, LazyValue) else value
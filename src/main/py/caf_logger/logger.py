@@ -1,21 +1,32 @@
-import json
+import collections.abc
 import os
 import os.path
 import logging
-import logging.config
+import threading
 import traceback
 from caf_logger import logging_codes
+from caf_logger import logging_config
 from caf_logger.level_type import LevelType
 from caf_logger.mdal import corrid_store
 import sys
 
 _ENABLED_JSON_FORMAT = os.getenv('WHI_CAF_LOGGING_DEFAULT_FORMAT', 'Text') == 'Json'
 
+# The subsystems used while logging are imported by configure(), which runs before the first logger is returned, the
+# others by the _configure_* function of their option when it is enabled. Importing this module stays cheap.
+lazy = None
+message_template = None
+sampling = None
+
 class CAFLogger:
     def __init__(self, logger):
         self.logger = logger
+        self._is_enabled_for = logger.isEnabledFor
+        self._log = logger._log
 
     def _internal_error(self, level, msg_template):
+        from caf_logger import metrics
+        metrics.count_internal_error()
         try:
             log_id, msg = logging_codes.WHI_CAF_LOGGER_BAD_ARGUMENTS
             extra = {'log_id': log_id, 'corr_id': corrid_store.get_corr_id()}
@@ -25,38 +36,60 @@ class CAFLogger:
             traceback.print_exc(file=sys.stdout)
 
     def _log_at_level(self, level, msg_template, *args, level_type=LevelType.LEVEL1, exc_info=None):
-        logger_method = self.logger.info
         normalized_level = level.upper()
-        if normalized_level == "INFO":
-            logger_method = self.logger.info
-        elif normalized_level == "WARNING":
-            logger_method = self.logger.warning
-        elif normalized_level == "ERROR":
-            logger_method = self.logger.error
-        elif normalized_level == "APM":
-            logger_method = self.logger.apm
+        levelno = _LEVEL_NUMS.get(normalized_level, logging.INFO)
+        if self._is_enabled_for(levelno):
+            self._log_enabled(levelno, normalized_level, msg_template, args, level_type, exc_info)
 
+    def _log_enabled(self, levelno, level, msg_template, args, level_type, exc_info):
+        # Only reached once the level is known to be enabled, so the context vars are read and
+        # the extra dict is allocated only for records that are actually emitted.
         try:
             log_id, msg = msg_template
-            extra = {'log_id': log_id, 'corr_id': corrid_store.get_corr_id(), 'security_level': level_type.value}
+            if not sampling.allow(log_id, levelno):
+                return
             if args:
-                logger_method(msg, *args, extra=extra, exc_info=exc_info)
-            else:
-                logger_method(msg, extra=extra, exc_info=exc_info)
+                _check_template(self.logger, level, log_id, msg, args)
+                if any(map(callable, args)):
+                    args = lazy.lazy_args(args)
+            extra = {'log_id': log_id, 'corr_id': corrid_store.get_corr_id(), 'security_level': level_type.value}
+            self._log(levelno, msg, args, extra=extra, exc_info=exc_info)
         except BaseException:
-            self._internal_error(normalized_level, msg_template)
+            self._internal_error(level, msg_template)
 
     def info(self, msg_template, *args, level_type=LevelType.LEVEL1, exc_info=None):
-        self._log_at_level("INFO", msg_template, *args, level_type=level_type, exc_info=exc_info)
+        if self._is_enabled_for(logging.INFO):
+            self._log_enabled(logging.INFO, "INFO", msg_template, args, level_type, exc_info)
 
     def warn(self, msg_template, *args, level_type=LevelType.LEVEL1, exc_info=None):
-        self._log_at_level("WARNING", msg_template, *args, level_type=level_type, exc_info=exc_info)
+        if self._is_enabled_for(logging.WARNING):
+            self._log_enabled(logging.WARNING, "WARNING", msg_template, args, level_type, exc_info)
 
     def error(self, msg_template, *args, level_type=LevelType.LEVEL1, exc_info=None):
-        self._log_at_level("ERROR", msg_template, *args, level_type=level_type, exc_info=exc_info)
+        if self._is_enabled_for(logging.ERROR):
+            self._log_enabled(logging.ERROR, "ERROR", msg_template, args, level_type, exc_info)
 
     def apm(self, msg_template, *args, level_type=LevelType.LEVEL1):
-        self._log_at_level("APM", msg_template, *args, level_type=level_type, exc_info=None)
+        if self._is_enabled_for(APM_LEVEL_NUM):
+            self._log_enabled(APM_LEVEL_NUM, APM_LEVEL_NAME, msg_template, args, level_type, None)
+
+    # The awaitable variants log like the methods above, in the calling task so corrid_store values are kept, and
+    # then wait for the asyncio handlers of the running loop to drain, see caf_logger.logging_asyncio.
+    async def ainfo(self, msg_template, *args, level_type=LevelType.LEVEL1, exc_info=None):
+        self.info(msg_template, *args, level_type=level_type, exc_info=exc_info)
+        await _drain_asyncio_handlers()
+
+    async def awarn(self, msg_template, *args, level_type=LevelType.LEVEL1, exc_info=None):
+        self.warn(msg_template, *args, level_type=level_type, exc_info=exc_info)
+        await _drain_asyncio_handlers()
+
+    async def aerror(self, msg_template, *args, level_type=LevelType.LEVEL1, exc_info=None):
+        self.error(msg_template, *args, level_type=level_type, exc_info=exc_info)
+        await _drain_asyncio_handlers()
+
+    async def aapm(self, msg_template, *args, level_type=LevelType.LEVEL1):
+        self.apm(msg_template, *args, level_type=level_type)
+        await _drain_asyncio_handlers()
 
 
 class CAFActivityLogger():
@@ -64,6 +97,8 @@ class CAFActivityLogger():
         self.logger = logger
 
     def _internal_error(self, level, msg_template):
+        from caf_logger import metrics
+        metrics.count_internal_error()
         try:
             log_id, msg = logging_codes.WHI_CAF_LOGGER_BAD_ARGUMENTS
             extra = {'log_id': log_id, 'corr_id': corrid_store.get_corr_id()}
@@ -81,39 +116,62 @@ class CAFActivityLogger():
     def remove_all_contexts(self):
         corrid_store.remove_all_contexts()
 
+    def scoped_context(self, context):
+        return corrid_store.scoped_context(context)
+
     def log_event(self, msg_template=logging_codes.WHI_CAF_MDAL_MESSAGE, *args, event_info={}):
         try:
-            log_id, msg = msg_template
-            if _ENABLED_JSON_FORMAT:
-                extra = self._collect_extra_info_for_mdal_json_format(log_id, event_info)
-            else:
-                extra = self._collect_extra_info_for_mdal_text_format(log_id)
-                if msg_template==logging_codes.WHI_CAF_MDAL_MESSAGE and event_info:
-                    msg += ' {}'.format(json.dumps(event_info))
-            if args:
-                self.logger.mdal(msg, *args, extra=extra)
-            else:
-                self.logger.mdal(msg, extra=extra)
+            if not self.logger.isEnabledFor(MDAL_LEVEL_NUM) or not sampling.allow(msg_template[0], MDAL_LEVEL_NUM):
+                return
+            msg, args, extra = self._prepare_event(msg_template, args, event_info)
+            self.logger.mdal(msg, *args, extra=extra)
         except BaseException:
             self._internal_error("MDAL", msg_template)
 
-    def _collect_extra_info_for_mdal_text_format(self, log_id):
-        current_context = corrid_store.get_current_context()
-        if len(current_context):
-            corr_id = "{}/{}".format(corrid_store.get_corr_id(), '|'.join(current_context))
+    def log_events(self, events, msg_template=logging_codes.WHI_CAF_MDAL_MESSAGE):
+        with self.batch() as batch:
+            batch.log_events(events, msg_template)
+
+    async def alog_event(self, msg_template=logging_codes.WHI_CAF_MDAL_MESSAGE, *args, event_info={}):
+        self.log_event(msg_template, *args, event_info=event_info)
+        await _drain_asyncio_handlers()
+
+    async def alog_events(self, events, msg_template=logging_codes.WHI_CAF_MDAL_MESSAGE):
+        self.log_events(events, msg_template)
+        await _drain_asyncio_handlers()
+
+    def batch(self):
+        return _MDALEventBatch(self)
+
+    def _prepare_event(self, msg_template, args, event_info, text_extra=None):
+        # event_info is serialized by the formatter, so disabled or filtered records never serialize it. It can also
+        # be a callable that returns the event_info, called only when the record is formatted.
+        log_id, msg = msg_template
+        if args:
+            _check_template(self.logger, "MDAL", log_id, msg, args)
+            if any(map(callable, args)):
+                args = lazy.lazy_args(args)
+        if _ENABLED_JSON_FORMAT:
+            extra = self._collect_extra_info_for_mdal_json_format(log_id, event_info)
         else:
-            corr_id = corrid_store.get_corr_id()
-        log_attribute = ','.join(corrid_store.get_attrs())
-        return {'log_id': log_id, 'corr_id': corr_id, 'log_attribute': log_attribute}
+            extra = text_extra if text_extra is not None else self._collect_extra_info_for_mdal_text_format(log_id)
+            if msg_template==logging_codes.WHI_CAF_MDAL_MESSAGE and event_info:
+                # the record carries the event, LogRecord.getMessage appends it to the message as ' <json>'
+                if extra is text_extra:
+                    extra = dict(text_extra)
+                extra['event'] = lazy.LazyJson(event_info)
+        return msg, args, extra
+
+    def _collect_extra_info_for_mdal_text_format(self, log_id):
+        return {'log_id': log_id, 'corr_id': corrid_store.get_rendered_corr_id(),
+                'log_attribute': corrid_store.get_rendered_attrs()}
 
     def _collect_extra_info_for_mdal_json_format(self, log_id, event_info):
-        current_context = corrid_store.get_current_context()
-        extra = {'log_id': log_id, 'corr_id': corrid_store.get_corr_id(), 'WHI-CONTEXT': '|'.join(current_context)}
+        extra = {'log_id': log_id, 'corr_id': corrid_store.get_corr_id(),
+                 'WHI-CONTEXT': corrid_store.get_rendered_context()}
         if event_info is not None:
-            extra['event'] = event_info
-        for attr in corrid_store.get_attrs():
-            splitted_attr = attr.split(':', 1)
-            extra[splitted_attr[0]] = splitted_attr[1]
+            extra['event'] = lazy.LazyEvent(event_info)
+        extra.update(corrid_store.get_attr_map())
         return extra
 
     def add_attribute(self, attr_name, attr_value):
@@ -134,30 +192,130 @@ class CAFActivityLogger():
         return corrid_store.get_current_context()
 
     def add_global_attribute(self, attr_name, attr_value):
-        corrid_store.add_attr("{}:{}".format(attr_name, attr_value))
+        corrid_store.set_attr(attr_name, str(attr_value))
 
     def get_current_global_attributes(self):
         return corrid_store.get_attrs()
 
 
+class _MDALEventBatch:
+    # Collects MDAL event records and hands them to the handlers together when flushed, so stream
+    # handlers write the whole batch at once. The output is the same as for individual log_event calls.
+    def __init__(self, activity_logger):
+        self._activity_logger = activity_logger
+        self._logger = activity_logger.logger
+        self._records = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.flush()
+
+    def log_event(self, msg_template=logging_codes.WHI_CAF_MDAL_MESSAGE, *args, event_info={}):
+        if self._logger.isEnabledFor(MDAL_LEVEL_NUM):
+            self._add_record(msg_template, args, event_info, None)
+
+    def log_events(self, events, msg_template=logging_codes.WHI_CAF_MDAL_MESSAGE):
+        if not self._logger.isEnabledFor(MDAL_LEVEL_NUM):
+            return
+        try:
+            log_id, _ = msg_template
+        except BaseException:
+            self._activity_logger._internal_error("MDAL", msg_template)
+            return
+        # the MDAL context cannot change while the events are collected, so text mode reads it once
+        text_extra = None
+        if not _ENABLED_JSON_FORMAT:
+            text_extra = self._activity_logger._collect_extra_info_for_mdal_text_format(log_id)
+        for event_info in events:
+            self._add_record(msg_template, (), event_info, text_extra)
+
+    def _add_record(self, msg_template, args, event_info, text_extra):
+        try:
+            if not sampling.allow(msg_template[0], MDAL_LEVEL_NUM):
+                return
+            msg, args, extra = self._activity_logger._prepare_event(msg_template, args, event_info, text_extra)
+            fn, lno, func = _mdal_caller or _find_mdal_caller()
+            self._records.append(self._logger.makeRecord(self._logger.name, MDAL_LEVEL_NUM, fn, lno, msg, args, None,
+                                                         func, extra, None))
+        except BaseException:
+            self._activity_logger._internal_error("MDAL", msg_template)
+
+    def flush(self):
+        records, self._records = self._records, []
+        if records:
+            from caf_logger import logging_handler
+            logging_handler.call_handlers_batch(self._logger, records)
+
+
 class LogRecord(logging.LogRecord):
     def getMessage(self):
-        if self.name.startswith('WHI') or self.name.startswith('MDAL'):
-            msg = self.msg
-            if self.args:
-                if isinstance(self.args, dict):
-                    msg = msg.format(**self.args)
-                else:
-                    msg = msg.format(*self.args)
-            return msg
-        else:
-            msg = self.msg
-            if self.args:
-                msg = msg % self.args
+        message = self._render_message()
+        # the event of a text mode MDAL record, the JSON formatter writes the event of a JSON mode record as a field
+        event = self.__dict__.get('event')
+        if event is not None and type(event) is lazy.LazyJson:
+            return message + format(event)
+        return message
+
+    def _render_message(self):
+        msg = self.msg
+        args = self.args
+        if not args:
             return msg
+        brace_style = _brace_style_loggers.get(self.name)
+        if brace_style is None:
+            brace_style = _brace_style_loggers[self.name] = self.name.startswith(CAF_LOGGER_NAMES)
+        if not brace_style:
+            return msg % args
+        # str.format is the fastest renderer for templates that were validated on first use, the
+        # compiled template only renders the ones that failed validation.
+        try:
+            if isinstance(args, dict):
+                return msg.format(**args)
+            return msg.format(*args)
+        except (IndexError, KeyError, ValueError):
+            if type(msg) is not str:
+                raise
+            return message_template.compile_template(msg).render(args)
+
+
+async def _drain_asyncio_handlers():
+    # imported here, asyncio is not needed by synchronous users of this module
+    from caf_logger import logging_asyncio
+    await logging_asyncio.drain()
+
+
+def _check_template(logger, level, log_id, msg, args):
+    # Template and argument count problems are reported once, when the template is first used with
+    # bad arguments, rather than failing later inside the handler for every record. The checked
+    # log_id, template and argument count combinations are remembered, so each is checked once.
+    if type(msg) is not str:
+        return
+    if len(args) == 1 and isinstance(args[0], collections.abc.Mapping) and args[0]:
+        # logging.LogRecord formats a single mapping argument by name, check what it will be rendered with
+        args = args[0]
+        key = (log_id, msg, None)
+    else:
+        key = (log_id, msg, len(args))
+    if key in _checked_templates:
+        return
+    template = message_template.compile_template(msg)
+    if not template.reported:
+        problem = template.check(args)
+        if problem is not None:
+            template.reported = True
+            bad_log_id, bad_msg = logging_codes.WHI_CAF_LOGGER_BAD_TEMPLATE
+            extra = {'log_id': bad_log_id, 'corr_id': corrid_store.get_corr_id()}
+            logger.error(bad_msg, msg, log_id, level, problem, extra=extra)
+    if len(_checked_templates) >= CHECKED_TEMPLATES_SIZE:
+        _checked_templates.clear()
+    _checked_templates.add(key)
 
 
 def get_logger(logger_name: str):
+    if not _logger_initialized:
+        _initialize_on_first_use()
     if _logger_initialized:
         return CAFLogger(logging.getLogger("WHI." + logger_name))
     else:
@@ -165,20 +323,165 @@ def get_logger(logger_name: str):
 
 
 def get_mdal_logger(logger_name: str):
+    if not _logger_initialized:
+        _initialize_on_first_use()
     if _logger_initialized:
         return CAFActivityLogger(logging.getLogger("MDAL." + logger_name))
     else:
         print("Logger is not initialized, see earlier errors")
 
 
+def configure(config_file: str = None, config: dict = None, json_format: bool = None,
+              disable_existing_loggers: bool = False):
+    # Loads the logging configuration from an INI file (the WHI_CAF_LOGGING_CONFIG file or the packaged default when
+    # neither argument is given) or from a logging.config.dictConfig dictionary whose optional "caf" key holds the
+    # options of the [caf] section. Errors are raised to the caller.
+    global _logging_config_file, _logger_initialized, _ENABLED_JSON_FORMAT
+    # imported here rather than at the top, together they are about a third of the import time of this module
+    import logging.config
+    with _initialization_lock:
+        if json_format is not None:
+            _ENABLED_JSON_FORMAT = json_format
+        _register_levels()
+        _import_subsystems()
+        if config is not None:
+            config = dict(config)
+            caf_options = {key: str(value) for key, value in config.pop(CAF_OPTIONS_SECTION, {}).items()}
+            config.setdefault('disable_existing_loggers', disable_existing_loggers)
+            logging.config.dictConfig(config)
+            watched_file = None
+        else:
+            if config_file is not None:
+                _logging_config_file = config_file
+            _get_logger_config()
+            print("loading logging configuration from: {}".format(_logging_config_file))
+            logging.config.fileConfig(_logging_config_file, disable_existing_loggers=disable_existing_loggers)
+            caf_options = _get_caf_options()
+            watched_file = _logging_config_file
+        caf_options = dict(logging_config.CAF_DEFAULTS, **caf_options)
+        _configure_metrics(caf_options)
+        if not _configure_collector(caf_options):
+            _configure_async_mode(caf_options)
+        _configure_dedup(caf_options)
+        _configure_tracebacks(caf_options)
+        _configure_event_limits(caf_options)
+        sampling.configure(caf_options)
+        _configure_control(caf_options, watched_file)
+        _logger_initialized = True
+
+
+def _initialize_on_first_use():
+    global _initialization_failed
+    with _initialization_lock:
+        if _logger_initialized or _initialization_failed:
+            return
+        try:
+            configure()
+        except Exception:
+            _initialization_failed = True
+            print("Failed to initialize logger")
+            traceback.print_exc(file=sys.stdout)
+
+
+def _import_subsystems():
+    global lazy, message_template, sampling
+    from caf_logger import lazy, message_template, sampling
+
+
+def _register_levels():
+    logging.setLogRecordFactory(LogRecord)
+    logging.addLevelName(APM_LEVEL_NUM, APM_LEVEL_NAME)
+    logging.addLevelName(MDAL_LEVEL_NUM, MDAL_LEVEL_NAME)
+    logging.Logger.apm = _log_apm
+    logging.Logger.mdal = _log_mdal
+
+
 def _get_logger_config():
     global _logging_config_file
-    if not (os.path.exists(_logging_config_file) and os.path.isfile(_logging_config_file)):
+    if not (_logging_config_file and os.path.isfile(_logging_config_file)):
         package_directory = os.path.dirname(os.path.abspath(__file__))
         _logging_config_file = os.path.join(package_directory,
                                             "logging_json.conf" if _ENABLED_JSON_FORMAT else "logging.conf")
 
 
+def _get_caf_options():
+    import configparser
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(_logging_config_file)
+    return dict(config.items(CAF_OPTIONS_SECTION)) if config.has_section(CAF_OPTIONS_SECTION) else {}
+
+
+def _configure_metrics(caf_options):
+    if os.getenv('WHI_CAF_LOGGING_METRICS', caf_options['metrics']).lower() != 'true':
+        return
+    from caf_logger import metrics
+    for logger_name in CAF_LOGGER_NAMES:
+        for handler in logging.getLogger(logger_name).handlers:
+            metrics.instrument_handler(handler)
+
+
+def _configure_collector(caf_options):
+    address = os.getenv('WHI_CAF_LOGGING_COLLECTOR_ADDRESS', caf_options['collector_address'])
+    if not address:
+        return False
+    from caf_logger import multiprocess
+    if multiprocess.is_collector():
+        return False
+    batch_size = int(os.getenv('WHI_CAF_LOGGING_COLLECTOR_BATCH_SIZE', caf_options['collector_batch_size']))
+    queue_size = int(os.getenv('WHI_CAF_LOGGING_QUEUE_SIZE', caf_options['queue_size']))
+    multiprocess.install_socket_handler([logging.getLogger(name) for name in CAF_LOGGER_NAMES], address,
+                                        batch_size, queue_size)
+    return True
+
+
+def _configure_async_mode(caf_options):
+    async_enabled = os.getenv('WHI_CAF_LOGGING_ASYNC', caf_options['async'])
+    if async_enabled.lower() != 'true':
+        return
+    from caf_logger import logging_handler
+    queue_size = int(os.getenv('WHI_CAF_LOGGING_QUEUE_SIZE', caf_options['queue_size']))
+    overflow_policy = os.getenv('WHI_CAF_LOGGING_OVERFLOW_POLICY', caf_options['overflow_policy'])
+    for logger_name in CAF_LOGGER_NAMES:
+        logging_handler.install_queue_handler(logging.getLogger(logger_name), queue_size, overflow_policy)
+
+
+def _configure_dedup(caf_options):
+    window = float(os.getenv('WHI_CAF_LOGGING_DEDUP_WINDOW', caf_options['dedup_window']))
+    if window <= 0:
+        return
+    from caf_logger import dedup
+    max_entries = int(os.getenv('WHI_CAF_LOGGING_DEDUP_MAX_ENTRIES', caf_options['dedup_max_entries']))
+    for logger_name in CAF_LOGGER_NAMES:
+        for handler in logging.getLogger(logger_name).handlers:
+            dedup.install_dedup_filter(handler, window, max_entries)
+
+
+def _configure_control(caf_options, watched_file):
+    # a configuration file watcher can only be running if caf_logger.control was imported, here or by the application
+    watch_interval = float(os.getenv('WHI_CAF_LOGGING_WATCH_INTERVAL', caf_options['watch_interval']))
+    if watch_interval <= 0 and 'caf_logger.control' not in sys.modules:
+        return
+    from caf_logger import control
+    control.configure(caf_options, watched_file)
+
+
+def _configure_tracebacks(caf_options):
+    from caf_logger import tracebacks
+    cache_size = os.getenv('WHI_CAF_LOGGING_TRACEBACK_CACHE_SIZE', caf_options['traceback_cache_size'])
+    window = os.getenv('WHI_CAF_LOGGING_TRACEBACK_WINDOW', caf_options['traceback_window'])
+    tracebacks.configure(int(cache_size), float(window))
+
+
+def _configure_event_limits(caf_options):
+    from caf_logger import payload
+    payload.configure(
+        max_depth=int(os.getenv('WHI_CAF_LOGGING_EVENT_MAX_DEPTH', caf_options['event_max_depth'])),
+        max_keys=int(os.getenv('WHI_CAF_LOGGING_EVENT_MAX_KEYS', caf_options['event_max_keys'])),
+        max_string_length=int(os.getenv('WHI_CAF_LOGGING_EVENT_MAX_STRING_LENGTH',
+                                        caf_options['event_max_string_length'])),
+        max_size=int(os.getenv('WHI_CAF_LOGGING_EVENT_MAX_SIZE', caf_options['event_max_size'])))
+
+
 def _log_apm(self, message, *args, **kws):
     if self.isEnabledFor(APM_LEVEL_NUM):
         self._log(APM_LEVEL_NUM, message, args, **kws)
@@ -189,23 +492,34 @@ def _log_mdal(self, message, *args, **kws):
         self._log(MDAL_LEVEL_NUM, message, args, **kws)
 
 
+class _CallerProbe(logging.Logger):
+    # keeps the record instead of handling it
+    def handle(self, record):
+        self.record = record
+
+
+def _find_mdal_caller():
+    # The caller log_event records carry, found by logging through _log_mdal like log_event does, for the records of
+    # _MDALEventBatch.
+    global _mdal_caller
+    probe = _CallerProbe("MDAL.caller", MDAL_LEVEL_NUM)
+    _log_mdal(probe, "")
+    _mdal_caller = (probe.record.pathname, probe.record.lineno, probe.record.funcName)
+    return _mdal_caller
+
+
 APM_LEVEL_NUM = 21
 APM_LEVEL_NAME = "APM"
 MDAL_LEVEL_NUM = 22
 MDAL_LEVEL_NAME = "MDAL"
+CAF_LOGGER_NAMES = ("WHI", "MDAL")
+_brace_style_loggers = {}
+CHECKED_TEMPLATES_SIZE = 4096
+_checked_templates = set()
+_mdal_caller = None
+_LEVEL_NUMS = {"INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR, APM_LEVEL_NAME: APM_LEVEL_NUM}
+CAF_OPTIONS_SECTION = "caf"
 _logger_initialized = False
+_initialization_failed = False
+_initialization_lock = threading.RLock()
 _logging_config_file = os.getenv('WHI_CAF_LOGGING_CONFIG', '/var/app/config/caf-logging.cfg')
-
-try:
-    _get_logger_config()
-    print("loading logging configuration from: {}".format(_logging_config_file))
-    logging.config.fileConfig(_logging_config_file)
-    logging.setLogRecordFactory(LogRecord)
-    logging.addLevelName(APM_LEVEL_NUM, APM_LEVEL_NAME)
-    logging.addLevelName(MDAL_LEVEL_NUM, MDAL_LEVEL_NAME)
-    logging.Logger.apm = _log_apm
-    logging.Logger.mdal = _log_mdal
-    _logger_initialized = True
-except Exception:
-    print("Failed to initialize logger")
-    traceback.print_exc(file=sys.stdout)
\ No newline at end of file
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import stat
+import threading
+
+DEFAULT_HIGH_WATER = 65536
+ASYNCIO_LOGGER_NAMES = ("WHI", "MDAL")
+
+_replaced_handlers = []
+
+
+class _WriteProtocol(asyncio.BaseProtocol):
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._paused = False
+        self._waiters = []
+        self.closed = loop.create_future()
+
+    def _wake_waiters(self):
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        self._wake_waiters()
+
+    def connection_lost(self, exc):
+        self._paused = False
+        self._wake_waiters()
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+    async def drain(self):
+        while self._paused:
+            waiter = self._loop.create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+
+def supports_pipe_transport(stream):
+    # pipes and character devices that can be opened again as a separate file description through /proc, so
+    # switching the transport's descriptor to non-blocking mode leaves the original stream (e.g. sys.stdout) alone
+    try:
+        fd = stream.fileno()
+        mode = os.fstat(fd).st_mode
+    except (AttributeError, OSError, ValueError):
+        return False
+    return (stat.S_ISFIFO(mode) or stat.S_ISCHR(mode)) and os.path.exists("/proc/self/fd/{}".format(fd))
+
+
+class _SharedPipe:
+    # The write pipe transport of a file descriptor on an event loop. Handlers writing to the same descriptor, e.g. the
+    # WHI and MDAL handlers writing to stdout, share it, so their records are queued in order in a single buffer rather
+    # than flushed into the pipe by independent transports that could tear each other's lines.
+    __slots__ = ('key', 'loop', 'loop_thread', 'transport', 'protocol', 'users')
+
+    def __init__(self, key, loop, transport, protocol):
+        self.key = key
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self.transport = transport
+        self.protocol = protocol
+        self.users = 0
+
+
+_shared_pipes = {}
+
+
+async def _acquire_pipe(stream, high_water):
+    loop = asyncio.get_running_loop()
+    stream.flush()
+    fd = stream.fileno()
+    key = (fd, loop)
+    shared = _shared_pipes.get(key)
+    if shared is None or shared.transport.is_closing():
+        pipe = open("/proc/self/fd/{}".format(fd), 'wb', buffering=0)
+        try:
+            transport, protocol = await loop.connect_write_pipe(lambda: _WriteProtocol(loop), pipe)
+        except BaseException:
+            pipe.close()
+            raise
+        current = _shared_pipes.get(key)
+        if current is not None and not current.transport.is_closing():
+            # another handler of the descriptor connected while this one was waiting
+            transport.close()
+            shared = current
+        else:
+            transport.set_write_buffer_limits(high=high_water)
+            shared = _shared_pipes[key] = _SharedPipe(key, loop, transport, protocol)
+    shared.users += 1
+    return shared
+
+
+def _release_pipe(shared):
+    # returns True when this was the last handler using the transport, which is then closed
+    shared.users -= 1
+    if shared.users > 0:
+        return False
+    if _shared_pipes.get(shared.key) is shared:
+        del _shared_pipes[shared.key]
+    if not shared.loop.is_closed():
+        shared.transport.close()
+    return True
+
+
+class CAFAsyncioStreamHandler(logging.Handler):
+    # Writes through a write pipe transport of the event loop. emit() hands the formatted record to the transport,
+    # which writes what the pipe accepts without blocking and buffers the rest. Coroutines apply backpressure with
+    # await drain(), which waits while more than high_water bytes are buffered. Handlers of the same file descriptor
+    # share one transport. Until start() and after stop() records are written to the stream directly; records from
+    # other threads are passed to the event loop.
+
+    terminator = '\n'
+
+    def __init__(self, stream, high_water=DEFAULT_HIGH_WATER):
+        super().__init__()
+        self.stream = stream
+        self.high_water = high_water
+        self.encoding = getattr(stream, 'encoding', None) or 'utf-8'
+        self._pipe = None
+
+    async def start(self):
+        self._pipe = await _acquire_pipe(self.stream, self.high_water)
+
+    def _write_blocking(self, msg):
+        self.acquire()
+        try:
+            self.stream.write(msg)
+            self.stream.flush()
+        finally:
+            self.release()
+
+    def _write_from_thread(self, data, msg):
+        pipe = self._pipe
+        if pipe is None or pipe.transport.is_closing():
+            self._write_blocking(msg)
+        else:
+            pipe.transport.write(data)
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            pipe = self._pipe
+            if pipe is None or pipe.transport.is_closing():
+                self._write_blocking(msg)
+            elif threading.get_ident() == pipe.loop_thread:
+                pipe.transport.write(msg.encode(self.encoding, 'backslashreplace'))
+            else:
+                pipe.loop.call_soon_threadsafe(self._write_from_thread,
+                                               msg.encode(self.encoding, 'backslashreplace'), msg)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def buffered_size(self):
+        pipe = self._pipe
+        return pipe.transport.get_write_buffer_size() if pipe is not None and not pipe.transport.is_closing() else 0
+
+    async def drain(self):
+        if self._pipe is not None:
+            await self._pipe.protocol.drain()
+
+    async def stop(self):
+        # returns to writing to the stream directly; the buffered output is written once the last handler of the
+        # descriptor stops
+        pipe = self._pipe
+        if pipe is None:
+            return
+        self._pipe = None
+        if _release_pipe(pipe):
+            await pipe.protocol.closed
+
+    def close(self):
+        # without a running event loop buffered output cannot be written any more, call stop() before
+        pipe = self._pipe
+        if pipe is not None:
+            self._pipe = None
+            _release_pipe(pipe)
+        super().close()
+
+
+async def drain():
+    # waits until the handlers started on the running event loop are below their high water mark
+    loop = asyncio.get_running_loop()
+    for shared in list(_shared_pipes.values()):
+        if shared.loop is loop:
+            await shared.protocol.drain()
+
+
+async def start_asyncio_output(logger_names=ASYNCIO_LOGGER_NAMES, high_water=DEFAULT_HIGH_WATER):
+    # Replaces the StreamHandlers of the loggers that write to a pipe or terminal with started
+    # CAFAsyncioStreamHandlers with the same name, level, formatter and filters.
+    from caf_logger import metrics
+    started = []
+    for logger_name in logger_names:
+        logger = logging.getLogger(logger_name)
+        for index, handler in enumerate(list(logger.handlers)):
+            if type(handler) is not logging.StreamHandler or not supports_pipe_transport(handler.stream):
+                continue
+            asyncio_handler = CAFAsyncioStreamHandler(handler.stream, high_water)
+            asyncio_handler.set_name(handler.get_name())
+            asyncio_handler.setLevel(handler.level)
+            asyncio_handler.setFormatter(handler.formatter)
+            asyncio_handler.filters = list(handler.filters)
+            if metrics.is_instrumented(handler):
+                metrics.instrument_handler(asyncio_handler)
+            await asyncio_handler.start()
+            logger.handlers[index] = asyncio_handler
+            _replaced_handlers.append((logger, handler, asyncio_handler))
+            started.append(asyncio_handler)
+    return started
+
+
+async def stop_asyncio_output():
+    # puts the original handlers back after writing the buffered output
+    while _replaced_handlers:
+        logger, handler, asyncio_handler = _replaced_handlers.pop()
+        if asyncio_handler in logger.handlers:
+            logger.handlers[logger.handlers.index(asyncio_handler)] = handler
+        await asyncio_handler.stop()
+        asyncio_handler.close()
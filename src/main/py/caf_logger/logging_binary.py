@@ -0,0 +1,314 @@
+import argparse
+import logging
+import struct
+import sys
+
+from pythonjsonlogger import jsonlogger
+
+from caf_logger import logging_config
+from caf_logger.logging_formatter import CAFJsonFormatter
+
+# A binary file starts with MAGIC and holds length prefixed frames, each one the log record dict CAFJsonFormatter would
+# serialize. Strings are kept in a dictionary shared by the frames of the stream: the first occurrence is written
+# with _NEW_STRING and appended to the dictionary, later occurrences with _STRING_REF and the dictionary index. A
+# frame that starts with _RESET empties the dictionary, which the encoder does for the first frame it writes and
+# whenever the dictionary is full.
+MAGIC = b'CAFB\x01'
+DEFAULT_MAX_STRINGS = 4096
+DEFAULT_MAX_STRING_LENGTH = 64
+
+_HEADER = struct.Struct('>I')
+_DOUBLE = struct.Struct('>d')
+
+_NONE = 0x00
+_FALSE = 0x01
+_TRUE = 0x02
+_INT = 0x03
+_FLOAT = 0x04
+_NEW_STRING = 0x05
+_STRING = 0x06
+_STRING_REF = 0x07
+_LIST = 0x08
+_DICT = 0x09
+_RESET = 0x0A
+
+
+class BinaryFormatError(ValueError):
+    pass
+
+
+def _write_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class Encoder:
+    # Strings of up to max_string_length characters and all dict keys go to the dictionary, longer values such as
+    # messages are written in place.
+
+    def __init__(self, max_strings=DEFAULT_MAX_STRINGS, max_string_length=DEFAULT_MAX_STRING_LENGTH):
+        self.max_strings = max_strings
+        self.max_string_length = max_string_length
+        self._strings = {}
+        self._reset = True
+        # the dictionary the frame being prepared refers to and the strings it adds
+        self._known = self._strings
+        self._added = {}
+        self._pending_reset = False
+        self._default = jsonlogger.JsonEncoder().default
+
+    def reset(self):
+        self._reset = True
+
+    def encode(self, log_record):
+        frame = self.prepare(log_record)
+        self.commit()
+        return frame
+
+    def prepare(self, log_record):
+        # The frame of log_record. The dictionary is only updated by commit(), once the frame was written, so a frame
+        # that could not be written does not leave strings behind that the reader never saw.
+        out = bytearray()
+        self._pending_reset = self._reset or len(self._strings) >= self.max_strings
+        self._known = {} if self._pending_reset else self._strings
+        self._added = {}
+        if self._pending_reset:
+            out.append(_RESET)
+        self._value(out, log_record)
+        return _HEADER.pack(len(out)) + out
+
+    def commit(self):
+        if self._pending_reset:
+            self._strings = {}
+            self._reset = False
+            self._pending_reset = False
+        self._strings.update(self._added)
+        self._known = self._strings
+        self._added = {}
+
+    def _string(self, out, value, intern):
+        index = self._known.get(value)
+        if index is None:
+            index = self._added.get(value)
+        if index is not None:
+            out.append(_STRING_REF)
+            _write_varint(out, index)
+            return
+        if intern:
+            self._added[value] = len(self._known) + len(self._added)
+            out.append(_NEW_STRING)
+        else:
+            out.append(_STRING)
+        data = value.encode('utf-8', 'surrogatepass')
+        _write_varint(out, len(data))
+        out += data
+
+    def _value(self, out, value):
+        if isinstance(value, str):
+            self._string(out, value, len(value) <= self.max_string_length)
+        elif value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif isinstance(value, int):
+            out.append(_INT)
+            # zigzag, small negative numbers stay short
+            _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+        elif isinstance(value, float):
+            out.append(_FLOAT)
+            out += _DOUBLE.pack(value)
+        elif isinstance(value, dict):
+            out.append(_DICT)
+            _write_varint(out, len(value))
+            for key, item in value.items():
+                if isinstance(key, str):
+                    self._string(out, key, True)
+                else:
+                    self._value(out, key)
+                self._value(out, item)
+        elif isinstance(value, (list, tuple)):
+            out.append(_LIST)
+            _write_varint(out, len(value))
+            for item in value:
+                self._value(out, item)
+        else:
+            # the same conversion the JSON output applies
+            self._value(out, self._default(value))
+
+
+class Decoder:
+
+    def __init__(self):
+        self._strings = []
+        self._data = b''
+        self._offset = 0
+
+    def decode(self, frame):
+        self._data = frame
+        self._offset = 0
+        if frame[:1] == bytes((_RESET,)):
+            self._strings = []
+            self._offset = 1
+        value = self._value()
+        if self._offset != len(frame):
+            raise BinaryFormatError("{} unexpected bytes at the end of the frame".format(len(frame) - self._offset))
+        return value
+
+    def _varint(self):
+        data = self._data
+        if self._offset < len(data) and data[self._offset] < 0x80:
+            # dictionary indexes, sizes and counts mostly fit in one byte
+            self._offset += 1
+            return data[self._offset - 1]
+        result = 0
+        shift = 0
+        while True:
+            if self._offset >= len(data):
+                raise BinaryFormatError("Truncated frame")
+            byte = data[self._offset]
+            self._offset += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def _text(self):
+        size = self._varint()
+        end = self._offset + size
+        if end > len(self._data):
+            raise BinaryFormatError("Truncated frame")
+        text = self._data[self._offset:end].decode('utf-8', 'surrogatepass')
+        self._offset = end
+        return text
+
+    def _value(self):
+        if self._offset >= len(self._data):
+            raise BinaryFormatError("Truncated frame")
+        tag = self._data[self._offset]
+        self._offset += 1
+        if tag == _STRING_REF:
+            index = self._varint()
+            if index >= len(self._strings):
+                raise BinaryFormatError("Unknown string {}".format(index))
+            return self._strings[index]
+        if tag == _NEW_STRING:
+            text = self._text()
+            self._strings.append(text)
+            return text
+        if tag == _STRING:
+            return self._text()
+        if tag == _DICT:
+            return {self._value(): self._value() for _ in range(self._varint())}
+        if tag == _LIST:
+            return [self._value() for _ in range(self._varint())]
+        if tag == _INT:
+            value = self._varint()
+            return value >> 1 if not value & 1 else -((value + 1) >> 1)
+        if tag == _FLOAT:
+            end = self._offset + _DOUBLE.size
+            if end > len(self._data):
+                raise BinaryFormatError("Truncated frame")
+            value, = _DOUBLE.unpack_from(self._data, self._offset)
+            self._offset = end
+            return value
+        if tag == _NONE:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        raise BinaryFormatError("Unknown tag {:#x}".format(tag))
+
+
+def read_records(stream):
+    # the log record dicts of a binary stream, in the order they were written
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise BinaryFormatError("Not a CAF binary log stream")
+    decoder = Decoder()
+    while True:
+        header = stream.read(_HEADER.size)
+        if not header:
+            return
+        if len(header) < _HEADER.size:
+            raise BinaryFormatError("Truncated frame header")
+        size, = _HEADER.unpack(header)
+        frame = stream.read(size)
+        if len(frame) < size:
+            raise BinaryFormatError("Truncated frame")
+        yield decoder.decode(frame)
+
+
+class CAFBinaryFileHandler(logging.FileHandler):
+    # Writes records in the binary format instead of JSON lines. The formatter must be a CAFJsonFormatter, it builds
+    # the dict that is encoded, the JSON formatter of logging_json.conf is used when none is set. The file is flushed
+    # for records of flush_level and above and when the handler is closed. format() returns the dict, emit() encodes
+    # and writes it under the handler lock, since frames depend on the dictionary of the frames written before.
+
+    def __init__(self, filename, mode='ab', max_strings=DEFAULT_MAX_STRINGS,
+                 max_string_length=DEFAULT_MAX_STRING_LENGTH, flush_level=logging.ERROR, delay=False):
+        self._encoder = Encoder(max_strings, max_string_length)
+        self.flush_level = flush_level
+        self.bytes_written = 0
+        super().__init__(filename, mode, delay=delay)
+
+    def _open(self):
+        stream = open(self.baseFilename, self.mode)
+        if stream.tell() == 0:
+            stream.write(MAGIC)
+        # the dictionary of a stream that is appended to is not known, the next frame starts a new one
+        self._encoder.reset()
+        return stream
+
+    def format(self, record):
+        formatter = self.formatter
+        if not isinstance(formatter, CAFJsonFormatter):
+            formatter = self.formatter = CAFJsonFormatter(logging_config.JSON_FORMAT,
+                                                          datefmt=logging_config.JSON_DATEFMT)
+        return formatter.build_log_record(record)
+
+    def emit(self, record):
+        try:
+            log_record = self.format(record)
+            self.acquire()
+            try:
+                if self.stream is None:
+                    self.stream = self._open()
+                frame = self._encoder.prepare(log_record)
+                self.stream.write(frame)
+                self._encoder.commit()
+                self.bytes_written += len(frame)
+                if record.levelno >= self.flush_level:
+                    self.flush()
+            finally:
+                self.release()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converts a CAF binary log file to JSON lines")
+    parser.add_argument("input", help="binary log file, - for stdin")
+    parser.add_argument("-o", "--output", help="JSON lines file, stdout when not given")
+    args = parser.parse_args(argv)
+    encode = jsonlogger.JsonEncoder().encode
+    source = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    target = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for log_record in read_records(source):
+            target.write(encode(log_record))
+            target.write('\n')
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
 WHI_CAF_LOGGER_BAD_ARGUMENTS = ("CAFLOG001", "Failed to log message [{}] at {} level correctly, see following stacktrace for details")  # noqa: E501
+WHI_CAF_LOGGER_BAD_TEMPLATE = ("CAFLOG002", "Invalid message template [{}] for {} at {} level: {}")
+WHI_CAF_LOGGER_SUPPRESSED = ("CAFLOG003", "Suppressed {} records with log_id {} in the last {} seconds")
+WHI_CAF_LOGGER_REPEATED = ("CAFLOG004", "Message [{}] with log_id {} repeated {} more times in the last {} seconds")
 
 WHI_CAF_MDAL_ADD_ATTRIBUTE_TEXT = ("MDALATTR", '[ attribute: {{"{}": "{}"}} ]')
 WHI_CAF_MDAL_ADD_ATTRIBUTE_JSON = ("MDALATTR", 'Attribute recorded')
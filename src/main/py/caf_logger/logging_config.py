@@ -0,0 +1,83 @@
+_MAIN_FORMAT = "%(asctime)s [%(threadName)s] [%(levelname)s] [%(name)s] - [] - %(message)s"
+_WHI_FORMAT = "{asctime} [{threadName}] [{levelname}] [{name}] - [{corr_id}] - {log_id}: {message}"
+_MDAL_FORMAT = "{asctime} [{threadName}] [{levelname}] [{name}] - [{corr_id}] - [{log_attribute}] - {log_id}: {message}"
+# the fields and date format of the JSON formatters of logging_json.conf
+JSON_FORMAT = "%(message)%(levelname)%(name)%(asctime)%(threadName)"
+JSON_DATEFMT = "%Y-%m-%dT%H:%M:%SZ"
+_TEXT_FORMATTER = 'caf_logger.tracebacks.CAFFormatter'
+
+# The defaults of the options of the [caf] section, which the configuration files and the caf key of a dictConfig
+# dictionary override. WHI_CAF_LOGGING_<OPTION> environment variables override both.
+CAF_DEFAULTS = {
+    # async=true moves formatting and writing of WHI/MDAL records to a background thread.
+    # overflow_policy is one of block, drop_newest, drop_lowest
+    'async': 'false',
+    'queue_size': '10000',
+    'overflow_policy': 'block',
+    # sampling keeps a fraction of the records per log_id or level, e.g. CORRIDNOTPRESENT:0.1, INFO:0.5
+    # rate_limit caps the records per second per log_id or level as rate[/burst], e.g. CORRIDNOTPRESENT:100/200
+    # suppressed records are reported per log_id at most every suppression_summary_interval seconds
+    'sampling': '',
+    'rate_limit': '',
+    'suppression_summary_interval': '60',
+    # records of the comma separated log_ids in disabled_codes are dropped
+    'disabled_codes': '',
+    # dedup_window > 0 collapses identical records logged within that many seconds into a "repeated N times" record
+    'dedup_window': '0',
+    'dedup_max_entries': '1024',
+    # metrics=true counts records, output size and format/emit latency of the WHI/MDAL handlers, see caf_logger.metrics
+    'metrics': 'true',
+    # watch_interval > 0 checks the configuration file every that many seconds and applies changed levels,
+    # disabled_codes and sampling
+    'watch_interval': '0',
+    # collector_address sends the WHI/MDAL records of this process to a collector listening on that Unix socket path,
+    # started with python -m caf_logger.multiprocess <path>, which formats and writes the records of all processes
+    'collector_address': '',
+    'collector_batch_size': '256',
+    # formatted tracebacks are cached by exception type, message and code locations, traceback_cache_size=0 disables
+    # it. traceback_window > 0 writes the traceback of a fingerprint in full once per that many seconds, repeated
+    # exceptions within the window are written as the exception message and the fingerprint of the full traceback
+    'traceback_cache_size': '256',
+    'traceback_window': '0',
+    # MDAL event_info payloads are truncated, with markers in place of what was left out, at event_max_depth levels
+    # of nesting, event_max_keys keys per dict or items per list, event_max_string_length characters per string and
+    # about event_max_size characters in total. 0 is unlimited.
+    'event_max_depth': '32',
+    'event_max_keys': '10000',
+    'event_max_string_length': '65536',
+    'event_max_size': '1048576',
+}
+
+
+def default_config(json_format=False):
+    # The dictConfig equivalent of logging.conf / logging_json.conf, to be adjusted and passed to logger.configure().
+    if json_format:
+        whi_formatter = {'()': 'caf_logger.logging_formatter.CAFJsonFormatter', 'fmt': JSON_FORMAT,
+                         'datefmt': JSON_DATEFMT}
+        mdal_formatter = dict(whi_formatter)
+    else:
+        whi_formatter = {'class': _TEXT_FORMATTER, 'format': _WHI_FORMAT, 'style': '{'}
+        mdal_formatter = {'class': _TEXT_FORMATTER, 'format': _MDAL_FORMAT, 'style': '{'}
+    return {
+        'version': 1,
+        # the [caf] options that differ from CAF_DEFAULTS
+        'caf': {},
+        'formatters': {
+            'mainFormatter': {'class': _TEXT_FORMATTER, 'format': _MAIN_FORMAT},
+            'whiFormatter': whi_formatter,
+            'mdalFormatter': mdal_formatter,
+        },
+        'handlers': {
+            'consoleHandler': {'class': 'logging.StreamHandler', 'level': 'INFO', 'formatter': 'mainFormatter',
+                               'stream': 'ext://sys.stdout'},
+            'whiConsoleHandler': {'class': 'logging.StreamHandler', 'level': 'INFO', 'formatter': 'whiFormatter',
+                                  'stream': 'ext://sys.stdout'},
+            'mdalConsoleHandler': {'class': 'logging.StreamHandler', 'level': 'INFO', 'formatter': 'mdalFormatter',
+                                   'stream': 'ext://sys.stdout'},
+        },
+        'loggers': {
+            'WHI': {'level': 'INFO', 'handlers': ['whiConsoleHandler'], 'propagate': False},
+            'MDAL': {'level': 'INFO', 'handlers': ['mdalConsoleHandler'], 'propagate': False},
+        },
+        'root': {'level': 'INFO', 'handlers': ['consoleHandler']},
+    }
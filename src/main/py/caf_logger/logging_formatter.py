@@ -1,7 +1,18 @@
+import json
+import os
 import platform
+from datetime import datetime
 
 from pythonjsonlogger import jsonlogger
 
+from caf_logger.lazy import LazyEvent, LazyJson, LazyValue
+from caf_logger.tracebacks import CAFFormatter, CAFTracebackFormatterMixin  # noqa: F401 CAFFormatter is re-exported
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 _ATTR_MAP = {
     'levelname': 'level',
     'asctime': '@timestamp',
@@ -10,12 +21,99 @@ _ATTR_MAP = {
     'corr_id': 'WHI-CORRID'
 }
 
+JSON_ENCODER_STDLIB = 'json'
+JSON_ENCODER_ORJSON = 'orjson'
+
+_HOSTNAME = platform.node()
+_LAZY_TYPES = (LazyValue, LazyEvent, LazyJson)
+_JSON_ENCODER = os.getenv('WHI_CAF_LOGGING_JSON_ENCODER', JSON_ENCODER_STDLIB)
+
+
+class CAFJsonFormatter(CAFTracebackFormatterMixin, jsonlogger.JsonFormatter):
+
+    def __init__(self, *args, json_encoder_name=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._format_asctime = 'asctime' in self._required_fields
+        self._plain_fields = tuple(field for field in self._required_fields if field not in _ATTR_MAP)
+        self._renamed_fields = tuple((field, renamed, field in self._required_fields, field in self._skip_fields)
+                                     for field, renamed in _ATTR_MAP.items())
+        # datefmt has no sub-second directives, so the rendered time only changes once per second
+        self._cache_asctime = self.datefmt is not None
+        # the timestamp keyword of JsonFormatter, True names the field timestamp
+        self._timestamp_key = None
+        if self.timestamp:
+            self._timestamp_key = self.timestamp if type(self.timestamp) is str else 'timestamp'
+        self._asctime_cache = (None, None)
+        self._serialize = self._select_serializer(json_encoder_name or _JSON_ENCODER)
+
+    def _select_serializer(self, json_encoder_name):
+        if (self.json_serializer is not json.dumps or self.json_encoder is not jsonlogger.JsonEncoder
+                or self.json_default is not None or self.json_indent is not None):
+            return self.jsonify_log_record
+        stdlib_encode = jsonlogger.JsonEncoder(ensure_ascii=self.json_ensure_ascii).encode
+        if json_encoder_name != JSON_ENCODER_ORJSON or orjson is None:
+            return stdlib_encode
+        orjson_default = jsonlogger.JsonEncoder().default
+
+        def orjson_encode(log_record):
+            try:
+                return orjson.dumps(log_record, default=orjson_default).decode('utf-8')
+            except TypeError:
+                # non-string keys or integers beyond 64 bits, which only the stdlib encoder accepts
+                return stdlib_encode(log_record)
+        return orjson_encode
+
+    def formatTime(self, record, datefmt=None):
+        if not self._cache_asctime or datefmt != self.datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, asctime = self._asctime_cache
+        if cached_second != second:
+            asctime = super().formatTime(record, datefmt)
+            self._asctime_cache = (second, asctime)
+        return asctime
+
+    def format(self, record):
+        return self.prefix + self._serialize(self.build_log_record(record))
 
-class CAFJsonFormatter(jsonlogger.JsonFormatter):
+    def build_log_record(self, record):
+        # the processed dict that format() serializes, also encoded by caf_logger.logging_binary
+        message_dict = {}
+        if isinstance(record.msg, dict):
+            message_dict = record.msg
+            record.message = None
+        else:
+            record.message = record.getMessage()
+        if self._format_asctime:
+            record.asctime = self.formatTime(record, self.datefmt)
+        if record.exc_info and not message_dict.get('exc_info'):
+            message_dict['exc_info'] = self.formatException(record.exc_info)
+        if not message_dict.get('exc_info') and record.exc_text:
+            message_dict['exc_info'] = record.exc_text
+        if record.stack_info and not message_dict.get('stack_info'):
+            message_dict['stack_info'] = self.formatStack(record.stack_info)
 
-    def process_log_record(self, log_record):
-        log_record['HOSTNAME'] = platform.node()
-        for k, v in _ATTR_MAP.items():
-            if k in log_record:
-                log_record[v] = log_record.pop(k)
-        return jsonlogger.JsonFormatter.process_log_record(self, log_record)
+        # Fields are inserted directly in their final order under their final names, which matches
+        # what popping and re-inserting the renamed keys after the fact used to produce.
+        record_dict = record.__dict__
+        skip_fields = self._skip_fields
+        log_record = {}
+        for field in self._plain_fields:
+            log_record[field] = record_dict.get(field)
+        if message_dict:
+            log_record.update(message_dict)
+        for key, value in record_dict.items():
+            if key not in skip_fields and key not in _ATTR_MAP and not key.startswith('_'):
+                log_record[key] = value.resolve() if type(value) in _LAZY_TYPES else value
+        if self._timestamp_key is not None:
+            log_record[self._timestamp_key] = datetime.utcnow()
+        log_record['HOSTNAME'] = _HOSTNAME
+        for field, renamed, required, skipped in self._renamed_fields:
+            if field in log_record:
+                # only possible when the message itself is a dict
+                log_record[renamed] = log_record.pop(field)
+            elif required:
+                log_record[renamed] = record_dict.get(field)
+            elif not skipped and field in record_dict:
+                log_record[renamed] = record_dict[field]
+        return self.process_log_record(log_record)
@@ -0,0 +1,440 @@
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+OVERFLOW_DROP_LOWEST = 'drop_lowest'
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_LOWEST)
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BUFFER_SIZE = 65536
+DEFAULT_FLUSH_INTERVAL = 1.0
+SEGMENT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+_queue_handlers = weakref.WeakSet()
+_STOP_SEGMENT_WORKER = object()
+
+
+class _RecordQueue(queue.Queue):
+
+    def put_evicting_lowest(self, record):
+        # Returns the record that was dropped to make room (possibly `record` itself), or None.
+        with self.not_full:
+            if self.maxsize <= 0 or self._qsize() < self.maxsize:
+                self._put(record)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+                return None
+            lowest_index = None
+            lowest_levelno = record.levelno
+            for index, queued in enumerate(self.queue):
+                # the listener sentinel has no level and must never be evicted
+                levelno = getattr(queued, 'levelno', None)
+                if levelno is not None and levelno < lowest_levelno:
+                    lowest_index, lowest_levelno = index, levelno
+            if lowest_index is None:
+                return record
+            dropped = self.queue[lowest_index]
+            del self.queue[lowest_index]
+            self._put(record)
+            self.not_empty.notify()
+            return dropped
+
+
+class _CAFQueueListener(logging.handlers.QueueListener):
+
+    def enqueue_sentinel(self):
+        # The queue may be full under the block policy, wait for the writer to make room.
+        self.queue.put(self._sentinel)
+
+    def is_running(self):
+        return self._thread is not None
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+class CAFQueueHandler(logging.handlers.QueueHandler):
+
+    def __init__(self, handlers, queue_size=DEFAULT_QUEUE_SIZE, overflow_policy=OVERFLOW_BLOCK):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy {}, expected one of {}".format(
+                overflow_policy, OVERFLOW_POLICIES))
+        super().__init__(_RecordQueue(queue_size))
+        self.overflow_policy = overflow_policy
+        self.dropped = {}
+        self._dropped_lock = threading.Lock()
+        self._listener = _CAFQueueListener(self.queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+        _queue_handlers.add(self)
+
+    @property
+    def handlers(self):
+        return self._listener.handlers
+
+    def prepare(self, record):
+        # Records never leave this process, so unlike the stdlib QueueHandler there is nothing to make
+        # picklable here: message rendering and formatting are left to the writer thread.
+        return record
+
+    def enqueue(self, record):
+        if not self._listener.is_running():
+            self._listener.handle(record)
+        elif self.overflow_policy == OVERFLOW_BLOCK:
+            self.queue.put(record)
+        elif self.overflow_policy == OVERFLOW_DROP_NEWEST:
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self._count_dropped(record)
+        else:
+            dropped = self.queue.put_evicting_lowest(record)
+            if dropped is not None:
+                self._count_dropped(dropped)
+
+    def _count_dropped(self, record):
+        with self._dropped_lock:
+            self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+
+    def dropped_count(self):
+        with self._dropped_lock:
+            return sum(self.dropped.values())
+
+    def flush(self):
+        if self._listener.is_running():
+            self.queue.join()
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self):
+        self.acquire()
+        try:
+            self._listener.stop()
+        finally:
+            self.release()
+        super().close()
+
+
+class CAFBufferedStreamHandler(logging.StreamHandler):
+
+    def __init__(self, stream=None, buffer_size=DEFAULT_BUFFER_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 flush_level=logging.ERROR):
+        super().__init__(stream)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = logging._checkLevel(flush_level)
+        self._buffer = []
+        self._buffered = 0
+        self._stop_flusher = threading.Event()
+        self._flusher = None
+        if flush_interval and flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="CAFBufferedStreamFlusher",
+                                             daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._stop_flusher.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # the buffer was already taken, keep flushing later records
+                pass
+
+    def _append(self, record):
+        msg = self.format(record) + self.terminator
+        self._buffer.append(msg)
+        self._buffered += len(msg)
+        return record.levelno >= self.flush_level
+
+    def _write_buffer(self):
+        # called with the handler lock held
+        if self._buffer:
+            data = ''.join(self._buffer)
+            self._buffer = []
+            self._buffered = 0
+            self.stream.write(data)
+        super().flush()
+
+    def emit(self, record):
+        try:
+            if self._append(record) or self._buffered >= self.buffer_size:
+                self._write_buffer()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def handle_batch(self, records):
+        self.acquire()
+        try:
+            flush_now = False
+            for record in records:
+                if self.filter(record):
+                    try:
+                        flush_now = self._append(record) or flush_now
+                    except Exception:
+                        self.handleError(record)
+            if flush_now or self._buffered >= self.buffer_size:
+                self._write_buffer()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.stream:
+                self._write_buffer()
+        finally:
+            self.release()
+
+    def close(self):
+        self._stop_flusher.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        self.flush()
+        super().close()
+
+
+class CAFRotatingFileHandler(logging.FileHandler):
+    # Rolls the file over when it would grow beyond max_bytes and/or every interval seconds. On the logging thread a
+    # rollover only renames the file to <filename>.<timestamp> and opens a new one. Compressing rotated segments and
+    # removing all but the newest backup_count of them (0 keeps all) happens on a background thread.
+
+    def __init__(self, filename, mode='a', max_bytes=0, interval=0, backup_count=0, compress=True, encoding='utf-8',
+                 delay=False):
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self._size = 0
+        self._rollover_at = None
+        self._segments = queue.Queue()
+        self._segment_worker = None
+        super().__init__(filename, mode, encoding, delay)
+        self._segment_pattern = re.compile(r"{}\.\d{{8}}-\d{{6}}-\d{{6}}(\.\d+)?(\.gz)?$".format(
+            re.escape(os.path.basename(self.baseFilename))))
+
+    def _open(self):
+        stream = super()._open()
+        self._size = os.path.getsize(self.baseFilename)
+        self._rollover_at = time.time() + self.interval if self.interval and self.interval > 0 else None
+        return stream
+
+    def _segment_name(self):
+        now = time.time()
+        name = "{}.{}-{:06d}".format(self.baseFilename, time.strftime(SEGMENT_TIME_FORMAT, time.localtime(now)),
+                                     int(now % 1 * 1000000))
+        candidate, counter = name, 0
+        while os.path.exists(candidate) or os.path.exists(candidate + ".gz"):
+            counter += 1
+            candidate = "{}.{}".format(name, counter)
+        return candidate
+
+    def _rollover(self):
+        self.stream.close()
+        self.stream = None
+        try:
+            os.rename(self.baseFilename, self._segment_name())
+        except OSError:
+            # the file was moved or removed by someone else, keep writing to a new one
+            pass
+        self.stream = self._open()
+        if self._segment_worker is None:
+            self._segment_worker = threading.Thread(target=self._process_segments, name="CAFSegmentWorker",
+                                                    daemon=True)
+            self._segment_worker.start()
+        self._segments.put(None)
+
+    def _write(self, msg, created):
+        if self.stream is None:
+            self.stream = self._open()
+        size = len(msg) if msg.isascii() else len(msg.encode(self.encoding or 'utf-8', 'replace'))
+        if self._rollover_at is not None and created >= self._rollover_at:
+            if self._size:
+                self._rollover()
+            else:
+                self._rollover_at = created + self.interval
+        elif self.max_bytes and self.max_bytes > 0 and self._size and self._size + size > self.max_bytes:
+            self._rollover()
+        self.stream.write(msg)
+        self._size += size
+
+    def emit(self, record):
+        try:
+            self._write(self.format(record) + self.terminator, record.created)
+            self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def handle_batch(self, records):
+        self.acquire()
+        try:
+            for record in records:
+                if self.filter(record):
+                    try:
+                        self._write(self.format(record) + self.terminator, record.created)
+                    except Exception:
+                        self.handleError(record)
+            self.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+    def rotated_segments(self):
+        # oldest first
+        directory = os.path.dirname(self.baseFilename)
+        names = [name for name in os.listdir(directory) if self._segment_pattern.match(name)]
+        names.sort(key=lambda name: name[:-3] if name.endswith(".gz") else name)
+        return [os.path.join(directory, name) for name in names]
+
+    def _process_segments(self):
+        while True:
+            item = self._segments.get()
+            try:
+                if item is _STOP_SEGMENT_WORKER:
+                    return
+                segments = self.rotated_segments()
+                if self.compress:
+                    # also compresses segments an earlier process left uncompressed
+                    segments = [segment if segment.endswith(".gz") else _compress_segment(segment)
+                                for segment in segments]
+                if self.backup_count and self.backup_count > 0:
+                    for segment in segments[:-self.backup_count]:
+                        os.remove(segment)
+            except Exception:
+                sys.stderr.write("Failed to process rotated segments of {}\n".format(self.baseFilename))
+                traceback.print_exc(file=sys.stderr)
+            finally:
+                self._segments.task_done()
+
+    def wait_for_segments(self):
+        self._segments.join()
+
+    def close(self):
+        self.acquire()
+        try:
+            if self._segment_worker is not None:
+                self._segments.put(_STOP_SEGMENT_WORKER)
+                self._segment_worker.join()
+                self._segment_worker = None
+        finally:
+            self.release()
+        super().close()
+
+
+def _compress_segment(segment):
+    compressed = segment + ".gz"
+    with open(segment, 'rb') as source, gzip.open(compressed + ".tmp", 'wb') as target:
+        shutil.copyfileobj(source, target)
+    os.replace(compressed + ".tmp", compressed)
+    os.remove(segment)
+    return compressed
+
+
+def install_queue_handler(logger, queue_size=DEFAULT_QUEUE_SIZE, overflow_policy=OVERFLOW_BLOCK):
+    handlers = list(logger.handlers)
+    if not handlers:
+        return None
+    queue_handler = CAFQueueHandler(handlers, queue_size=queue_size, overflow_policy=overflow_policy)
+    queue_handler.set_name("{}.queue".format(logger.name))
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    return queue_handler
+
+
+def dropped_records():
+    dropped = {}
+    for handler in list(_queue_handlers):
+        with handler._dropped_lock:
+            for level_name, count in handler.dropped.items():
+                dropped[level_name] = dropped.get(level_name, 0) + count
+    return dropped
+
+
+def queue_stats():
+    stats = {}
+    for handler in list(_queue_handlers):
+        with handler._dropped_lock:
+            dropped = dict(handler.dropped)
+        name = handler.get_name() or "{}@{:x}".format(type(handler).__name__, id(handler))
+        stats[name] = {'depth': handler.queue.qsize(), 'capacity': handler.queue.maxsize, 'dropped': dropped}
+    return stats
+
+
+def call_handlers_batch(logger, records):
+    # Batch counterpart of Logger.handle/Logger.callHandlers for records that were already created.
+    if logger.disabled:
+        return
+    if logger.filters:
+        records = [record for record in records if logger.filter(record)]
+    found = 0
+    current = logger
+    while current:
+        for handler in current.handlers:
+            found += 1
+            handle_batch(handler, [record for record in records if record.levelno >= handler.level])
+        current = current.parent if current.propagate else None
+    if found == 0 and logging.lastResort:
+        last_resort = logging.lastResort
+        handle_batch(last_resort, [record for record in records if record.levelno >= last_resort.level])
+
+
+def handle_batch(handler, records):
+    if not records:
+        return
+    batch_handler = getattr(handler, 'handle_batch', None)
+    if batch_handler is not None:
+        batch_handler(records)
+    elif type(handler).emit is logging.StreamHandler.emit:
+        _write_stream_batch(handler, records)
+    else:
+        for record in records:
+            handler.handle(record)
+
+
+def _write_stream_batch(handler, records):
+    records = [record for record in records if handler.filter(record)]
+    if not records:
+        return
+    # formatting happens under the handler lock like it does in StreamHandler.emit
+    handler.acquire()
+    try:
+        chunks = []
+        for record in records:
+            try:
+                chunks.append(handler.format(record) + handler.terminator)
+            except Exception:
+                handler.handleError(record)
+        if chunks:
+            handler.stream.write(''.join(chunks))
+            handler.flush()
+    except Exception:
+        handler.handleError(records[-1])
+    finally:
+        handler.release()
+
+
+def _stop_queue_handlers():
+    for handler in list(_queue_handlers):
+        handler.close()
+
+
+atexit.register(_stop_queue_handlers)
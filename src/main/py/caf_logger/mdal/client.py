@@ -0,0 +1,23 @@
+import aiohttp
+
+from caf_logger.mdal import constants
+from caf_logger.mdal import corrid_store
+
+
+async def _add_correlation_header(session, trace_config_ctx, params):
+    # runs in the task making the request, so the corr id and attributes of that context are sent;
+    # a correlation header passed explicitly to the request is left as it is
+    if constants.CORRID_HEADER_NAME not in params.headers:
+        params.headers[constants.CORRID_HEADER_NAME] = corrid_store.get_headers_value()
+
+
+def correlation_trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_add_correlation_header)
+    return trace_config
+
+
+def client_session(**kwargs) -> aiohttp.ClientSession:
+    # an aiohttp.ClientSession that sends the correlation header with every request
+    kwargs['trace_configs'] = list(kwargs.get('trace_configs') or []) + [correlation_trace_config()]
+    return aiohttp.ClientSession(**kwargs)
@@ -1,3 +1,7 @@
 CORRID_HEADER_NAME = "X-WHI-Correlation-ID"
 UUID_CORRID_LABEL = "corrid:"
 ATTR_CORRID_LABEL = "attr:"
+DEFAULT_MAX_ATTRIBUTES = 64
+DEFAULT_MAX_ATTRIBUTE_VALUE_SIZE = 1024
+MAX_HEADER_LENGTH = 8192
+MAX_HEADER_SCAN_LENGTH = 65536
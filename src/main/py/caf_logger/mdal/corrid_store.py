@@ -1,14 +1,146 @@
 from contextvars import ContextVar
 from contextvars import Token
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import os
 import uuid
 from caf_logger.mdal import utils
 from caf_logger.mdal import constants
 
+_max_attributes = int(os.getenv('WHI_CAF_MDAL_MAX_ATTRIBUTES', constants.DEFAULT_MAX_ATTRIBUTES))
+_max_attribute_value_size = int(os.getenv('WHI_CAF_MDAL_MAX_ATTRIBUTE_VALUE_SIZE',
+                                          constants.DEFAULT_MAX_ATTRIBUTE_VALUE_SIZE))
+
+
+class _ContextNode:
+    # One entry of the MDAL context stack. Nodes are never mutated once created, so a stack can be
+    # shared by any number of tasks and push/pop are O(1). The rendered forms of the stack are
+    # computed once per node.
+    __slots__ = ('value', 'parent', 'rendered', '_items', '_rendered_corr_id')
+
+    def __init__(self, value: str, parent: Optional['_ContextNode']):
+        self.value = value
+        self.parent = parent
+        self.rendered = value if parent is None else "{}|{}".format(parent.rendered, value)
+        self._items = None
+        self._rendered_corr_id = None
+
+    def items(self) -> Tuple[str, ...]:
+        if self._items is None:
+            parent_items = self.parent.items() if self.parent is not None else ()
+            self._items = parent_items + (self.value,)
+        return self._items
+
+    def render_corr_id(self, corr_id: str) -> str:
+        rendered_corr_id = self._rendered_corr_id
+        if rendered_corr_id is None or rendered_corr_id[0] != corr_id:
+            rendered_corr_id = self._rendered_corr_id = (corr_id, "{}/{}".format(corr_id, self.rendered))
+        return rendered_corr_id[1]
+
+
+class _Attributes:
+    # Immutable ordered name -> value mapping of the global attributes, with its rendered forms
+    # cached on first use. A value of None is an attribute received without a value ("attr:name").
+    __slots__ = ('values', '_items', '_joined', '_mapping', '_header_value')
+
+    def __init__(self, values: Dict[str, Optional[str]]):
+        self.values = values
+        self._items = None
+        self._joined = None
+        self._mapping = None
+        self._header_value = None
+
+    def update(self, attrs: Iterable[Tuple[str, Optional[str]]]) -> '_Attributes':
+        values = None
+        for name, value in attrs:
+            if value is not None and len(value) > _max_attribute_value_size:
+                value = value[:_max_attribute_value_size]
+            current = self.values if values is None else values
+            if name in current:
+                if current[name] == value:
+                    continue
+            elif len(current) >= _max_attributes:
+                continue
+            if values is None:
+                values = dict(self.values)
+            values[name] = value
+        return self if values is None else _Attributes(values)
+
+    def items(self) -> Tuple[str, ...]:
+        if self._items is None:
+            self._items = tuple(name if value is None else name + ':' + value for name, value in self.values.items())
+        return self._items
+
+    def joined(self) -> str:
+        if self._joined is None:
+            self._joined = ','.join(self.items())
+        return self._joined
+
+    def mapping(self) -> Dict[str, str]:
+        if self._mapping is None:
+            self._mapping = {name: '' if value is None else value for name, value in self.values.items()}
+        return self._mapping
+
+    def header_value(self, corr_id: str) -> str:
+        header_value = self._header_value
+        if header_value is None or header_value[0] != corr_id:
+            header_value = self._header_value = (corr_id, json.dumps(_labelled_headers(corr_id, self.items())))
+        return header_value[1]
+
+
+_EMPTY_ATTRIBUTES = _Attributes({})
+
+
+class _ScopedContext:
+    __slots__ = ('_log_context', '_token')
+
+    def __init__(self, log_context: str):
+        self._log_context = log_context
+        self._token = None
+
+    def __enter__(self):
+        self._token = add_context(self._log_context)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _log_context.reset(self._token)
+        self._token = None
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.__exit__(exc_type, exc_value, traceback)
+
+
+class ContextSnapshot:
+    # The corr id, global attributes and MDAL context stack of a context, taken by snapshot() and applied in another
+    # thread or process by restore(). Taking it copies nothing, the attributes and the stack are immutable; it is
+    # pickled as plain values for process pools.
+    __slots__ = ('corr_id', '_attributes', '_log_context')
+
+    def __init__(self, corr_id: str, attributes: _Attributes, log_context: Optional[_ContextNode]):
+        self.corr_id = corr_id
+        self._attributes = attributes
+        self._log_context = log_context
+
+    def __reduce__(self):
+        items = self._log_context.items() if self._log_context is not None else ()
+        return _rebuild_snapshot, (self.corr_id, self._attributes.values, items)
+
+
+def _rebuild_snapshot(corr_id: str, attribute_values: Dict[str, Optional[str]],
+                      context_items: Tuple[str, ...]) -> ContextSnapshot:
+    log_context = None
+    for item in context_items:
+        log_context = _ContextNode(item, log_context)
+    attributes = _Attributes(dict(attribute_values)) if attribute_values else _EMPTY_ATTRIBUTES
+    return ContextSnapshot(corr_id, attributes, log_context)
+
 
 _uuid_corr_id: ContextVar[str] = ContextVar("uuid_corr_id", default="")
-_attr_corr_id: ContextVar[List[str]] = ContextVar("attr_corr_id", default=[])
-_log_context: ContextVar[List[str]] = ContextVar("log_context", default=[])
+_attr_corr_id: ContextVar[_Attributes] = ContextVar("attr_corr_id", default=_EMPTY_ATTRIBUTES)
+_log_context: ContextVar[Optional[_ContextNode]] = ContextVar("log_context", default=None)
 
 
 def init_headers():
@@ -17,17 +149,14 @@ def init_headers():
 
 def set_headers(corr_ids: List[str]):
     clean()
-    flat_corr_ids = utils.flatten_list(corr_ids)
-    uuid_corr_id = utils.get_uuid_corr_id(flat_corr_ids)
-    attr_corr_ids = utils.get_attr_corr_id(flat_corr_ids)
+    uuid_corr_id, attr_corr_ids = utils.parse_corr_id_header(corr_ids, constants.MAX_HEADER_LENGTH, _max_attributes)
 
-    if(not uuid_corr_id):
+    if not uuid_corr_id:
         init_headers()
     else:
         set_corr_id(uuid_corr_id)
 
-    for attr in attr_corr_ids:
-        add_attr(attr)
+    _attr_corr_id.set(_EMPTY_ATTRIBUTES.update(_split_attr(attr) for attr in attr_corr_ids))
 
 
 def set_corr_id(corr_id: str) -> Token:
@@ -38,53 +167,111 @@ def get_corr_id() -> str:
     return _uuid_corr_id.get()
 
 
+def _split_attr(attr: str) -> Tuple[str, Optional[str]]:
+    name, separator, value = attr.partition(':')
+    return (name, value) if separator else (name, None)
+
+
 def add_attr(attr: str) -> Token:
-    attrs = _attr_corr_id.get()
-    attrs.append(attr)
-    return _attr_corr_id.set(attrs)
+    return _attr_corr_id.set(_attr_corr_id.get().update((_split_attr(attr),)))
+
+
+def set_attr(name: str, value: str) -> Token:
+    return _attr_corr_id.set(_attr_corr_id.get().update(((name, value),)))
+
+
+def set_attribute_limits(max_attributes: int, max_attribute_value_size: int):
+    global _max_attributes, _max_attribute_value_size
+    _max_attributes = max_attributes
+    _max_attribute_value_size = max_attribute_value_size
 
 
 def get_attrs() -> List[str]:
-    return _attr_corr_id.get()
+    return list(_attr_corr_id.get().items())
+
+
+def get_rendered_attrs() -> str:
+    return _attr_corr_id.get().joined()
+
+
+def get_attr_map() -> Dict[str, str]:
+    # shared between every event logged with the same attributes, callers must not modify it
+    return _attr_corr_id.get().mapping()
 
 
 def get_headers() -> List[str]:
-    headers = []
     uuid_corr_id = get_corr_id()
-    if(not uuid_corr_id):
+    if not uuid_corr_id:
+        init_headers()
+        uuid_corr_id = get_corr_id()
+
+    return _labelled_headers(uuid_corr_id, _attr_corr_id.get().items())
+
+
+def get_headers_value() -> str:
+    # JSON rendering of get_headers(), as sent in the correlation header. It is cached with the
+    # attributes and only rendered again once the corr id or the attributes change.
+    uuid_corr_id = get_corr_id()
+    if not uuid_corr_id:
         init_headers()
         uuid_corr_id = get_corr_id()
 
-    headers.append("{}{}".format(constants.UUID_CORRID_LABEL, uuid_corr_id))
+    return _attr_corr_id.get().header_value(uuid_corr_id)
 
-    attr_corr_ids = get_attrs()
-    attr_corr_ids_with_label = list(map(lambda item: "{}{}".format(constants.ATTR_CORRID_LABEL, item), attr_corr_ids))
-    headers.extend(attr_corr_ids_with_label)
 
+def _labelled_headers(uuid_corr_id: str, attr_corr_ids: Tuple[str, ...]) -> List[str]:
+    attr_label = constants.ATTR_CORRID_LABEL
+    headers = [constants.UUID_CORRID_LABEL + uuid_corr_id]
+    headers.extend([attr_label + item for item in attr_corr_ids])
     return headers
 
 
 def clean():
     _uuid_corr_id.set("")
-    _attr_corr_id.set([])
-    _log_context.set([])
+    _attr_corr_id.set(_EMPTY_ATTRIBUTES)
+    _log_context.set(None)
+
+
+def snapshot() -> ContextSnapshot:
+    return ContextSnapshot(_uuid_corr_id.get(), _attr_corr_id.get(), _log_context.get())
+
+
+def restore(context_snapshot: ContextSnapshot):
+    # replaces the corr id, attributes and context stack of the current context, run it in a copy of the context
+    # (contextvars.copy_context().run) where the values must not outlive the work, e.g. in pooled threads
+    _uuid_corr_id.set(context_snapshot.corr_id)
+    _attr_corr_id.set(context_snapshot._attributes)
+    _log_context.set(context_snapshot._log_context)
 
 
 def add_context(log_context: str) -> Token:
+    return _log_context.set(_ContextNode(log_context, _log_context.get()))
+
+
+def remove_top_context() -> Token:
     ctx = _log_context.get()
-    ctx.append(log_context)
-    return _log_context.set(ctx)
+    return _log_context.set(ctx.parent if ctx is not None else None)
+
+
+def remove_all_contexts() -> Token:
+    return _log_context.set(None)
+
 
+def scoped_context(log_context: str) -> _ScopedContext:
+    return _ScopedContext(log_context)
 
-def remove_top_context():
+
+def get_current_context() -> List[str]:
     ctx = _log_context.get()
-    ctx = ctx[:-1]
-    return _log_context.set(ctx)
+    return list(ctx.items()) if ctx is not None else []
 
 
-def remove_all_contexts():
-    return _log_context.set([])
+def get_rendered_context() -> str:
+    ctx = _log_context.get()
+    return ctx.rendered if ctx is not None else ""
 
 
-def get_current_context():
-    return _log_context.get()
+def get_rendered_corr_id() -> str:
+    corr_id = _uuid_corr_id.get()
+    ctx = _log_context.get()
+    return ctx.render_corr_id(corr_id) if ctx is not None else corr_id
@@ -0,0 +1,54 @@
+import asyncio
+import concurrent.futures
+import contextvars
+
+from caf_logger.mdal import corrid_store
+
+
+class ContextCall:
+    # Calls func with the corr id, attributes and MDAL contexts of the context it was created in. The call runs in a
+    # copy of the calling context, so a pooled thread or process keeps none of it for its next task. Picklable when
+    # func and its arguments are.
+    __slots__ = ('func', 'context_snapshot')
+
+    def __init__(self, func, context_snapshot=None):
+        self.func = func
+        self.context_snapshot = context_snapshot if context_snapshot is not None else corrid_store.snapshot()
+
+    def __call__(self, *args, **kwargs):
+        return contextvars.copy_context().run(self._run, args, kwargs)
+
+    def _run(self, args, kwargs):
+        corrid_store.restore(self.context_snapshot)
+        return self.func(*args, **kwargs)
+
+    def __reduce__(self):
+        return ContextCall, (self.func, self.context_snapshot)
+
+
+def with_context(func) -> ContextCall:
+    # e.g. pool.map(with_context(func), items) for a multiprocessing.Pool
+    return ContextCall(func)
+
+
+class CAFThreadPoolExecutor(concurrent.futures.ThreadPoolExecutor):
+    # A ThreadPoolExecutor whose tasks log with the corr id, attributes and MDAL contexts of the submitter
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(ContextCall(fn), *args, **kwargs)
+
+
+class CAFProcessPoolExecutor(concurrent.futures.ProcessPoolExecutor):
+    # A ProcessPoolExecutor whose tasks log with the corr id, attributes and MDAL contexts of the submitter
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(ContextCall(fn), *args, **kwargs)
+
+
+def run_in_executor(executor, func, *args):
+    # loop.run_in_executor() of the running event loop, keeping the CAF context of the calling task;
+    # executor None is the default executor of the loop
+    loop = asyncio.get_running_loop()
+    if not isinstance(executor, (CAFThreadPoolExecutor, CAFProcessPoolExecutor)):
+        func = ContextCall(func)
+    return loop.run_in_executor(executor, func, *args)
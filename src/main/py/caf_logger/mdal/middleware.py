@@ -1,23 +1,43 @@
 from caf_logger.mdal import corrid_store
 from caf_logger.mdal import constants
 import caf_logger.logger as caflogger
+from caf_logger import control
 from caf_logger import logging_codes
+from caf_logger import metrics
 from aiohttp import web
-import json
 
 logger = caflogger.get_logger("caf_logger.mdal")
 
+CONTROL_KEYS = ('levels', 'handler_levels', 'disabled_codes', 'sampling_ratios', 'rate_limits')
+
 @web.middleware
 async def read_write_mdal(request, handler):
 
-    if request.headers.get(constants.CORRID_HEADER_NAME) is None:
+    corr_id_header = request.headers.get(constants.CORRID_HEADER_NAME)
+    if corr_id_header is None:
         logger.info(logging_codes.WHI_CAF_MDAL_NO_CORRID)
         corrid_store.init_headers()
     else:
-        corrid_store.set_headers([request.headers[constants.CORRID_HEADER_NAME]])
+        corrid_store.set_headers([corr_id_header])
 
     response = await handler(request)
 
-    response.headers[constants.CORRID_HEADER_NAME] = json.dumps(corrid_store.get_headers())
+    response.headers[constants.CORRID_HEADER_NAME] = corrid_store.get_headers_value()
 
     return response
+
+
+async def logging_metrics(request):
+    return web.json_response(metrics.snapshot())
+
+
+async def logging_control(request):
+    if request.method == 'GET':
+        return web.json_response(control.get_state())
+    try:
+        changes = await request.json()
+        if not isinstance(changes, dict) or not set(changes) <= set(CONTROL_KEYS):
+            raise ValueError("Expected an object with any of the keys {}".format(", ".join(CONTROL_KEYS)))
+        return web.json_response(control.apply(**changes))
+    except (ValueError, TypeError, AttributeError) as e:
+        return web.json_response({'error': str(e)}, status=400)
@@ -25,3 +25,71 @@ def get_attr_corr_id(corr_id_list):
     attr_corr_id_list = filter(lambda item: item.startswith(constants.ATTR_CORRID_LABEL), corr_id_list)
     attr_corr_ids = map(_map_corr_id_value, attr_corr_id_list)
     return list(filter(None, attr_corr_ids))
+
+
+def parse_corr_id_header(header_values, max_length, max_attributes, max_scan_length=constants.MAX_HEADER_SCAN_LENGTH,
+                         delimiter=','):
+    # Walks the comma separated header values with str.find, returning the corr id (or None) and the attribute entries,
+    # so the work stays bounded whatever the header holds. Attributes are taken from the items that lie within the
+    # first max_length characters, at most max_attributes of them. Past that only the first corr id is searched for,
+    # within the first max_scan_length characters. Only the kept entries are copied out of the header.
+    uuid_corr_id = None
+    attr_corr_ids = []
+    attr_label = constants.ATTR_CORRID_LABEL
+    attr_label_length = len(attr_label)
+    offset = 0
+    for value in header_values:
+        if offset >= max_scan_length or (uuid_corr_id is not None and offset >= max_length):
+            break
+        attr_end = min(len(value), max(max_length - offset, 0))
+        start = 0
+        while start < attr_end and (uuid_corr_id is None or len(attr_corr_ids) < max_attributes):
+            end = value.find(delimiter, start, attr_end)
+            if end == -1:
+                if attr_end < len(value):
+                    # the item goes past max_length
+                    break
+                end = attr_end
+            if value.startswith(attr_label, start, end):
+                if len(attr_corr_ids) < max_attributes and end - start > attr_label_length:
+                    attr_corr_ids.append(value[start + attr_label_length:end])
+            elif uuid_corr_id is None:
+                uuid_corr_id = _corr_id_at(value, start, end)
+            start = end + 1
+        if uuid_corr_id is None:
+            uuid_corr_id = _find_corr_id(value, start, min(len(value), max_scan_length - offset), delimiter)
+        offset += len(value) + 1
+    return uuid_corr_id, attr_corr_ids
+
+
+def _corr_id_at(value, start, end):
+    # the corr id of the value[start:end] item, None when it is not a non-empty corrid: item
+    uuid_label = constants.UUID_CORRID_LABEL
+    if not value.startswith(uuid_label, start, end):
+        return None
+    start += len(uuid_label)
+    colon = value.find(':', start, end)
+    return value[start:colon if colon != -1 else end] or None
+
+
+def _find_corr_id(value, start, scan_end, delimiter):
+    # the first corr id of the items that start at or after start and end before scan_end
+    label = delimiter + constants.UUID_CORRID_LABEL
+    position = start if start < scan_end else -1
+    if position != -1 and not value.startswith(constants.UUID_CORRID_LABEL, position, scan_end):
+        position = value.find(label, position, scan_end)
+        if position != -1:
+            position += 1
+    while position != -1:
+        end = value.find(delimiter, position, scan_end)
+        if end == -1:
+            if scan_end < len(value):
+                return None
+            end = scan_end
+        corr_id = _corr_id_at(value, position, end)
+        if corr_id is not None:
+            return corr_id
+        position = value.find(label, end, scan_end)
+        if position != -1:
+            position += 1
+    return None
@@ -0,0 +1,83 @@
+import collections.abc
+import functools
+import string
+
+TEMPLATE_CACHE_SIZE = 1024
+
+_parser = string.Formatter()
+
+
+class CompiledTemplate:
+    __slots__ = ('template', 'arity', 'named', 'error', 'reported', '_format', '_constant')
+
+    def __init__(self, template):
+        self.template = template
+        self.arity = 0
+        self.named = False
+        self.error = None
+        self.reported = False
+        self._format = template.format
+        self._constant = None
+        try:
+            self._parse()
+        except ValueError as e:
+            self.error = str(e)
+
+    def _parse(self):
+        auto_numbered = False
+        manually_numbered = False
+        has_fields = False
+        for _, field_name, format_spec, _ in _parser.parse(self.template):
+            if field_name is None:
+                continue
+            has_fields = True
+            if format_spec and '{' in format_spec:
+                # nested replacement fields, leave the argument count unchecked
+                self.arity = None
+                return
+            first = field_name.split('.', 1)[0].split('[', 1)[0]
+            if first == '':
+                auto_numbered = True
+                self.arity += 1
+            elif first.isdigit():
+                manually_numbered = True
+                self.arity = max(self.arity, int(first) + 1)
+            else:
+                self.named = True
+        if auto_numbered and manually_numbered:
+            raise ValueError("cannot switch between automatic field numbering and manual field specification")
+        if not has_fields:
+            self._constant = self._format()
+
+    def check(self, args):
+        if self.error is not None:
+            return self.error
+        if self.arity is None:
+            return None
+        if isinstance(args, collections.abc.Mapping):
+            return None if self.arity == 0 else "template expects {} positional arguments".format(self.arity)
+        if self.named:
+            return "template expects named arguments"
+        if len(args) < self.arity:
+            return "template expects {} arguments, got {}".format(self.arity, len(args))
+        return None
+
+    def render(self, args):
+        if self._constant is not None:
+            return self._constant
+        try:
+            if isinstance(args, tuple):
+                return self._format(*args)
+            if isinstance(args, collections.abc.Mapping):
+                return self._format(**args)
+            return self._format(*args)
+        except (IndexError, KeyError, ValueError):
+            if self.check(args) is None:
+                raise
+            # already reported by the CAF logger when the template was first used
+            return "{} {}".format(self.template, repr(args))
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(template):
+    return CompiledTemplate(template)
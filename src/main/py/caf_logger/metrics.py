@@ -0,0 +1,155 @@
+import bisect
+import logging
+import threading
+import time
+import weakref
+
+# upper bounds of the latency histogram buckets in microseconds, the last bucket has no upper bound
+LATENCY_BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 50000)
+
+_BUCKET_BOUNDS_NS = tuple(bound * 1000 for bound in LATENCY_BUCKETS_US)
+_BUCKET_NAMES = tuple("<={}us".format(bound) for bound in LATENCY_BUCKETS_US) + (
+    ">{}us".format(LATENCY_BUCKETS_US[-1]),)
+
+_handler_stats = weakref.WeakKeyDictionary()
+_internal_errors = 0
+_internal_errors_lock = threading.Lock()
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total_ns')
+
+    def __init__(self):
+        self.counts = [0] * len(_BUCKET_NAMES)
+        self.total_ns = 0
+
+    def add(self, elapsed_ns):
+        self.counts[bisect.bisect_left(_BUCKET_BOUNDS_NS, elapsed_ns)] += 1
+        self.total_ns += elapsed_ns
+
+    def add_batch(self, elapsed_ns, count):
+        # count records written together, each one in the bucket of the average
+        self.counts[bisect.bisect_left(_BUCKET_BOUNDS_NS, elapsed_ns // count)] += count
+        self.total_ns += elapsed_ns
+
+    def snapshot(self):
+        counts = list(self.counts)
+        return {'count': sum(counts), 'sum_us': self.total_ns / 1000.0,
+                'buckets': {name: n for name, n in zip(_BUCKET_NAMES, counts) if n}}
+
+
+class _HandlerStats:
+    # Updated by the wrapped format and emit, which run under the handler lock, so no lock of its own is needed.
+    # Snapshots copy the counters with single C level calls.
+
+    def __init__(self):
+        self.records = {}
+        self.output_size = 0
+        self.format_latency = _Histogram()
+        self.emit_latency = _Histogram()
+
+    def snapshot(self):
+        return {'records': _records_by_code(self.records.copy().items()), 'bytes': self.output_size,
+                'format_latency': self.format_latency.snapshot(), 'emit_latency': self.emit_latency.snapshot()}
+
+
+def _records_by_code(counts):
+    records = {}
+    for (log_id, level_name), count in counts:
+        by_level = records.setdefault(log_id, {})
+        by_level[level_name] = by_level.get(level_name, 0) + count
+    return records
+
+
+def instrument_handler(handler):
+    # Wraps the handler's own format, emit and handle_batch so the output of the batch write paths is measured as well.
+    if handler in _handler_stats:
+        return _handler_stats[handler]
+    stats = _HandlerStats()
+    handler_format = handler.format
+    handler_emit = handler.emit
+    perf_counter_ns = time.perf_counter_ns
+    terminator_size = len(getattr(handler, 'terminator', ''))
+    records = stats.records
+    format_latency = stats.format_latency
+    emit_latency = stats.emit_latency
+
+    def format(record):
+        start = perf_counter_ns()
+        msg = handler_format(record)
+        format_latency.add(perf_counter_ns() - start)
+        if type(msg) is str:
+            stats.output_size += (len(msg) if msg.isascii() else len(msg.encode('utf-8'))) + terminator_size
+        key = (getattr(record, 'log_id', None) or '', record.levelname)
+        records[key] = records.get(key, 0) + 1
+        return msg
+
+    if hasattr(handler, 'bytes_written'):
+        # handlers that encode in emit, such as caf_logger.logging_binary.CAFBinaryFileHandler, count what they write
+        def emit(record):
+            start = perf_counter_ns()
+            written = handler.bytes_written
+            try:
+                handler_emit(record)
+            finally:
+                emit_latency.add(perf_counter_ns() - start)
+                stats.output_size += handler.bytes_written - written
+    else:
+        def emit(record):
+            start = perf_counter_ns()
+            try:
+                handler_emit(record)
+            finally:
+                emit_latency.add(perf_counter_ns() - start)
+
+    handler_handle_batch = getattr(handler, 'handle_batch', None)
+    if handler_handle_batch is None and type(handler).emit is logging.StreamHandler.emit:
+        # the batch path of caf_logger.logging_handler writes these handlers' streams without calling emit
+        def handler_handle_batch(records):
+            from caf_logger import logging_handler
+            logging_handler._write_stream_batch(handler, records)
+
+    if handler_handle_batch is not None:
+        def handle_batch(records):
+            start = perf_counter_ns()
+            try:
+                handler_handle_batch(records)
+            finally:
+                if records:
+                    emit_latency.add_batch(perf_counter_ns() - start, len(records))
+        handler.handle_batch = handle_batch
+    handler.format = format
+    handler.emit = emit
+    _handler_stats[handler] = stats
+    return stats
+
+
+def is_instrumented(handler):
+    return handler in _handler_stats
+
+
+def count_internal_error():
+    global _internal_errors
+    with _internal_errors_lock:
+        _internal_errors += 1
+
+
+def _handler_name(handler):
+    return handler.get_name() or "{}@{:x}".format(type(handler).__name__, id(handler))
+
+
+def snapshot():
+    # imported here, logging_handler is only needed by the handlers of asynchronous mode
+    from caf_logger import logging_handler
+    from caf_logger import payload
+    # closed handlers stay registered until collected, e.g. after the logging configuration was reloaded
+    handlers = {_handler_name(handler): stats.snapshot() for handler, stats in list(_handler_stats.items())
+                if not getattr(handler, '_closed', False)}
+    records = {}
+    for handler in handlers.values():
+        for log_id, by_level in handler['records'].items():
+            total = records.setdefault(log_id, {})
+            for level_name, count in by_level.items():
+                total[level_name] = total.get(level_name, 0) + count
+    return {'records': records, 'handlers': handlers, 'internal_errors': _internal_errors,
+            'truncated_events': payload.truncated_events(), 'queues': logging_handler.queue_stats()}
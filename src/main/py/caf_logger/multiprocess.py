@@ -0,0 +1,312 @@
+import argparse
+import logging
+import os
+import pickle
+import queue
+import selectors
+import signal
+import socket
+import stat
+import struct
+import sys
+import threading
+import time
+
+from caf_logger import lazy
+from caf_logger import logging_handler
+from caf_logger.tracebacks import CAFFormatter
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_PUT_TIMEOUT = 0.1
+DEFAULT_DRAIN_TIMEOUT = 5.0
+
+_HEADER = struct.Struct('>I')
+_SENTINEL = object()
+_RECV_SIZE = 1 << 16
+_POLL_INTERVAL = 0.1
+
+_collector = False
+
+
+class CAFSocketHandler(logging.Handler):
+    # Ships records from a worker process to the collector over a Unix socket. Records are rendered and pickled on the
+    # calling thread, a sender thread writes them in batches. When the bounded queue is full callers wait at most
+    # put_timeout, and not at all while the collector cannot be reached; records that do not fit are counted in dropped
+    # and written to stderr instead.
+
+    def __init__(self, address, batch_size=DEFAULT_BATCH_SIZE, queue_size=DEFAULT_QUEUE_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, put_timeout=DEFAULT_PUT_TIMEOUT):
+        super().__init__()
+        self.address = address
+        self.batch_size = batch_size
+        self.connect_timeout = connect_timeout
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._unreachable = False
+        self._queue = queue.Queue(queue_size)
+        self._socket = None
+        self._exception_formatter = CAFFormatter()
+        self._sender = threading.Thread(target=self._send_batches, name="CAFSocketSender", daemon=True)
+        self._sender.start()
+
+    def _frame(self, record):
+        record_dict = {key: lazy.resolve(value) for key, value in record.__dict__.items()}
+        if record.args or type(record.__dict__.get('event')) is lazy.LazyJson:
+            record_dict['msg'] = record.getMessage()
+            record_dict['args'] = None
+        if record.exc_info:
+            record_dict['exc_text'] = record.exc_text or self._exception_formatter.formatException(record.exc_info)
+        record_dict['exc_info'] = None
+        record_dict.pop('message', None)
+        payload = pickle.dumps(record_dict, pickle.HIGHEST_PROTOCOL)
+        return _HEADER.pack(len(payload)) + payload
+
+    def emit(self, record):
+        try:
+            frame = self._frame(record)
+        except Exception:
+            self.handleError(record)
+            return
+        if not self._sender.is_alive():
+            # closed, the sender thread is gone
+            self._drop(record)
+            return
+        try:
+            if self._unreachable:
+                self._queue.put_nowait(frame)
+            else:
+                self._queue.put(frame, timeout=self.put_timeout)
+        except queue.Full:
+            self._drop(record)
+
+    def _count_dropped(self, count):
+        with self._dropped_lock:
+            self.dropped += count
+
+    def _drop(self, record):
+        self._count_dropped(1)
+        try:
+            sys.stderr.write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def _send_batches(self):
+        while True:
+            frames = [self._queue.get()]
+            while len(frames) < self.batch_size:
+                try:
+                    frames.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = _SENTINEL in frames
+            data = b''.join(frame for frame in frames if frame is not _SENTINEL)
+            if data:
+                self._send(data, len(frames) - stop)
+            for _ in frames:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _connect(self):
+        # a single attempt while the collector is known to be unreachable
+        deadline = time.monotonic() + (0 if self._unreachable else self.connect_timeout)
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.address)
+                return sock
+            except OSError:
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(_POLL_INTERVAL)
+
+    def _send(self, data, count):
+        for attempt in range(2):
+            try:
+                if self._socket is None:
+                    self._socket = self._connect()
+                self._socket.sendall(data)
+                self._unreachable = False
+                return
+            except OSError:
+                if self._socket is not None:
+                    self._socket.close()
+                    self._socket = None
+        self._unreachable = True
+        self._count_dropped(count)
+        sys.stderr.write("Failed to send {} log records to the collector at {}\n".format(count, self.address))
+
+    def flush(self):
+        if self._sender.is_alive():
+            self._queue.join()
+
+    def close(self):
+        self.acquire()
+        try:
+            if self._sender.is_alive():
+                self._queue.put(_SENTINEL)
+                self._sender.join()
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+        finally:
+            self.release()
+        super().close()
+
+
+class _Connection:
+    __slots__ = ('sock', 'buffer')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+
+    def records(self):
+        records = []
+        buffer = self.buffer
+        offset = 0
+        while len(buffer) - offset >= _HEADER.size:
+            size, = _HEADER.unpack_from(buffer, offset)
+            end = offset + _HEADER.size + size
+            if len(buffer) < end:
+                break
+            records.append(logging.makeLogRecord(pickle.loads(buffer[offset + _HEADER.size:end])))
+            offset = end
+        del buffer[:offset]
+        return records
+
+
+class CAFRecordCollector:
+    # Receives records from the worker processes and hands them to the handlers of this process, so a single writer
+    # formats and writes every line. Records that arrive together are written as one batch.
+
+    def __init__(self, address):
+        self.address = address
+        self._stop = threading.Event()
+        # a socket left behind by a collector that was killed is replaced, any other file is left alone
+        if _is_socket(address):
+            os.remove(address)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # records are unpickled, only the user running the collector may connect; the socket is created with these
+        # permissions rather than changed after bind()
+        umask = os.umask(0o177)
+        try:
+            self._listener.bind(address)
+        except OSError:
+            self._listener.close()
+            raise
+        finally:
+            os.umask(umask)
+        self._listener.listen()
+        self._listener.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+
+    def serve_forever(self, drain_timeout=DEFAULT_DRAIN_TIMEOUT):
+        try:
+            while not self._stop.is_set():
+                self._poll(_POLL_INTERVAL)
+            self._selector.unregister(self._listener)
+            self._listener.close()
+            # read what the workers already sent, until nothing arrives for a poll interval
+            deadline = time.monotonic() + drain_timeout
+            while len(self._selector.get_map()) and time.monotonic() < deadline:
+                if not self._poll(_POLL_INTERVAL):
+                    break
+        finally:
+            for key in list(self._selector.get_map().values()):
+                key.fileobj.close()
+            self._selector.close()
+            if _is_socket(self.address):
+                os.remove(self.address)
+            for logger_name in ("", "WHI", "MDAL"):
+                for handler in logging.getLogger(logger_name or None).handlers:
+                    handler.flush()
+
+    def _poll(self, timeout):
+        events = self._selector.select(timeout)
+        for key, _ in events:
+            if key.fileobj is self._listener:
+                sock, _ = self._listener.accept()
+                sock.setblocking(False)
+                self._selector.register(sock, selectors.EVENT_READ, _Connection(sock))
+            else:
+                self._read(key.data)
+        return bool(events)
+
+    def _read(self, connection):
+        try:
+            data = connection.sock.recv(_RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._selector.unregister(connection.sock)
+            connection.sock.close()
+            return
+        connection.buffer += data
+        _dispatch(connection.records())
+
+    def stop(self):
+        self._stop.set()
+
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+def _dispatch(records):
+    # consecutive records of the same logger are handed over together
+    start = 0
+    for index in range(1, len(records) + 1):
+        if index == len(records) or records[index].name != records[start].name:
+            logger = logging.getLogger(records[start].name)
+            logging_handler.call_handlers_batch(logger, records[start:index])
+            start = index
+
+
+def install_socket_handler(loggers, address, batch_size=DEFAULT_BATCH_SIZE, queue_size=DEFAULT_QUEUE_SIZE):
+    handler = CAFSocketHandler(address, batch_size=batch_size, queue_size=queue_size)
+    handler.set_name("collector")
+    for logger in loggers:
+        for existing in list(logger.handlers):
+            logger.removeHandler(existing)
+            existing.close()
+        logger.addHandler(handler)
+    return handler
+
+
+def is_collector():
+    return _collector
+
+
+def run_collector(address, config_file=None):
+    # The collector loads the same configuration as the workers, collector_address only applies to the workers.
+    global _collector
+    import caf_logger.logger as caflogger
+    _collector = True
+    caflogger.configure(config_file=config_file)
+    collector = CAFRecordCollector(address)
+    signal.signal(signal.SIGTERM, lambda signum, frame: collector.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: collector.stop())
+    collector.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collects the log records of CAF worker processes and writes them")
+    parser.add_argument("address", help="path of the Unix socket the workers connect to")
+    parser.add_argument("--config", help="logging configuration file of the collector")
+    args = parser.parse_args(argv)
+    run_collector(args.address, args.config)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import itertools
+import sys
+import threading
+
+DEFAULT_MAX_DEPTH = 32
+DEFAULT_MAX_KEYS = 10000
+DEFAULT_MAX_STRING_LENGTH = 65536
+DEFAULT_MAX_SIZE = 1048576
+
+TRUNCATED_KEY = "[truncated]"
+_TRUNCATED_KEYS = "{} more keys"
+_TRUNCATED_ITEMS = "[truncated: {} more items]"
+_TRUNCATED_STRING = "...[truncated: {} more characters]"
+_TRUNCATED_DEPTH = "[truncated: nested deeper than {}]"
+
+_truncated_events = 0
+_truncated_events_lock = threading.Lock()
+
+
+class PayloadLimits:
+    # Limits of an MDAL event payload: the nesting depth, the keys of a dict or items of a list, the length of a string
+    # and the encoded size in characters, counted before JSON escaping. 0 is unlimited.
+    __slots__ = ('max_depth', 'max_keys', 'max_string_length', 'max_size', 'unlimited')
+
+    def __init__(self, max_depth=DEFAULT_MAX_DEPTH, max_keys=DEFAULT_MAX_KEYS,
+                 max_string_length=DEFAULT_MAX_STRING_LENGTH, max_size=DEFAULT_MAX_SIZE):
+        self.unlimited = not (max_depth or max_keys or max_string_length or max_size)
+        self.max_depth = int(max_depth) or sys.maxsize
+        self.max_keys = int(max_keys) or sys.maxsize
+        self.max_string_length = int(max_string_length) or sys.maxsize
+        self.max_size = int(max_size) or sys.maxsize
+
+
+_limits = PayloadLimits()
+
+
+def configure(max_depth=DEFAULT_MAX_DEPTH, max_keys=DEFAULT_MAX_KEYS, max_string_length=DEFAULT_MAX_STRING_LENGTH,
+              max_size=DEFAULT_MAX_SIZE):
+    global _limits
+    _limits = PayloadLimits(max_depth, max_keys, max_string_length, max_size)
+
+
+def get_limits():
+    return _limits
+
+
+def truncated_events():
+    return _truncated_events
+
+
+# the encoded size counted for numbers, booleans and None, it is not worth computing exactly
+_SCALAR_SIZE = 8
+
+
+class _Bounder:
+    # Walks a payload once and stops as soon as a limit is reached, the rest of a large payload is never visited.
+    # Containers are copied only when something inside them was truncated. Strings and nested containers are the
+    # common case and are checked inline, everything else is delegated to bound_value().
+    __slots__ = ('max_depth', 'max_keys', 'max_string_length', 'remaining', 'truncated')
+
+    def __init__(self, limits):
+        self.max_depth = limits.max_depth
+        self.max_keys = limits.max_keys
+        self.max_string_length = limits.max_string_length
+        self.remaining = limits.max_size
+        self.truncated = False
+
+    def bound_value(self, value, depth):
+        value_type = type(value)
+        if value_type is str:
+            return self._bound_string(value)
+        if value_type is dict:
+            return self._bound_dict(value, depth + 1)
+        if value_type is list or value_type is tuple:
+            return self._bound_list(value, depth + 1)
+        if isinstance(value, dict):
+            return self._bound_dict(value, depth + 1)
+        if isinstance(value, (list, tuple)):
+            return self._bound_list(value, depth + 1)
+        if value is None or value_type is bool or value_type is int or value_type is float:
+            self.remaining -= _SCALAR_SIZE
+        else:
+            # serialized with str() by the JSON formatter
+            self.remaining -= len(str(value)) + 2
+        return value
+
+    def _bound_string(self, value):
+        limit = min(self.max_string_length, max(self.remaining - 2, 0))
+        if len(value) > limit:
+            self.truncated = True
+            value = value[:limit] + _TRUNCATED_STRING.format(len(value) - limit)
+        self.remaining -= len(value) + 2
+        return value
+
+    def _too_deep(self):
+        self.truncated = True
+        marker = _TRUNCATED_DEPTH.format(self.max_depth)
+        self.remaining -= len(marker) + 2
+        return marker
+
+    def _bound_dict(self, value, depth):
+        if depth > self.max_depth:
+            return self._too_deep()
+        max_keys = self.max_keys
+        max_string_length = self.max_string_length
+        remaining = self.remaining - 2
+        bounded_dict = None
+        index = 0
+        for key, item in value.items():
+            if index >= max_keys or remaining <= 0:
+                self.truncated = True
+                if bounded_dict is None:
+                    bounded_dict = dict(itertools.islice(value.items(), index))
+                bounded_dict[TRUNCATED_KEY] = _TRUNCATED_KEYS.format(len(value) - index)
+                self.remaining = remaining
+                return bounded_dict
+            remaining -= (len(key) if type(key) is str else len(str(key))) + 6
+            item_type = type(item)
+            if item_type is str and len(item) <= max_string_length and len(item) + 2 < remaining:
+                remaining -= len(item) + 2
+                bounded = item
+            elif item_type is int or item_type is float or item_type is bool or item is None:
+                remaining -= _SCALAR_SIZE
+                bounded = item
+            else:
+                self.remaining = remaining
+                if item_type is dict:
+                    bounded = self._bound_dict(item, depth + 1)
+                else:
+                    bounded = self.bound_value(item, depth)
+                remaining = self.remaining
+                if bounded is not item and bounded_dict is None:
+                    bounded_dict = dict(itertools.islice(value.items(), index))
+            if bounded_dict is not None:
+                bounded_dict[key] = bounded
+            index += 1
+        self.remaining = remaining
+        return value if bounded_dict is None else bounded_dict
+
+    def _bound_list(self, value, depth):
+        if depth > self.max_depth:
+            return self._too_deep()
+        max_keys = self.max_keys
+        max_string_length = self.max_string_length
+        remaining = self.remaining - 2
+        bounded_list = None
+        index = 0
+        for item in value:
+            if index >= max_keys or remaining <= 0:
+                self.truncated = True
+                if bounded_list is None:
+                    bounded_list = list(value[:index])
+                bounded_list.append(_TRUNCATED_ITEMS.format(len(value) - index))
+                self.remaining = remaining
+                return bounded_list
+            remaining -= 2
+            item_type = type(item)
+            if item_type is str and len(item) <= max_string_length and len(item) + 2 < remaining:
+                remaining -= len(item) + 2
+                bounded = item
+            elif item_type is int or item_type is float or item_type is bool or item is None:
+                remaining -= _SCALAR_SIZE
+                bounded = item
+            else:
+                self.remaining = remaining
+                if item_type is dict:
+                    bounded = self._bound_dict(item, depth + 1)
+                else:
+                    bounded = self.bound_value(item, depth)
+                remaining = self.remaining
+                if bounded is not item and bounded_list is None:
+                    bounded_list = list(value[:index])
+            if bounded_list is not None:
+                bounded_list.append(bounded)
+            index += 1
+        self.remaining = remaining
+        return value if bounded_list is None else bounded_list
+
+
+def bound(event_info, limits=None):
+    # event_info itself when it is within the limits, otherwise a copy truncated where a limit was reached, with markers
+    # in place of what was left out; truncated payloads are counted in caf_logger.metrics
+    global _truncated_events
+    limits = limits or _limits
+    if limits.unlimited:
+        return event_info
+    bounder = _Bounder(limits)
+    bounded = bounder.bound_value(event_info, 0)
+    if bounder.truncated:
+        with _truncated_events_lock:
+            _truncated_events += 1
+    return bounded
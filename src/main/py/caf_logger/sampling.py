@@ -0,0 +1,215 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from caf_logger import logging_codes
+
+DEFAULT_SUMMARY_INTERVAL = 60.0
+SUMMARY_LOGGER_NAME = "WHI.caf_logger.sampling"
+
+
+class Rule:
+    __slots__ = ('ratio', 'rate', 'burst')
+
+    def __init__(self, ratio=1.0, rate=None, burst=None):
+        if not 0.0 <= ratio <= 1.0:
+            raise ValueError("Sampling ratio must be between 0 and 1, got {}".format(ratio))
+        if rate is not None and rate <= 0:
+            raise ValueError("Rate limit must be positive, got {}".format(rate))
+        self.ratio = ratio
+        self.rate = rate
+        self.burst = max(burst if burst is not None else rate, 1) if rate is not None else None
+
+    def initial_state(self, now):
+        # [sampling credit, available tokens, time of the last refill], the first record is kept unless the ratio is 0
+        return [1.0 if self.ratio > 0 else 0.0, self.burst or 0.0, now]
+
+    def allow(self, state, now):
+        if self.ratio < 1.0:
+            if state[0] < 1.0:
+                state[0] += self.ratio
+                return False
+            state[0] += self.ratio - 1.0
+        if self.rate is not None:
+            state[1] = min(self.burst, state[1] + (now - state[2]) * self.rate)
+            state[2] = now
+            if state[1] < 1.0:
+                return False
+            state[1] -= 1.0
+        return True
+
+
+class SamplingRules:
+    # Immutable once built, replaced as a whole by set_rules so the logging path never sees a partial update.
+
+    def __init__(self, ratios=None, rate_limits=None, summary_interval=DEFAULT_SUMMARY_INTERVAL, disabled=()):
+        self.ratios = {_rule_key(key): float(ratio) for key, ratio in (ratios or {}).items()}
+        self.rate_limits = {_rule_key(key): _rate_and_burst(limit) for key, limit in (rate_limits or {}).items()}
+        rules = {}
+        for key in set(self.ratios) | set(self.rate_limits):
+            rate, burst = self.rate_limits.get(key, (None, None))
+            rules[key] = Rule(self.ratios.get(key, 1.0), rate, burst)
+        self.by_log_id = {key: rule for key, rule in rules.items() if not isinstance(key, int)}
+        self.by_level = {key: rule for key, rule in rules.items() if isinstance(key, int)}
+        self.summary_interval = float(summary_interval)
+        # records of disabled codes are dropped without being counted as suppressed
+        self.disabled = frozenset(disabled)
+
+    def is_empty(self):
+        return not (self.by_log_id or self.by_level or self.disabled)
+
+    def rule_for(self, log_id, levelno):
+        rule = self.by_log_id.get(log_id)
+        return rule if rule is not None else self.by_level.get(levelno)
+
+
+def _rule_key(key):
+    # level names and numbers select per-level rules, anything else is a log_id
+    if isinstance(key, int):
+        return key
+    level = logging.getLevelName(key)
+    return level if isinstance(level, int) else key
+
+
+def _rate_and_burst(limit):
+    if isinstance(limit, str):
+        rate, _, burst = limit.partition('/')
+        return float(rate), float(burst) if burst else None
+    if isinstance(limit, (tuple, list)):
+        rate, burst = limit
+        return float(rate), float(burst) if burst is not None else None
+    return float(limit), None
+
+
+def parse_spec(spec):
+    # "CORRIDNOTPRESENT:0.1, INFO:0.5" -> {'CORRIDNOTPRESENT': '0.1', 'INFO': '0.5'}
+    entries = {}
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if entry:
+            key, separator, value = entry.rpartition(':')
+            if not separator or not key.strip():
+                raise ValueError("Invalid sampling entry [{}], expected <log_id or level>:<value>".format(entry))
+            entries[key.strip()] = value.strip()
+    return entries
+
+
+def parse_codes(spec):
+    return [code.strip() for code in spec.split(',') if code.strip()]
+
+
+_rules = None
+_lock = threading.Lock()
+_state = {}
+_suppressed = {}
+_summary_started = time.monotonic()
+_stop_reporter = threading.Event()
+
+
+def allow(log_id, levelno):
+    rules = _rules
+    if rules is None:
+        return True
+    if log_id in rules.disabled:
+        return False
+    rule = rules.rule_for(log_id, levelno)
+    if rule is None:
+        return True
+    now = time.monotonic()
+    summary = None
+    with _lock:
+        state = _state.get(rule)
+        if state is None:
+            state = _state[rule] = rule.initial_state(now)
+        allowed = rule.allow(state, now)
+        if not allowed:
+            _suppressed[log_id] = _suppressed.get(log_id, 0) + 1
+        if now - _summary_started >= rules.summary_interval:
+            summary = _take_summary(now)
+    if summary is not None:
+        _log_summary(*summary)
+    return allowed
+
+
+def _take_summary(now):
+    global _suppressed, _summary_started
+    summary = (_suppressed, now - _summary_started)
+    _suppressed = {}
+    _summary_started = now
+    return summary
+
+
+def _log_summary(suppressed, elapsed):
+    logger = logging.getLogger(SUMMARY_LOGGER_NAME)
+    log_id, msg = logging_codes.WHI_CAF_LOGGER_SUPPRESSED
+    for suppressed_log_id, count in sorted(suppressed.items()):
+        logger.warning(msg, count, suppressed_log_id, int(round(elapsed)),
+                       extra={'log_id': log_id, 'corr_id': ''})
+
+
+def _report_periodically(stop, interval):
+    # reports the summary when it is due even if no further record of a sampled log_id is logged
+    delay = interval
+    while not stop.wait(delay):
+        summary = None
+        with _lock:
+            now = time.monotonic()
+            delay = _summary_started + interval - now
+            if delay <= 0:
+                summary = _take_summary(now)
+                delay = interval
+        if summary is not None:
+            try:
+                _log_summary(*summary)
+            except Exception:
+                # reported by the handlers, keep reporting
+                pass
+
+
+def flush_summary():
+    with _lock:
+        summary = _take_summary(time.monotonic())
+    _log_summary(*summary)
+
+
+def suppressed_counts():
+    with _lock:
+        return dict(_suppressed)
+
+
+def current_rules():
+    return _rules if _rules is not None else SamplingRules()
+
+
+def set_rules(ratios=None, rate_limits=None, summary_interval=DEFAULT_SUMMARY_INTERVAL, disabled=()):
+    global _rules, _stop_reporter
+    rules = SamplingRules(ratios, rate_limits, summary_interval, disabled)
+    if rules.is_empty():
+        rules = None
+    _stop_reporter.set()
+    flush_summary()
+    with _lock:
+        _state.clear()
+        _rules = rules
+    if rules is not None and rules.summary_interval > 0:
+        _stop_reporter = threading.Event()
+        threading.Thread(target=_report_periodically, args=(_stop_reporter, rules.summary_interval),
+                         name="CAFSamplingSummary", daemon=True).start()
+
+
+def clear_rules():
+    set_rules()
+
+
+def configure(caf_options):
+    ratios = os.getenv('WHI_CAF_LOGGING_SAMPLING', caf_options.get('sampling', ''))
+    rate_limits = os.getenv('WHI_CAF_LOGGING_RATE_LIMIT', caf_options.get('rate_limit', ''))
+    summary_interval = os.getenv('WHI_CAF_LOGGING_SUPPRESSION_SUMMARY_INTERVAL',
+                                 caf_options.get('suppression_summary_interval', DEFAULT_SUMMARY_INTERVAL))
+    disabled = os.getenv('WHI_CAF_LOGGING_DISABLED_CODES', caf_options.get('disabled_codes', ''))
+    set_rules(parse_spec(ratios), parse_spec(rate_limits), summary_interval, parse_codes(disabled))
+
+
+atexit.register(flush_summary)
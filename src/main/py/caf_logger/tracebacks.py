@@ -0,0 +1,173 @@
+import collections
+import logging
+import threading
+import time
+import traceback
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_WINDOW = 0.0
+
+_FINGERPRINT_LINE = "Traceback fingerprint: {}"
+_REPEATED_LINE = "Traceback fingerprint: {} (repeated, the full traceback was logged before)"
+
+
+class _CacheEntry:
+    __slots__ = ('text', 'fingerprint', 'exception_only')
+
+    def __init__(self, text, fingerprint):
+        self.text = text
+        self.fingerprint = fingerprint
+        self.exception_only = None
+
+
+class CAFTracebackCache:
+    # A bounded LRU of formatted tracebacks. Formatting walks every frame and reads its source line, the key is only
+    # the code locations of the frames and the type and message of each exception in the chain.
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = CAFTracebackCache()
+_window = DEFAULT_WINDOW
+_window_lock = threading.Lock()
+
+
+def configure(cache_size=DEFAULT_CACHE_SIZE, window=DEFAULT_WINDOW):
+    # window > 0 writes the full traceback of a fingerprint once per window and handler, repeats within the window
+    # only name the fingerprint after the exception message
+    global _cache, _window
+    if int(cache_size) != _cache.max_entries:
+        _cache = CAFTracebackCache(int(cache_size))
+    _window = float(window)
+
+
+def get_cache():
+    return _cache
+
+
+def _exception_chain(exc_value, exc_traceback):
+    # the exceptions in the order traceback.format_exception prints them, with the traceback of each
+    chain = []
+    seen = set()
+    while exc_value is not None and id(exc_value) not in seen:
+        seen.add(id(exc_value))
+        chain.append((exc_value, exc_traceback))
+        if exc_value.__cause__ is not None:
+            exc_value = exc_value.__cause__
+        elif exc_value.__context__ is not None and not exc_value.__suppress_context__:
+            exc_value = exc_value.__context__
+        else:
+            break
+        exc_traceback = exc_value.__traceback__
+    chain.reverse()
+    return chain
+
+
+def _frames(tb):
+    # tb_lasti is part of the key, Python 3.11 marks the failing expression of the line
+    frames = []
+    while tb is not None:
+        frames.append((tb.tb_frame.f_code, tb.tb_lineno, tb.tb_lasti))
+        tb = tb.tb_next
+    return tuple(frames)
+
+
+def _cache_key(exc_info):
+    exc_type, exc_value, exc_traceback = exc_info
+    return tuple((type(exc), str(exc), tuple(getattr(exc, '__notes__', None) or ()), _frames(tb))
+                 for exc, tb in _exception_chain(exc_value, exc_traceback))
+
+
+def exception_fingerprint(exc_info):
+    # the same for every occurrence of an exception type raised through the same code locations, whatever the message
+    # imported here, hashlib is a noticeable part of the import time of the formatters
+    import hashlib
+    exc_type, exc_value, exc_traceback = exc_info
+    digest = hashlib.sha1()
+    for exc, tb in _exception_chain(exc_value, exc_traceback):
+        digest.update("{}.{}".format(type(exc).__module__, type(exc).__qualname__).encode('utf-8', 'backslashreplace'))
+        while tb is not None:
+            code = tb.tb_frame.f_code
+            digest.update(" {}:{}:{}".format(code.co_filename, tb.tb_lineno, code.co_name)
+                          .encode('utf-8', 'backslashreplace'))
+            tb = tb.tb_next
+        digest.update(b"\n")
+    return digest.hexdigest()[:16]
+
+
+class CAFTracebackFormatterMixin:
+    # Caches formatException() of logging.Formatter subclasses by exception fingerprint, and with a traceback window
+    # configured refers to a traceback that was already written by its fingerprint.
+
+    def formatException(self, ei):
+        if ei[1] is None:
+            return super().formatException(ei)
+        try:
+            key = _cache_key(ei)
+        except Exception:
+            # e.g. an exception whose __str__ fails, it is formatted the usual way
+            return super().formatException(ei)
+        cache = _cache
+        entry = cache.get(key)
+        if entry is None:
+            entry = _CacheEntry(super().formatException(ei), exception_fingerprint(ei))
+            cache.put(key, entry)
+        if _window <= 0:
+            return entry.text
+        return self._format_in_window(ei, entry)
+
+    def _format_in_window(self, ei, entry):
+        now = time.monotonic()
+        with _window_lock:
+            seen = self.__dict__.setdefault('_caf_tracebacks_seen', collections.OrderedDict())
+            first_seen = seen.get(entry.fingerprint)
+            repeated = first_seen is not None and now - first_seen < _window
+            if not repeated:
+                seen[entry.fingerprint] = now
+                seen.move_to_end(entry.fingerprint)
+                while len(seen) > max(_cache.max_entries, 1):
+                    seen.popitem(last=False)
+        if not repeated:
+            return entry.text + "\n" + _FINGERPRINT_LINE.format(entry.fingerprint)
+        if entry.exception_only is None:
+            exception_only = "".join(traceback.format_exception_only(ei[0], ei[1])).rstrip("\n")
+            entry.exception_only = exception_only + "\n" + _REPEATED_LINE.format(entry.fingerprint)
+        return entry.exception_only
+
+
+class CAFFormatter(CAFTracebackFormatterMixin, logging.Formatter):
+    # the text formatter of the WHI/MDAL loggers, logging.Formatter with the traceback cache. It is defined here rather
+    # than in caf_logger.logging_formatter, so text configurations do not import the JSON formatter's dependencies.
+    pass
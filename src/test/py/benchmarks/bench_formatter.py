@@ -0,0 +1,55 @@
+import logging
+import platform
+import timeit
+
+from pythonjsonlogger import jsonlogger
+
+from caf_logger import logging_formatter
+
+_FORMAT = "%(message)%(levelname)%(name)%(asctime)%(threadName)"
+_DATEFMT = "%Y-%m-%dT%H:%M:%SZ"
+_NUMBER = 20000
+_REPEAT = 5
+
+
+class _PreviousCAFJsonFormatter(jsonlogger.JsonFormatter):
+
+    def process_log_record(self, log_record):
+        log_record['HOSTNAME'] = platform.node()
+        for k, v in logging_formatter._ATTR_MAP.items():
+            if k in log_record:
+                log_record[v] = log_record.pop(k)
+        return jsonlogger.JsonFormatter.process_log_record(self, log_record)
+
+
+def _mdal_record():
+    record = logging.LogRecord("MDAL.bench", 22, __file__, 1, "Event recorded", None, None)
+    record.log_id = 'MDALEVENT'
+    record.corr_id = '0b7c4a52-5a3e-4f1c-9a0e-6f1b1f0c2d11'
+    record.__dict__['WHI-CONTEXT'] = 'ingest|study|series'
+    record.event = {'name': 'eventA', 'status': 'started', 'items': list(range(10))}
+    for i in range(5):
+        setattr(record, 'ATTR{}'.format(i), 'value{}'.format(i))
+    return record
+
+
+def _records_per_second(formatter, record):
+    timer = timeit.Timer(lambda: formatter.format(record))
+    return _NUMBER / min(timer.repeat(repeat=_REPEAT, number=_NUMBER))
+
+
+def main():
+    record = _mdal_record()
+    formatters = [
+        ("previous CAFJsonFormatter", _PreviousCAFJsonFormatter(_FORMAT, _DATEFMT)),
+        ("CAFJsonFormatter (json)", logging_formatter.CAFJsonFormatter(_FORMAT, _DATEFMT)),
+    ]
+    if logging_formatter.orjson is not None:
+        formatters.append(("CAFJsonFormatter (orjson)", logging_formatter.CAFJsonFormatter(
+            _FORMAT, _DATEFMT, json_encoder_name=logging_formatter.JSON_ENCODER_ORJSON)))
+    for name, formatter in formatters:
+        print("{:<30} {:>12.0f} records/s".format(name, _records_per_second(formatter, record)))
+
+
+if __name__ == '__main__':
+    main()
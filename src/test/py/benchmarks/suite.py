@@ -0,0 +1,332 @@
+import argparse
+import contextlib
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
+import tracemalloc
+
+from aiohttp import test_utils, web
+
+import caf_logger.logger as caflogger
+from caf_logger import logging_formatter
+from caf_logger import logging_handler
+from caf_logger.mdal import constants
+from caf_logger.mdal import corrid_store
+from caf_logger.mdal import middleware
+
+BENCH_LOG_MESSAGE = ("CAFBENCH001", "Benchmark message with arguments: {} {}")
+
+CONTEXT_DEPTH = 4
+ATTRIBUTE_COUNT = 10
+STACK_DEPTH = 10
+CORR_ID = "0b7c4a52-5a3e-4f1c-9a0e-6f1b1f0c2d11"
+
+_JSON_FORMAT = "%(message)%(levelname)%(name)%(asctime)%(threadName)"
+_JSON_DATEFMT = "%Y-%m-%dT%H:%M:%SZ"
+_HANDLER_FORMAT = "%(asctime)s [%(levelname)s] [%(name)s] - %(message)s"
+_ROTATE_BYTES = 1 << 20
+_BACKUP_COUNT = 5
+_REPEAT = 5
+_MIN_TIME = 0.2
+_DEFAULT_THRESHOLD = 0.10
+
+
+class _NullStream:
+    # formatted output is dropped without a system call, so only the CPU cost is measured
+
+    def write(self, s):
+        return len(s)
+
+    def flush(self):
+        pass
+
+
+def _null_sink(logger, formatter):
+    sink = logging.StreamHandler(_NullStream())
+    sink.setFormatter(formatter)
+    logger.handlers = [sink]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+
+def _payload(size):
+    if size == 'small':
+        return {'name': 'eventA', 'status': 'started', 'count': 3}
+    return {'name': 'eventA', 'status': 'started',
+            'items': [{'id': i, 'path': '/studies/1.2.3/series/{}'.format(i), 'size': i * 1024} for i in range(20)],
+            'tags': {'TAG{}'.format(i): 'value{}'.format(i) for i in range(20)}}
+
+
+def _header():
+    attrs = ",".join("attr:NAME{}:value{}".format(i, i) for i in range(ATTRIBUTE_COUNT))
+    return "corrid:{},{}".format(CORR_ID, attrs)
+
+
+def _set_mdal_context():
+    corrid_store.set_headers([_header()])
+    corrid_store.remove_all_contexts()
+    for i in range(CONTEXT_DEPTH):
+        corrid_store.add_context("context{}".format(i))
+
+
+def _mdal_record():
+    record = logging.LogRecord("MDAL.bench", caflogger.MDAL_LEVEL_NUM, __file__, 1, "Event recorded", None, None)
+    record.log_id = 'MDALEVENT'
+    record.corr_id = CORR_ID
+    record.__dict__['WHI-CONTEXT'] = '|'.join("context{}".format(i) for i in range(CONTEXT_DEPTH))
+    record.event = _payload('large')
+    for i in range(ATTRIBUTE_COUNT):
+        setattr(record, 'NAME{}'.format(i), 'value{}'.format(i))
+    return record
+
+
+def _raise_nested(depth):
+    if depth == 0:
+        raise ValueError("Benchmark failure")
+    _raise_nested(depth - 1)
+
+
+def _error_with_traceback(logger):
+    try:
+        _raise_nested(STACK_DEPTH)
+    except ValueError as error:
+        logger.error(BENCH_LOG_MESSAGE, "arg1", 42, exc_info=error)
+
+
+def _run_coroutine(coroutine):
+    # the benchmarked handlers complete without suspending, so no event loop iteration is measured
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("The benchmarked coroutine suspended")
+
+
+async def _respond(request):
+    return web.Response(text="ok")
+
+
+async def _respond_setting_attribute(request):
+    corrid_store.set_attr("STUDY", "1.2.3.4")
+    return web.Response(text="ok")
+
+
+def _drain(read_fd):
+    while os.read(read_fd, 1 << 16):
+        pass
+
+
+def _pipe_stream(cleanup):
+    # a pipe read by another thread, so the cost of the write system calls is included
+    read_fd, write_fd = os.pipe()
+    threading.Thread(target=_drain, args=(read_fd,), daemon=True).start()
+    return cleanup.enter_context(os.fdopen(write_fd, 'w'))
+
+
+def _handler_logger(name, handler, cleanup):
+    cleanup.callback(handler.close)
+    handler.setFormatter(logging.Formatter(_HANDLER_FORMAT))
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return lambda: logger.info('Benchmark message with arguments: %s %s', 'a', 1)
+
+
+def _gzip_rotator(source, dest):
+    # the stdlib recipe for compressed backups, runs on the logging thread during rollover
+    with open(source, 'rb') as source_file, gzip.open(dest, 'wb') as dest_file:
+        shutil.copyfileobj(source_file, dest_file)
+    os.remove(source)
+
+
+def _handler_benchmarks(cleanup):
+    stream = _pipe_stream(cleanup)
+    directory = tempfile.mkdtemp()
+    cleanup.callback(shutil.rmtree, directory)
+    # files are rotated every 1 MiB, keeping 5 segments
+    gzip_handler = logging.handlers.RotatingFileHandler(os.path.join(directory, "gzip.log"), maxBytes=_ROTATE_BYTES,
+                                                        backupCount=_BACKUP_COUNT)
+    gzip_handler.namer = lambda name: name + ".gz"
+    gzip_handler.rotator = _gzip_rotator
+    handlers = [
+        ("StreamHandler[pipe]", logging.StreamHandler(stream)),
+        ("CAFBufferedStreamHandler[pipe]", logging_handler.CAFBufferedStreamHandler(stream)),
+        ("RotatingFileHandler", logging.handlers.RotatingFileHandler(
+            os.path.join(directory, "stdlib.log"), maxBytes=_ROTATE_BYTES, backupCount=_BACKUP_COUNT)),
+        ("RotatingFileHandler[gzip]", gzip_handler),
+        ("CAFRotatingFileHandler", logging_handler.CAFRotatingFileHandler(
+            os.path.join(directory, "caf.log"), max_bytes=_ROTATE_BYTES, backup_count=_BACKUP_COUNT)),
+    ]
+    return [(name, _handler_logger("bench.handler." + name, handler, cleanup), None) for name, handler in handlers]
+
+
+def _benchmarks(cleanup):
+    caflogger.configure()
+    whi_formatter = logging.getLogger("WHI").handlers[0].formatter
+    mdal_formatter = logging.getLogger("MDAL").handlers[0].formatter
+    json_formatter = logging_formatter.CAFJsonFormatter(_JSON_FORMAT, _JSON_DATEFMT)
+
+    enabled = caflogger.get_logger("bench.enabled")
+    _null_sink(enabled.logger, whi_formatter)
+    disabled = caflogger.get_logger("bench.disabled")
+    _null_sink(disabled.logger, whi_formatter)
+    disabled.logger.setLevel(logging.WARNING)
+    mdal_text = caflogger.get_mdal_logger("bench.text")
+    _null_sink(mdal_text.logger, mdal_formatter)
+    mdal_json = caflogger.get_mdal_logger("bench.json")
+    _null_sink(mdal_json.logger, json_formatter)
+    # disabled by the logger level, or filtered by the handler level: the payload must not be serialized
+    mdal_disabled = caflogger.get_mdal_logger("bench.disabled")
+    _null_sink(mdal_disabled.logger, mdal_formatter)
+    mdal_disabled.logger.setLevel(logging.WARNING)
+    mdal_filtered = caflogger.get_mdal_logger("bench.filtered")
+    _null_sink(mdal_filtered.logger, mdal_formatter)
+    mdal_filtered.logger.handlers[0].setLevel(logging.WARNING)
+
+    record_factory = logging.getLogRecordFactory()
+    record = record_factory("WHI.bench", logging.INFO, __file__, 1, BENCH_LOG_MESSAGE[1], ("arg1", 42), None)
+    mdal_record = _mdal_record()
+    header = [_header()]
+    small, large = _payload('small'), _payload('large')
+    request = test_utils.make_mocked_request('GET', '/', {constants.CORRID_HEADER_NAME: _header()})
+
+    def set_json_mode(enabled_json):
+        def setup():
+            _set_mdal_context()
+            caflogger._ENABLED_JSON_FORMAT = enabled_json
+        return setup
+
+    return [
+        ("CAFLogger.info[disabled]", lambda: disabled.info(BENCH_LOG_MESSAGE, "arg1", 42), None),
+        ("CAFLogger.apm[disabled]", lambda: disabled.apm(BENCH_LOG_MESSAGE, "arg1", 42), None),
+        ("CAFLogger.info[text]", lambda: enabled.info(BENCH_LOG_MESSAGE, "arg1", 42), None),
+        ("CAFLogger.error[traceback]", lambda: _error_with_traceback(enabled), None),
+        ("log_event[text,small]", lambda: mdal_text.log_event(event_info=small), set_json_mode(False)),
+        ("log_event[text,large]", lambda: mdal_text.log_event(event_info=large), set_json_mode(False)),
+        ("log_event[json,small]", lambda: mdal_json.log_event(event_info=small), set_json_mode(True)),
+        ("log_event[json,large]", lambda: mdal_json.log_event(event_info=large), set_json_mode(True)),
+        ("log_event[text,large,disabled]", lambda: mdal_disabled.log_event(event_info=large), set_json_mode(False)),
+        ("log_event[text,large,filtered]", lambda: mdal_filtered.log_event(event_info=large), set_json_mode(False)),
+        ("log_event[json,large,filtered]", lambda: mdal_filtered.log_event(event_info=large), set_json_mode(True)),
+        ("log_event[text,callable,filtered]", lambda: mdal_filtered.log_event(event_info=lambda: large),
+         set_json_mode(False)),
+        ("CAFJsonFormatter.format[large]", lambda: json_formatter.format(mdal_record), None),
+        ("LogRecord.getMessage", record.getMessage, None),
+        ("corrid_store.set_headers", lambda: corrid_store.set_headers(header), None),
+        ("corrid_store.get_headers", corrid_store.get_headers, _set_mdal_context),
+        # the handler alone, the difference to read_write_mdal is the overhead of the middleware
+        ("read_write_mdal[handler only]", lambda: _run_coroutine(_respond(request)), None),
+        ("read_write_mdal", lambda: _run_coroutine(middleware.read_write_mdal(request, _respond)), None),
+        ("read_write_mdal[set_attr]",
+         lambda: _run_coroutine(middleware.read_write_mdal(request, _respond_setting_attribute)), None),
+    ] + _handler_benchmarks(cleanup)
+
+
+def _measure(func):
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(number, int(number * _MIN_TIME / max(elapsed, 1e-9)))
+    best = min(timer.repeat(repeat=_REPEAT, number=number)) / number
+
+    # CPython has no allocation counter, tracemalloc reports the transient (peak) and retained memory instead
+    func()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        calls = 1000
+        for _ in range(calls):
+            func()
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'ops_per_sec': 1.0 / best, 'ns_per_op': best * 1e9, 'peak_bytes_per_call': peak - start,
+            'retained_bytes_per_call': (end - start) / calls}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(selected=None):
+    results = {}
+    saved_json_format = caflogger._ENABLED_JSON_FORMAT
+    try:
+        with contextlib.ExitStack() as cleanup:
+            for name, func, setup in _benchmarks(cleanup):
+                if selected and not any(pattern in name for pattern in selected):
+                    continue
+                if setup is not None:
+                    setup()
+                results[name] = _measure(func)
+    finally:
+        caflogger._ENABLED_JSON_FORMAT = saved_json_format
+    return {'commit': _commit(), 'python': platform.python_version(), 'results': results}
+
+
+def compare(baseline, current, threshold):
+    regressions = []
+    print("{:<34} {:>14} {:>14} {:>9}".format("benchmark", "baseline ns", "current ns", "change"))
+    for name, result in current['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            print("{:<34} {:>14} {:>14.1f} {:>9}".format(name, "-", result['ns_per_op'], "new"))
+            continue
+        change = result['ns_per_op'] / previous['ns_per_op'] - 1.0
+        print("{:<34} {:>14.1f} {:>14.1f} {:>+8.1%}".format(name, previous['ns_per_op'], result['ns_per_op'], change))
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def _print_results(current):
+    print("{:<34} {:>14} {:>12} {:>12} {:>12}".format("benchmark", "ops/s", "ns/op", "peak B/op", "kept B/op"))
+    for name, result in current['results'].items():
+        print("{:<34} {:>14.0f} {:>12.1f} {:>12} {:>12.1f}".format(
+            name, result['ops_per_sec'], result['ns_per_op'], result['peak_bytes_per_call'],
+            result['retained_bytes_per_call']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the CAF logging hot paths")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="compare with the results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=_DEFAULT_THRESHOLD,
+                        help="relative slowdown reported as a regression (default 0.10)")
+    parser.add_argument("benchmarks", nargs="*", help="only run benchmarks whose name contains one of these")
+    args = parser.parse_args(argv)
+
+    current = run(args.benchmarks)
+    _print_results(current)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(current, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        print()
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print("\nslower than the baseline by more than {:.0%}: {}".format(args.threshold, ", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
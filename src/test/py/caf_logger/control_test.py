@@ -0,0 +1,122 @@
+import importlib
+import logging
+import os
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+import caf_logger.logger as caflogger
+import logging_codes
+from caf_logger import control
+from caf_logger import sampling
+
+_CONFIG = """
+[caf]
+disabled_codes=CAFLOGTEST001
+sampling=MDAL:0.5
+
+[loggers]
+keys=root,whi
+
+[logger_root]
+level=INFO
+
+[logger_whi]
+level=ERROR
+qualname=WHI
+
+[handler_whiConsoleHandler]
+level=WARNING
+"""
+
+
+class TestControl(unittest.TestCase):
+
+    def setUp(self):
+        self.out = StringIO()
+        with redirect_stdout(self.out):
+            importlib.reload(caflogger)
+            self.logger = caflogger.get_logger("control_test")
+
+    def tearDown(self):
+        control.stop_watching()
+        sampling.clear_rules()
+        caflogger._logging_config_file = None
+        caflogger._logger_initialized = False
+
+    def test_set_level(self):
+        state = control.set_level("WHI", "warning")
+        self.assertEqual("WARNING", state['levels']["WHI"])
+        self.assertFalse(self.logger.logger.isEnabledFor(logging.INFO))
+        self.assertTrue(self.logger.logger.isEnabledFor(logging.WARNING))
+
+    def test_disable_code(self):
+        control.set_code_enabled("CAFLOGTEST001", False)
+        self.logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "disabled")
+        control.set_code_enabled("CAFLOGTEST001", True)
+        self.logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "enabled")
+        output = self.out.getvalue()
+        self.assertFalse("arguments: disabled" in output)
+        self.assertTrue("arguments: enabled" in output)
+        self.assertEqual({}, sampling.suppressed_counts())
+
+    def test_apply_keeps_unchanged_settings(self):
+        control.apply(sampling_ratios={"CORRIDNOTPRESENT": 0.1}, rate_limits={"ERROR": "10/20"})
+        state = control.apply(disabled_codes=["CAFLOGTEST001"])
+        self.assertEqual(["CAFLOGTEST001"], state['disabled_codes'])
+        self.assertEqual({"CORRIDNOTPRESENT": 0.1}, state['sampling_ratios'])
+        self.assertEqual({"ERROR": "10/20"}, state['rate_limits'])
+
+    def test_invalid_changes_are_not_applied(self):
+        with self.assertRaises(ValueError):
+            control.apply(levels={"WHI": "ERROR"}, sampling_ratios={"CORRIDNOTPRESENT": 2})
+        with self.assertRaises(ValueError):
+            control.apply(levels={"WHI": "ERROR", "MDAL": "LOUD"})
+        with self.assertRaises(ValueError):
+            control.apply(handler_levels={"unknownHandler": "ERROR"})
+        state = control.get_state()
+        self.assertEqual("INFO", state['levels']["WHI"])
+        self.assertEqual("INFO", state['levels']["MDAL"])
+        self.assertEqual({}, state['sampling_ratios'])
+
+    def test_handler_levels(self):
+        state = control.apply(handler_levels={"whiConsoleHandler": "ERROR"})
+        self.assertEqual("ERROR", state['handler_levels']["whiConsoleHandler"])
+        self.logger.warn(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "filtered by the handler")
+        self.assertFalse("filtered by the handler" in self.out.getvalue())
+
+    def test_read_config_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.conf', delete=False) as config:
+            config.write(_CONFIG)
+        self.addCleanup(os.remove, config.name)
+        self.assertEqual({
+            'levels': {"root": "INFO", "WHI": "ERROR"},
+            'handler_levels': {"whiConsoleHandler": "WARNING"},
+            'disabled_codes': ["CAFLOGTEST001"],
+            'sampling_ratios': {"MDAL": "0.5"},
+            'rate_limits': {},
+        }, control.read_config_file(config.name))
+
+    def test_watcher_applies_file_changes(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.conf', delete=False) as config:
+            config.write("[logger_whi]\nlevel=INFO\nqualname=WHI\n")
+        self.addCleanup(os.remove, config.name)
+        control.watch_config_file(config.name, 0.05)
+        with open(config.name, 'w') as changed:
+            changed.write(_CONFIG)
+        os.utime(config.name, ns=(0, os.stat(config.name).st_mtime_ns + 10 ** 9))
+        for _ in range(100):
+            if control.get_state()['disabled_codes']:
+                break
+            time.sleep(0.05)
+        state = control.get_state()
+        self.assertEqual("ERROR", state['levels']["WHI"])
+        self.assertEqual("WARNING", state['handler_levels']["whiConsoleHandler"])
+        self.assertEqual(["CAFLOGTEST001"], state['disabled_codes'])
+        self.assertEqual({"MDAL": 0.5}, state['sampling_ratios'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,7 @@
 from caf_logger.mdal import corrid_store
+from caf_logger.mdal import utils
+import asyncio
+import json
 import unittest
 import os
 import importlib
@@ -46,6 +49,154 @@ class TestShell(unittest.TestCase):
         
         self.assertEqual(4, len(headers))
 
+    def test_corrid_store_set_headers_limits(self):
+        corrid_store.set_headers(["attr:a:1,corrid:corrid1,corrid:corrid2,attr:,attr:b:2", "x" * 9000])
+        self.assertEqual("corrid1", corrid_store.get_corr_id())
+        self.assertEqual(["a:1", "b:2"], corrid_store.get_attrs())
+
+        attrs = ",".join("attr:name{}:{}".format(i, i) for i in range(1000))
+        corrid_store.set_headers(["corrid:corrid3," + attrs])
+        self.assertEqual("corrid3", corrid_store.get_corr_id())
+        self.assertEqual(corrid_store.constants.DEFAULT_MAX_ATTRIBUTES, len(corrid_store.get_attrs()))
+
+        # attributes past the first MAX_HEADER_LENGTH characters are dropped, the corr id is still found
+        corrid_store.set_headers(["attr:a:" + "x" * 9000 + ",attr:b:2,corrid:corrid4"])
+        self.assertEqual("corrid4", corrid_store.get_corr_id())
+        self.assertEqual([], corrid_store.get_attrs())
+
+        corrid_store.set_headers(["attr:a:" + "x" * 5000 + ",attr:b:" + "x" * 5000, "attr:c:3,corrid:corrid5"])
+        self.assertEqual("corrid5", corrid_store.get_corr_id())
+        self.assertEqual(["a"], [attr.split(":", 1)[0] for attr in corrid_store.get_attrs()])
+
+        corrid_store.set_headers(["attr:a:1,corrid:,x" + "x" * 20000, "corrid:corrid6", "attr:b:2"])
+        self.assertEqual("corrid6", corrid_store.get_corr_id())
+        self.assertEqual(["a:1"], corrid_store.get_attrs())
+
+    def test_parse_corr_id_header_is_bounded(self):
+        header = "x" * 70000 + ",corrid:corrid1"
+        self.assertEqual((None, []), utils.parse_corr_id_header([header], 8192, 64))
+        self.assertEqual(("corrid1", []), utils.parse_corr_id_header([header], 8192, 64, max_scan_length=80000))
+        header_values = ["x" * 9000 + ",corrid:corrid2:extra,attr:b:2", "attr:a:1"]
+        self.assertEqual(("corrid2", []), utils.parse_corr_id_header(header_values, 8192, 64))
+        self.assertEqual(("corrid3", ["a:1", "b:2"]),
+                         utils.parse_corr_id_header(["attr:a:1,corrid:corrid3,attr:b:2,attr:c:3"], 8192, 2))
+
+    def test_corrid_store_get_headers_value(self):
+        corrid_store.set_headers(["corrid:corrid1,attr:attr1=2"])
+        header_value = corrid_store.get_headers_value()
+        self.assertEqual(json.dumps(corrid_store.get_headers()), header_value)
+        self.assertIs(header_value, corrid_store.get_headers_value())
+
+        corrid_store.set_attr("attr2", "1")
+        self.assertEqual('["corrid:corrid1", "attr:attr1=2", "attr:attr2:1"]', corrid_store.get_headers_value())
+        corrid_store.set_corr_id("corrid2")
+        self.assertEqual('["corrid:corrid2", "attr:attr1=2", "attr:attr2:1"]', corrid_store.get_headers_value())
+
+    def test_corrid_store_context_stack(self):
+        self.assertEqual([], corrid_store.get_current_context())
+        corrid_store.add_context("ctx1")
+        corrid_store.add_context("ctx2")
+        stack = corrid_store.get_current_context()
+        self.assertEqual(["ctx1", "ctx2"], stack)
+
+        stack.append("not stored")
+        corrid_store.remove_top_context()
+        self.assertEqual(["ctx1"], corrid_store.get_current_context())
+        corrid_store.remove_top_context()
+        corrid_store.remove_top_context()
+        self.assertEqual([], corrid_store.get_current_context())
+
+    def test_corrid_store_rendered_values(self):
+        self.assertEqual("", corrid_store.get_rendered_corr_id())
+        self.assertEqual("", corrid_store.get_rendered_context())
+        self.assertEqual("", corrid_store.get_rendered_attrs())
+        self.assertEqual({}, corrid_store.get_attr_map())
+
+        corrid_store.set_headers(["corrid:cid1,attr:name1:value1,attr:flag"])
+        corrid_store.add_context("ctx1")
+        corrid_store.add_context("ctx2")
+        self.assertEqual("cid1/ctx1|ctx2", corrid_store.get_rendered_corr_id())
+        self.assertIs(corrid_store.get_rendered_corr_id(), corrid_store.get_rendered_corr_id())
+        self.assertEqual("ctx1|ctx2", corrid_store.get_rendered_context())
+        self.assertEqual("name1:value1,flag", corrid_store.get_rendered_attrs())
+        self.assertEqual({"name1": "value1", "flag": ""}, corrid_store.get_attr_map())
+        self.assertIs(corrid_store.get_attr_map(), corrid_store.get_attr_map())
+
+        corrid_store.add_attr("name2:value2")
+        self.assertEqual("name1:value1,flag,name2:value2", corrid_store.get_rendered_attrs())
+        self.assertEqual({"name1": "value1", "flag": "", "name2": "value2"}, corrid_store.get_attr_map())
+
+        corrid_store.remove_top_context()
+        self.assertEqual("cid1/ctx1", corrid_store.get_rendered_corr_id())
+        corrid_store.set_corr_id("cid2")
+        self.assertEqual("cid2/ctx1", corrid_store.get_rendered_corr_id())
+
+    def test_corrid_store_attributes_overwrite(self):
+        corrid_store.set_attr("STUDY", "1.2.3")
+        corrid_store.set_attr("ORDER", "4.5.6")
+        corrid_store.set_attr("STUDY", "7.8.9")
+        corrid_store.add_attr("ORDER:10")
+        self.assertEqual(["STUDY:7.8.9", "ORDER:10"], corrid_store.get_attrs())
+        self.assertEqual({"STUDY": "7.8.9", "ORDER": "10"}, corrid_store.get_attr_map())
+
+        corrid_store.set_corr_id("cid1")
+        self.assertEqual(["corrid:cid1", "attr:STUDY:7.8.9", "attr:ORDER:10"], corrid_store.get_headers())
+
+    def test_corrid_store_attribute_limits(self):
+        corrid_store.set_attribute_limits(2, 5)
+        try:
+            corrid_store.set_attr("attr1", "value1")
+            corrid_store.set_attr("attr2", "v2")
+            corrid_store.set_attr("attr3", "v3")
+            corrid_store.set_attr("attr2", "v2.1")
+            self.assertEqual(["attr1:value", "attr2:v2.1"], corrid_store.get_attrs())
+
+            corrid_store.set_headers(["corrid:cid1,attr:a:1,attr:b,attr:c:3"])
+            self.assertEqual(["a:1", "b"], corrid_store.get_attrs())
+        finally:
+            importlib.reload(corrid_store)
+
+    def test_corrid_store_scoped_context(self):
+        corrid_store.add_context("ctx1")
+        with corrid_store.scoped_context("ctx2"):
+            corrid_store.add_context("ctx3")
+            self.assertEqual(["ctx1", "ctx2", "ctx3"], corrid_store.get_current_context())
+        self.assertEqual(["ctx1"], corrid_store.get_current_context())
+
+        async def scoped():
+            async with corrid_store.scoped_context("async"):
+                return corrid_store.get_current_context()
+        self.assertEqual(["ctx1", "async"], asyncio.run(scoped()))
+
+    def test_corrid_store_context_isolation_across_tasks(self):
+        async def worker(i):
+            corrid_store.set_corr_id("cid{}".format(i))
+            expected = ["parent", "task{}".format(i)]
+            async with corrid_store.scoped_context("task{}".format(i)):
+                corrid_store.add_attr("attr{}".format(i))
+                for depth in range(3):
+                    corrid_store.add_context("level{}".format(depth))
+                    expected.append("level{}".format(depth))
+                    await asyncio.sleep(0)
+                    if corrid_store.get_current_context() != expected:
+                        return "task {} saw context {}".format(i, corrid_store.get_current_context())
+                    if corrid_store.get_attrs() != ["parent_attr", "attr{}".format(i)]:
+                        return "task {} saw attributes {}".format(i, corrid_store.get_attrs())
+                    if corrid_store.get_corr_id() != "cid{}".format(i):
+                        return "task {} saw corr id {}".format(i, corrid_store.get_corr_id())
+            return None
+
+        async def run_workers():
+            corrid_store.add_context("parent")
+            corrid_store.add_attr("parent_attr")
+            errors = await asyncio.gather(*(worker(i) for i in range(5000)))
+            return [error for error in errors if error], corrid_store.get_current_context(), corrid_store.get_attrs()
+
+        errors, parent_context, parent_attrs = asyncio.run(run_workers())
+        self.assertEqual([], errors)
+        self.assertEqual(["parent"], parent_context)
+        self.assertEqual(["parent_attr"], parent_attrs)
+
 if __name__ == '__main__':
     unittest.main()
 
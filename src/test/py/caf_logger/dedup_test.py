@@ -0,0 +1,125 @@
+import functools
+import logging
+import unittest
+from unittest import mock
+
+import caf_logger.logger as caflogger
+from caf_logger import dedup
+from caf_logger import lazy
+from logging_helpers import RecordingHandler, make_record
+
+
+# the records of these tests share a logger, level, log_id and corr id unless a test overrides them
+_record = functools.partial(make_record, name="WHI.dedup_test", level=logging.ERROR, log_id="CAFLOGTEST001",
+                            corr_id="cid1")
+
+
+class TestDedupFilter(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # installs the CAF log record factory that renders {} templates
+        caflogger.configure()
+
+    def setUp(self):
+        self.monotonic = mock.patch.object(dedup.time, 'monotonic', return_value=100.0).start()
+        self.addCleanup(mock.patch.stopall)
+        self.handler = RecordingHandler()
+        self.dedup_filter = dedup.install_dedup_filter(self.handler, 10, max_entries=2)
+        self.addCleanup(self.dedup_filter.close)
+
+    def _messages(self):
+        return [record.getMessage() for record in self.handler.records]
+
+    def test_repeats_are_collapsed_until_the_window_closes(self):
+        for _ in range(5):
+            self.handler.handle(_record("Failed to call {}", "serviceA"))
+        self.assertEqual(["Failed to call serviceA"], self._messages())
+
+        self.monotonic.return_value = 110.0
+        self.dedup_filter.flush(expired_only=True)
+        self.assertEqual("Message [Failed to call serviceA] with log_id CAFLOGTEST001 repeated 4 more times in the "
+                         "last 10 seconds", self._messages()[1])
+        summary = self.handler.records[1]
+        self.assertEqual("CAFLOG004", summary.log_id)
+        self.assertEqual("cid1", summary.corr_id)
+        self.assertEqual(logging.ERROR, summary.levelno)
+
+        self.handler.handle(_record("Failed to call {}", "serviceA"))
+        self.assertEqual(3, len(self.handler.records))
+
+    def test_records_differing_in_args_or_corr_id_are_kept(self):
+        self.handler.handle(_record("Failed to call {}", "serviceA"))
+        self.handler.handle(_record("Failed to call {}", "serviceB"))
+        self.handler.handle(_record("Failed to call {}", "serviceA", corr_id="cid2"))
+        self.assertEqual(3, len(self.handler.records))
+
+    def test_records_with_lazy_args_are_not_collapsed(self):
+        calls = []
+
+        def service():
+            calls.append(1)
+            return "serviceA"
+
+        for _ in range(3):
+            self.assertTrue(self.dedup_filter.filter(_record("Failed to call {}", lazy.LazyValue(service))))
+        self.assertEqual([], calls)
+        self.assertEqual(0, len(self.dedup_filter._entries))
+
+    def test_equal_exception_args_are_repeats(self):
+        for _ in range(3):
+            self.handler.handle(_record("Failed to call {}", ValueError("connection refused")))
+        self.handler.handle(_record("Failed to call {}", KeyError("connection refused")))
+        self.assertEqual(["Failed to call connection refused", "Failed to call 'connection refused'"],
+                         self._messages())
+
+    def test_changed_reused_args_and_events_are_kept(self):
+        services = ["serviceA"]
+        event_info = {"study": "s0"}
+        for index in range(3):
+            services.append("service{}".format(index))
+            event_info["study"] = "s{}".format(index)
+            record = _record("Failed to call {}", services)
+            record.event = lazy.LazyEvent(event_info)
+            self.assertTrue(self.dedup_filter.filter(record))
+
+        record = _record("Failed to call {}", list(services))
+        record.event = lazy.LazyEvent(dict(event_info))
+        self.assertFalse(self.dedup_filter.filter(record))
+
+    def test_summary_does_not_repeat_the_text_mode_event(self):
+        for _ in range(3):
+            record = _record("Event recorded")
+            record.event = lazy.LazyJson({"study": "s0"})
+            self.handler.handle(record)
+        self.dedup_filter.flush()
+        self.assertEqual(['Event recorded {"study": "s0"}',
+                          'Message [Event recorded {"study": "s0"}] with log_id CAFLOGTEST001 repeated 2 more times in '
+                          'the last 0 seconds'], self._messages())
+
+    def test_no_summary_without_repeats(self):
+        self.handler.handle(_record("Failed to call {}", "serviceA"))
+        self.monotonic.return_value = 110.0
+        self.dedup_filter.flush()
+        self.assertEqual(1, len(self.handler.records))
+
+    def test_tracking_table_is_bounded(self):
+        self.handler.handle(_record("Failed to call {}", "serviceA"))
+        self.handler.handle(_record("Failed to call {}", "serviceA"))
+        self.handler.handle(_record("Failed to call {}", "serviceB"))
+        self.handler.handle(_record("Failed to call {}", "serviceC"))
+        self.assertEqual(2, len(self.dedup_filter._entries))
+        self.assertEqual(["Failed to call serviceA", "Failed to call serviceB",
+                          "Message [Failed to call serviceA] with log_id CAFLOGTEST001 repeated 1 more times in the "
+                          "last 0 seconds", "Failed to call serviceC"], self._messages())
+
+    def test_flush_reports_pending_repeats(self):
+        self.handler.handle(_record("Failed to call {}", "serviceA"))
+        self.handler.handle(_record("Failed to call {}", "serviceA"))
+        dedup.flush_all()
+        self.assertEqual(2, len(self.handler.records))
+        self.assertEqual({}, dict(self.dedup_filter._entries))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,73 @@
 import importlib
+import json
+import logging
 import os
+import subprocess
 import sys
+import tempfile
 import unittest
 from contextlib import contextmanager
 from contextlib import redirect_stdout
 from io import StringIO
+from unittest import mock
 
 import caf_logger.logger as caflogger
 import logging_codes
+from caf_logger import dedup
+from caf_logger import lazy
+from caf_logger import logging_config
+from caf_logger import logging_handler
+from caf_logger import message_template
+from caf_logger import metrics
+from caf_logger import payload
+from caf_logger import sampling
 from caf_logger.level_type import LevelType
 from caf_logger.mdal import corrid_store
+from logging_helpers import CountingStream
+
+# importing caf_logger.logger and returning the first logger may take at most this many times as long as importing the
+# standard library modules the logger is built on and configuring three stream handlers with them
+IMPORT_TIME_FACTOR = 2.0
+
+_IMPORT_BASELINE = """
+import time
+start = time.perf_counter()
+import configparser
+import json
+import logging.config
+import uuid
+logging.config.dictConfig({
+    'version': 1,
+    'formatters': {'plain': {'format': '%(asctime)s [%(threadName)s] [%(levelname)s] [%(name)s] - %(message)s'}},
+    'handlers': {name: {'class': 'logging.StreamHandler', 'formatter': 'plain', 'stream': 'ext://sys.stdout'}
+                 for name in ('root', 'WHI', 'MDAL')},
+    'loggers': {name: {'handlers': [name], 'propagate': False} for name in ('WHI', 'MDAL')},
+    'root': {'handlers': ['root']},
+})
+print(time.perf_counter() - start)
+"""
+
+_IMPORT_CHECK = """
+import contextlib
+import io
+import logging
+import time
+start = time.perf_counter()
+import caf_logger.logger
+elapsed = time.perf_counter() - start
+assert not caf_logger.logger._logger_initialized
+assert not logging.getLogger("WHI").handlers
+assert not logging.getLogger().handlers
+with contextlib.redirect_stdout(io.StringIO()):
+    start = time.perf_counter()
+    caf_logger.logger.get_logger("import_check")
+    elapsed += time.perf_counter() - start
+print(elapsed)
+"""
+
+
+def _without_timestamps(output):
+    return [line.split(" [", 1)[1] for line in output.strip().splitlines()]
 
 
 @contextmanager
@@ -113,6 +171,51 @@ class TestShell(unittest.TestCase):
                 self.assertTrue(
                     "[MainThread] [ERROR] [WHI.testlogger3] - [] - CAFLOG001: Failed to log message [CAFLOGTEST002] at INFO level correctly, see following stacktrace for details" in output)
 
+    def test_logger_bad_template_reported_once(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_logger("testlogger11")
+
+                logger.info(logging_codes.WHI_CAF_LOGGER_TEST_MDAL_EVENT, "eventA")
+                logger.info(logging_codes.WHI_CAF_LOGGER_TEST_MDAL_EVENT, "eventB")
+                output = out.getvalue().strip()
+                self.assertEqual(1, output.count("CAFLOG002: Invalid message template"))
+                self.assertTrue(
+                    "[MainThread] [ERROR] [WHI.testlogger11] - [] - CAFLOG002: Invalid message template " +
+                    '[[ event: {{"name": "{}", "status": "{}"}}]] for CAFLOGTESTMDAL001 at INFO level: ' +
+                    "template expects 2 arguments, got 1" in output)
+                self.assertTrue(
+                    '[INFO] [WHI.testlogger11] - [] - CAFLOGTESTMDAL001: [ event: {{"name": "{}", "status": "{}"}}] ' +
+                    "('eventB',)" in output)
+
+    def test_logger_template_with_a_mapping_argument(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_logger("testlogger23")
+                logger.apm(("CAFLOGTEST003", "apm {}"), {"k": 1})
+                logger.apm(("CAFLOGTEST004", "apm {k}"), {"k": 1})
+                output = out.getvalue().strip()
+                self.assertEqual(1, output.count("CAFLOG002: Invalid message template"))
+                self.assertTrue("CAFLOG002: Invalid message template [apm {}] for CAFLOGTEST003 at APM level: "
+                                "template expects 1 positional arguments" in output)
+                self.assertTrue("CAFLOGTEST003: apm {} {'k': 1}" in output)
+                self.assertTrue("CAFLOGTEST004: apm 1" in output)
+
+    def test_logger_template_checked_once(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_logger("testlogger22")
+                with mock.patch.object(message_template, 'compile_template',
+                                       wraps=message_template.compile_template) as compile_template:
+                    for arg in ("arg1", "arg2", "arg3"):
+                        logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, arg)
+                    self.assertEqual(1, compile_template.call_count)
+                    logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg1", "arg2")
+                    self.assertEqual(2, compile_template.call_count)
+
     def test_mdal_logger_event_format(self):
         with StringIO() as out:
             with redirect_stdout(out):
@@ -130,6 +233,64 @@ class TestShell(unittest.TestCase):
                 self.assertTrue(
                     '[MainThread] [MDAL] [MDAL.testlogger4] - [cid1] - [] - CAFLOGTESTMDAL001: [ event: {"name": "eventA", "status": "started"}]' in output)
 
+    def test_mdal_logger_log_events(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_mdal_logger("testlogger12")
+                stream = CountingStream()
+                logger.logger.parent.handlers[0].setStream(stream)
+                corrid_store.set_headers(["corrid:cid1,attr:STUDY:1.2.3"])
+                logger.add_context("ctx1")
+                events = [{'name': 'event{}'.format(i), 'status': 'started'} for i in range(100)]
+
+                for event_info in events:
+                    logger.log_event(event_info=event_info)
+                individual = stream.getvalue()
+                self.assertEqual(100, stream.writes)
+
+                stream.seek(0)
+                stream.truncate()
+                stream.writes = 0
+                logger.log_events(events)
+                self.assertEqual(1, stream.writes)
+                self.assertEqual(_without_timestamps(individual), _without_timestamps(stream.getvalue()))
+                self.assertTrue('[MDAL] [MDAL.testlogger12] - [cid1/ctx1] - [STUDY:1.2.3] - MDALEVENT: Event recorded '
+                                '{"name": "event99", "status": "started"}' in stream.getvalue())
+
+                stream.seek(0)
+                stream.truncate()
+                stream.writes = 0
+                with logger.batch() as batch:
+                    batch.log_event(logging_codes.WHI_CAF_LOGGER_TEST_MDAL_EVENT, "eventA", "started")
+                    batch.log_event(event_info=events[0])
+                    self.assertEqual(0, stream.writes)
+                self.assertEqual(1, stream.writes)
+                self.assertEqual([
+                    'MainThread] [MDAL] [MDAL.testlogger12] - [cid1/ctx1] - [STUDY:1.2.3] - CAFLOGTESTMDAL001: '
+                    '[ event: {"name": "eventA", "status": "started"}]',
+                    'MainThread] [MDAL] [MDAL.testlogger12] - [cid1/ctx1] - [STUDY:1.2.3] - MDALEVENT: Event recorded '
+                    '{"name": "event0", "status": "started"}'], _without_timestamps(stream.getvalue()))
+                logger.remove_all_contexts()
+
+    def test_mdal_logger_log_events_caller(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_mdal_logger("testlogger24")
+                stream = StringIO()
+                handler = logger.logger.parent.handlers[0]
+                handler.setStream(stream)
+                handler.setFormatter(logging.Formatter("%(pathname)s %(funcName)s:%(lineno)d"))
+                logger.log_event(event_info={'name': 'eventA'})
+                logger.log_events([{'name': 'eventA'}])
+                with logger.batch() as batch:
+                    batch.log_event(event_info={'name': 'eventA'})
+                lines = stream.getvalue().splitlines()
+                self.assertEqual(3, len(lines))
+                self.assertEqual([lines[0]] * 3, lines)
+                self.assertTrue(" _log_mdal:" in lines[0])
+
     def test_mdal_logger_context_handling(self):
         with StringIO() as out:
             with redirect_stdout(out):
@@ -208,6 +369,15 @@ class TestShell(unittest.TestCase):
                 self.assertTrue('global_attr1:value1' in global_attrs)
                 self.assertTrue('global_attr2:value2' in global_attrs)
 
+                logger.add_global_attribute("global_attr1", "value3")
+                logger.log_event(logging_codes.WHI_CAF_LOGGER_TEST_MDAL_EVENT, "eventA", "started")
+                output = out.getvalue().strip()
+                self.assertTrue(
+                    '[MainThread] [MDAL] [MDAL.testlogger7] - [] - [global_attr1:value3,global_attr2:value2] - '
+                    'CAFLOGTESTMDAL001: [ event: {"name": "eventA", "status": "started"}]' in output)
+                self.assertEqual(['global_attr1:value3', 'global_attr2:value2'],
+                                 logger.get_current_global_attributes())
+
     def test_mdal_logger_Json_format(self):
         with StringIO() as out:
             with redirect_stdout(out):
@@ -237,6 +407,29 @@ class TestShell(unittest.TestCase):
                 logger.remove_all_contexts()
                 del os.environ['WHI_CAF_LOGGING_DEFAULT_FORMAT']
 
+    def test_mdal_logger_log_events_Json_format(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                os.environ['WHI_CAF_LOGGING_DEFAULT_FORMAT'] = 'Json'
+                importlib.reload(caflogger)
+                del os.environ['WHI_CAF_LOGGING_DEFAULT_FORMAT']
+                logger = caflogger.get_mdal_logger("testlogger13")
+                logger.add_context("ctx1")
+                logger.add_global_attribute('STUDY', '1.2.3.4')
+                events = [{'name': 'event{}'.format(i)} for i in range(3)]
+
+                for event_info in events:
+                    logger.log_event(event_info=event_info)
+                logger.log_events(events)
+
+                lines = [json.loads(line) for line in out.getvalue().strip().splitlines()[-6:]]
+                for line in lines:
+                    del line['@timestamp']
+                self.assertEqual(lines[:3], lines[3:])
+                self.assertEqual(['message', 'log_id', 'WHI-CONTEXT', 'event', 'STUDY', 'HOSTNAME', 'level',
+                                  'logger_name', 'thread_name', 'WHI-CORRID'], list(lines[3].keys()))
+                logger.remove_all_contexts()
+
     def test_logger_Json_format(self):
         with StringIO() as out:
             with redirect_stdout(out):
@@ -263,6 +456,298 @@ class TestShell(unittest.TestCase):
                 output = out.getvalue().strip()
                 self.assertTrue('"security_level": 5' in output)
 
+    def test_logger_disabled_level_skips_context_lookup(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_logger("testlogger10")
+                logger.logger.setLevel("WARNING")
+
+                with mock.patch.object(corrid_store, 'get_corr_id', return_value="cid1") as get_corr_id:
+                    logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg1")
+                    logger.apm(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg1")
+                    get_corr_id.assert_not_called()
+
+                    logger.warn(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg1")
+                    get_corr_id.assert_called_once()
+
+                output = out.getvalue().strip()
+                self.assertFalse("[INFO] [WHI.testlogger10]" in output)
+                self.assertFalse("[APM] [WHI.testlogger10]" in output)
+                self.assertTrue(
+                    "[MainThread] [WARNING] [WHI.testlogger10] - [cid1] - CAFLOGTEST001: Logging a test "
+                    "message with arguments: arg1" in output)
+
+    def test_mdal_logger_lazy_event_info(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_mdal_logger("testlogger17")
+                calls = []
+
+                def event_info():
+                    calls.append(1)
+                    return {"name": "eventA"}
+
+                logger.log_event(event_info={"name": "eventA"})
+                logger.log_event(event_info=event_info)
+                with logger.batch() as batch:
+                    batch.log_event(event_info=event_info)
+                self.assertEqual(2, len(calls))
+                lines = _without_timestamps("\n".join(out.getvalue().splitlines()[-3:]))
+                self.assertEqual(
+                    'MainThread] [MDAL] [MDAL.testlogger17] - [] - [] - MDALEVENT: Event recorded {"name": "eventA"}',
+                    lines[0])
+                self.assertEqual([lines[0]] * 3, lines)
+
+                written = out.getvalue()
+                with mock.patch.object(lazy.json, 'dumps') as dumps:
+                    logging.getLogger("MDAL").handlers[0].setLevel(logging.WARNING)
+                    logger.log_event(event_info={"name": "filtered"})
+                    logger.log_event(event_info=event_info)
+                    logger.logger.setLevel(logging.WARNING)
+                    logger.log_event(event_info={"name": "disabled"})
+                    logger.log_event(event_info=event_info)
+                    dumps.assert_not_called()
+                self.assertEqual(2, len(calls))
+                self.assertEqual(written, out.getvalue())
+
+    def test_mdal_logger_event_info_is_carried_on_the_record(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_mdal_logger("testlogger21")
+                records = []
+                handler = logging.Handler()
+                handler.emit = records.append
+                logger.logger.addHandler(handler)
+                try:
+                    logger.log_event(event_info={"name": "eventA"})
+                    with logger.batch() as batch:
+                        batch.log_events([{"name": "eventB"}, {"name": "eventC"}])
+                finally:
+                    logger.logger.removeHandler(handler)
+
+                self.assertEqual(["Event recorded"] * 3, [record.msg for record in records])
+                self.assertEqual([()] * 3, [record.args for record in records])
+                self.assertEqual(['Event recorded {"name": "eventA"}', 'Event recorded {"name": "eventB"}',
+                                  'Event recorded {"name": "eventC"}'], [record.getMessage() for record in records])
+
+    def test_mdal_logger_lazy_event_info_Json_format(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                os.environ['WHI_CAF_LOGGING_DEFAULT_FORMAT'] = 'Json'
+                importlib.reload(caflogger)
+                del os.environ['WHI_CAF_LOGGING_DEFAULT_FORMAT']
+                logger = caflogger.get_mdal_logger("testlogger18")
+                logger.log_event(event_info=lambda: {"name": "eventA"})
+                record = json.loads(out.getvalue().strip().splitlines()[-1])
+                self.assertEqual({"name": "eventA"}, record['event'])
+
+    def test_mdal_logger_bounded_event_info(self):
+        limits = {'WHI_CAF_LOGGING_EVENT_MAX_STRING_LENGTH': '4', 'WHI_CAF_LOGGING_EVENT_MAX_KEYS': '2'}
+        for json_format in (False, True):
+            with StringIO() as out, redirect_stdout(out), mock.patch.dict(os.environ, limits):
+                importlib.reload(caflogger)
+                caflogger.configure(json_format=json_format)
+                logger = caflogger.get_mdal_logger("testlogger20")
+                logger.log_event(event_info={"name": "eventA", "items": [1, 2, 3], "status": "started"})
+                logger.log_event(event_info=lambda: {"name": "eventB"})
+                lines = out.getvalue().strip().splitlines()[-2:]
+                if json_format:
+                    events = [json.loads(line)['event'] for line in lines]
+                else:
+                    events = [json.loads(line.split("Event recorded ", 1)[1]) for line in lines]
+                self.assertEqual([{"name": "even...[truncated: 2 more characters]",
+                                   "items": [1, 2, "[truncated: 1 more items]"], "[truncated]": "1 more keys"},
+                                  {"name": "even...[truncated: 2 more characters]"}], events)
+        caflogger.configure(json_format=False)
+
+    def test_logger_lazy_args(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_logger("testlogger19")
+                calls = []
+
+                def argument():
+                    calls.append(1)
+                    return "computed"
+
+                logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, argument)
+                logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, str)
+                logging.getLogger("WHI").handlers[0].setLevel(logging.WARNING)
+                logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, argument)
+                self.assertEqual(1, len(calls))
+                self.assertEqual([
+                    "MainThread] [INFO] [WHI.testlogger19] - [] - CAFLOGTEST001: Logging a test message "
+                    "with arguments: computed",
+                    "MainThread] [INFO] [WHI.testlogger19] - [] - CAFLOGTEST001: Logging a test message "
+                    "with arguments: <class 'str'>",
+                ], _without_timestamps("\n".join(out.getvalue().splitlines()[-2:])))
+
+    def test_logger_metrics(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_logger("testlogger13")
+                internal_errors = metrics.snapshot()['internal_errors']
+
+                logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg1")
+                logger.info("not a message tuple")
+
+                snapshot = metrics.snapshot()
+                whi_handler = snapshot['handlers']["whiConsoleHandler"]
+                self.assertEqual(1, whi_handler['records']["CAFLOGTEST001"]["INFO"])
+                self.assertEqual(1, whi_handler['records']["CAFLOG001"]["ERROR"])
+                self.assertEqual(len(out.getvalue().split("\n", 1)[1]), whi_handler['bytes'])
+                self.assertEqual(internal_errors + 1, snapshot['internal_errors'])
+
+    def test_logger_async_mode(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                os.environ['WHI_CAF_LOGGING_ASYNC'] = 'true'
+                importlib.reload(caflogger)
+                logger = caflogger.get_logger("testlogger9")
+                del os.environ['WHI_CAF_LOGGING_ASYNC']
+                queue_handler = logger.logger.parent.handlers[0]
+                self.assertIsInstance(queue_handler, logging_handler.CAFQueueHandler)
+
+                logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg1")
+                queue_handler.flush()
+                output = out.getvalue().strip()
+                self.assertTrue(
+                    "[MainThread] [INFO] [WHI.testlogger9] - [] - CAFLOGTEST001: Logging a test message "
+                    "with arguments: arg1" in output)
+                queue_handler.close()
+
+    def test_logger_sampling(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                logger = caflogger.get_logger("testlogger11")
+                mdal_logger = caflogger.get_mdal_logger("testlogger11")
+                sampling.set_rules(ratios={"CAFLOGTEST001": 0.5, "MDALEVENT": 0.0})
+                try:
+                    for i in range(4):
+                        logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, i)
+                    mdal_logger.log_event(event_info={"name": "eventA"})
+                    mdal_logger.log_events([{"name": "eventB"}])
+                    sampling.flush_summary()
+                finally:
+                    sampling.clear_rules()
+
+                output = out.getvalue()
+                self.assertTrue("Logging a test message with arguments: 0" in output)
+                self.assertFalse("Logging a test message with arguments: 1" in output)
+                self.assertTrue("Logging a test message with arguments: 2" in output)
+                self.assertFalse("eventA" in output)
+                self.assertFalse("eventB" in output)
+                self.assertTrue("CAFLOG003: Suppressed 2 records with log_id CAFLOGTEST001" in output)
+                self.assertTrue("CAFLOG003: Suppressed 2 records with log_id MDALEVENT" in output)
+
+    def test_logger_dedup(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                os.environ['WHI_CAF_LOGGING_DEDUP_WINDOW'] = '60'
+                importlib.reload(caflogger)
+                logger = caflogger.get_logger("testlogger12")
+                del os.environ['WHI_CAF_LOGGING_DEDUP_WINDOW']
+                for _ in range(3):
+                    logger.error(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg1")
+                logger.error(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg2")
+                dedup.flush_all()
+
+                lines = _without_timestamps("\n".join(
+                    line for line in out.getvalue().splitlines() if "testlogger12" in line))
+                self.assertEqual([
+                    "MainThread] [ERROR] [WHI.testlogger12] - [] - CAFLOGTEST001: Logging a test message "
+                    "with arguments: arg1",
+                    "MainThread] [ERROR] [WHI.testlogger12] - [] - CAFLOGTEST001: Logging a test message "
+                    "with arguments: arg2",
+                    "MainThread] [ERROR] [WHI.testlogger12] - [] - CAFLOG004: Message [Logging a test message with "
+                    "arguments: arg1] with log_id CAFLOGTEST001 repeated 2 more times in the last 0 seconds",
+                ], lines)
+
+    def _fastest_run(self, script, env):
+        # the first run compiles the modules into the cache directory, the fastest of the others is compared
+        timings = []
+        for _ in range(4):
+            result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env)
+            self.assertEqual(0, result.returncode, result.stderr)
+            output = result.stdout.strip().splitlines()
+            self.assertEqual(1, len(output), output)
+            timings.append(float(output[0]))
+        return min(timings[1:])
+
+    def test_import_has_no_side_effects(self):
+        with tempfile.TemporaryDirectory() as cache_directory:
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path), PYTHONPYCACHEPREFIX=cache_directory)
+            env.pop('PYTHONDONTWRITEBYTECODE', None)
+            baseline = self._fastest_run(_IMPORT_BASELINE, env)
+            elapsed = self._fastest_run(_IMPORT_CHECK, env)
+        self.assertLess(elapsed, IMPORT_TIME_FACTOR * baseline)
+
+    def test_logger_initialized_on_first_use(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                self.assertFalse(caflogger._logger_initialized)
+                self.assertEqual("", out.getvalue())
+
+                logger = caflogger.get_logger("testlogger14")
+                self.assertTrue(caflogger._logger_initialized)
+                logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg1")
+                self.assertTrue("loading logging configuration from: " in out.getvalue())
+                self.assertTrue(
+                    "[MainThread] [INFO] [WHI.testlogger14] - [] - CAFLOGTEST001: Logging a test message "
+                    "with arguments: arg1" in out.getvalue())
+
+    def test_configure_with_dict_config(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                config = logging_config.default_config()
+                config['caf']['dedup_window'] = '60'
+                caflogger.configure(config=config)
+                logger = caflogger.get_logger("testlogger15")
+                logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg1")
+                logger.info(logging_codes.WHI_CAF_LOGGER_TEST_LOG_MESSAGE, "arg1")
+
+                output = out.getvalue()
+                self.assertFalse("loading logging configuration from: " in output)
+                self.assertEqual(1, output.count(
+                    "[MainThread] [INFO] [WHI.testlogger15] - [] - CAFLOGTEST001: Logging a test message "
+                    "with arguments: arg1"))
+
+    def test_configure_applies_caf_defaults(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                config = logging_config.default_config()
+                self.assertEqual({}, config['caf'])
+                config['caf']['event_max_keys'] = '5'
+                caflogger.configure(config=config)
+
+                self.assertEqual(5, payload.get_limits().max_keys)
+                self.assertEqual(int(logging_config.CAF_DEFAULTS['event_max_depth']), payload.get_limits().max_depth)
+                self.assertTrue(metrics.is_instrumented(logging.getLogger("WHI").handlers[0]))
+                caflogger.configure()
+                self.assertEqual(int(logging_config.CAF_DEFAULTS['event_max_keys']), payload.get_limits().max_keys)
+
+    def test_configure_with_dict_config_Json_format(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                caflogger.configure(config=logging_config.default_config(json_format=True), json_format=True)
+                logger = caflogger.get_mdal_logger("testlogger16")
+                logger.log_event(event_info={"name": "eventA"})
+                record = json.loads(out.getvalue().strip().splitlines()[-1])
+                caflogger.configure(json_format=False)
+
+                self.assertEqual({"name": "eventA"}, record['event'])
+                self.assertEqual("MDAL.testlogger16", record['logger_name'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import unittest
+
+import asynctest
+
+import caf_logger.logger as caflogger
+from caf_logger import logging_asyncio
+from caf_logger.mdal import corrid_store
+
+LOGGER_NAME = "asyncio_test"
+RECORDS = 400
+PAYLOAD = "x" * 1024
+TEST_MESSAGE = ("CAFLOGASYNC001", "record {} {}")
+
+
+class _SlowReader:
+    # drains the pipe at a fixed rate so that writes to a full pipe block
+    def __init__(self, read_fd, chunk_size=16384, pause=0.005):
+        self.data = bytearray()
+        self._read_fd = read_fd
+        self._chunk_size = chunk_size
+        self._pause = pause
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        while True:
+            chunk = os.read(self._read_fd, self._chunk_size)
+            if not chunk:
+                return
+            self.data += chunk
+            time.sleep(self._pause)
+
+    def lines(self):
+        self._thread.join(10)
+        return self.data.decode('utf-8').splitlines()
+
+
+async def _max_stall(log_records):
+    # the longest time the event loop could not run a task that wakes up every millisecond
+    stalls = []
+    done = False
+
+    async def tick():
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    ticker = asyncio.ensure_future(tick())
+    await asyncio.sleep(0.01)
+    await log_records()
+    done = True
+    await ticker
+    return max(stalls)
+
+
+class TestLoggingAsyncio(asynctest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        caflogger.configure()
+
+    def setUp(self):
+        read_fd, write_fd = os.pipe()
+        self.stream = os.fdopen(write_fd, 'w')
+        self.reader = _SlowReader(read_fd)
+        handler = logging.StreamHandler(self.stream)
+        handler.setFormatter(logging.Formatter("{corr_id} {message}", style='{'))
+        self.logger = caflogger.get_logger(LOGGER_NAME)
+        self.logger.logger.handlers = [handler]
+        self.logger.logger.propagate = False
+
+    def tearDown(self):
+        self.logger.logger.handlers = []
+        self.stream.close()
+
+    async def test_awaitable_logging_does_not_stall_the_loop(self):
+        async def log_synchronously():
+            for index in range(RECORDS):
+                self.logger.info(TEST_MESSAGE, index, PAYLOAD)
+
+        async def log_awaitable():
+            for index in range(RECORDS):
+                await self.logger.ainfo(TEST_MESSAGE, RECORDS + index, PAYLOAD)
+
+        sync_stall = await _max_stall(log_synchronously)
+        handlers = await logging_asyncio.start_asyncio_output(("WHI." + LOGGER_NAME,))
+        try:
+            self.assertEqual(1, len(handlers))
+            async_stall = await _max_stall(log_awaitable)
+        finally:
+            await logging_asyncio.stop_asyncio_output()
+        self.assertIsInstance(self.logger.logger.handlers[0], logging.StreamHandler)
+        self.stream.close()
+
+        self.assertLess(async_stall, sync_stall / 4)
+        expected = [" record {} {}".format(index, PAYLOAD) for index in range(2 * RECORDS)]
+        self.assertEqual(expected, self.reader.lines())
+
+    async def test_corr_ids_of_tasks_are_kept(self):
+        await logging_asyncio.start_asyncio_output(("WHI." + LOGGER_NAME,))
+
+        async def request(corr_id):
+            corrid_store.set_corr_id(corr_id)
+            for index in range(50):
+                await self.logger.ainfo(TEST_MESSAGE, corr_id, PAYLOAD)
+
+        try:
+            await asyncio.gather(request("cid1"), request("cid2"))
+        finally:
+            await logging_asyncio.stop_asyncio_output()
+        self.stream.close()
+
+        lines = self.reader.lines()
+        self.assertEqual(100, len(lines))
+        for line in lines:
+            corr_id, _, logged_corr_id, _ = line.split(" ")
+            self.assertEqual(corr_id, logged_corr_id)
+
+    async def test_records_of_other_threads_go_through_the_loop(self):
+        handler, = await logging_asyncio.start_asyncio_output(("WHI." + LOGGER_NAME,))
+        try:
+            thread = threading.Thread(target=self.logger.info, args=(TEST_MESSAGE, "thread", "payload"))
+            thread.start()
+            thread.join()
+            await asyncio.sleep(0.01)
+            await handler.drain()
+            self.logger.info(TEST_MESSAGE, "loop", "payload")
+        finally:
+            await logging_asyncio.stop_asyncio_output()
+        self.logger.info(TEST_MESSAGE, "stopped", "payload")
+        self.stream.close()
+        self.assertEqual([" record thread payload", " record loop payload", " record stopped payload"],
+                         self.reader.lines())
+
+    async def test_handlers_of_the_same_descriptor_share_the_transport(self):
+        other_logger = caflogger.get_logger(LOGGER_NAME + "_other")
+        other_handler = logging.StreamHandler(self.stream)
+        other_handler.setFormatter(self.logger.logger.handlers[0].formatter)
+        other_logger.logger.handlers = [other_handler]
+        other_logger.logger.propagate = False
+        handlers = await logging_asyncio.start_asyncio_output(("WHI." + LOGGER_NAME, "WHI." + LOGGER_NAME + "_other"))
+        try:
+            self.assertEqual(2, len(handlers))
+            self.assertIs(handlers[0]._pipe, handlers[1]._pipe)
+            self.assertEqual(2, handlers[0]._pipe.users)
+            for index in range(RECORDS):
+                await self.logger.ainfo(TEST_MESSAGE, 2 * index, PAYLOAD)
+                await other_logger.ainfo(TEST_MESSAGE, 2 * index + 1, PAYLOAD)
+        finally:
+            await logging_asyncio.stop_asyncio_output()
+            other_logger.logger.handlers = []
+        self.stream.close()
+
+        self.assertEqual({}, logging_asyncio._shared_pipes)
+        expected = [" record {} {}".format(index, PAYLOAD) for index in range(2 * RECORDS)]
+        self.assertEqual(expected, self.reader.lines())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import importlib
+import io
+import json
+import logging
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+import caf_logger.logger as caflogger
+from caf_logger import logging_binary
+from caf_logger import logging_config
+from caf_logger import metrics
+
+_EVENTS = [
+    {"name": "received", "size": 1024, "ratio": 0.25, "retries": -3, "ok": True, "failed": False, "missing": None},
+    {"name": "stored", "nested": {"ids": [1, 2, 3], "patient": "Zoë"}, "large": 2 ** 70},
+    {"name": "received", "size": 1024, "note": "x" * 200},
+]
+
+
+class TestLoggingBinary(unittest.TestCase):
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile(suffix='.bin', delete=False) as binary:
+            self.path = binary.name
+        os.remove(self.path)
+        self.addCleanup(lambda: os.path.exists(self.path) and os.remove(self.path))
+
+    def tearDown(self):
+        caflogger._logging_config_file = None
+        caflogger._logger_initialized = False
+
+    def _configure(self):
+        config = logging_config.default_config(json_format=True)
+        config['handlers']['mdalBinaryHandler'] = {'class': 'caf_logger.logging_binary.CAFBinaryFileHandler',
+                                                   'filename': self.path, 'formatter': 'mdalFormatter'}
+        config['loggers']['MDAL']['handlers'].append('mdalBinaryHandler')
+        caflogger.configure(config=config, json_format=True)
+
+    def _read(self):
+        with open(self.path, 'rb') as binary:
+            return list(logging_binary.read_records(binary))
+
+    def test_decoded_records_match_json_output(self):
+        with StringIO() as out:
+            with redirect_stdout(out):
+                importlib.reload(caflogger)
+                self._configure()
+                logger = caflogger.get_mdal_logger("binarytest")
+                logger.add_global_attribute("site", "lab")
+                for event in _EVENTS:
+                    logger.log_event(event_info=event)
+                for handler in logging.getLogger("MDAL").handlers:
+                    if handler.get_name() == 'mdalBinaryHandler':
+                        handler.close()
+                json_lines = out.getvalue().strip().splitlines()
+
+        records = self._read()
+        self.assertEqual(len(_EVENTS), len(records))
+        self.assertEqual([json.loads(line) for line in json_lines], records)
+        self.assertEqual(json_lines, [logging_binary.jsonlogger.JsonEncoder().encode(record) for record in records])
+        self.assertEqual(_EVENTS[1], records[1]['event'])
+        self.assertLess(os.path.getsize(self.path), sum(len(line) + 1 for line in json_lines))
+
+    def test_appended_stream_starts_a_new_dictionary(self):
+        for session in range(2):
+            handler = logging_binary.CAFBinaryFileHandler(self.path)
+            for index in range(3):
+                handler.handle(logging.makeLogRecord({'msg': "session {} record {}".format(session, index),
+                                                      'name': "MDAL.binarytest", 'corr_id': "abc"}))
+            handler.close()
+        messages = [record['message'] for record in self._read()]
+        self.assertEqual(["session {} record {}".format(session, index) for session in range(2) for index in range(3)],
+                         messages)
+
+    def test_dictionary_is_reset_when_full(self):
+        encoder = logging_binary.Encoder(max_strings=4)
+        decoder = logging_binary.Decoder()
+        records = [{"key{}".format(index % 7): "value{}".format(index % 5)} for index in range(50)]
+        frames = [encoder.encode(record) for record in records]
+        self.assertEqual(records, [decoder.decode(frame[4:]) for frame in frames])
+
+    def test_failed_write_leaves_the_dictionary_unchanged(self):
+        handler = logging_binary.CAFBinaryFileHandler(self.path)
+        handler.handleError = lambda record: None
+        stats = metrics.instrument_handler(handler)
+        stream = handler.stream
+        handler.handle(logging.makeLogRecord({'msg': "written", 'name': "MDAL.binarytest", 'corr_id': "abc"}))
+
+        def failed_write(data):
+            raise OSError("No space left on device")
+
+        handler.stream.write = failed_write
+        handler.handle(logging.makeLogRecord({'msg': "lost", 'name': "MDAL.binarytest", 'corr_id': "def",
+                                              'site': "lab"}))
+        del stream.write
+        handler.handle(logging.makeLogRecord({'msg': "written again", 'name': "MDAL.binarytest", 'corr_id': "def",
+                                              'site': "lab"}))
+        handler.close()
+        self.assertEqual(["written", "written again"], [record['message'] for record in self._read()])
+        self.assertEqual(os.path.getsize(self.path) - len(logging_binary.MAGIC), handler.bytes_written)
+        self.assertEqual(handler.bytes_written, stats.output_size)
+
+    def test_invalid_stream(self):
+        with self.assertRaises(logging_binary.BinaryFormatError):
+            list(logging_binary.read_records(io.BytesIO(b'{"message": "json"}\n')))
+        frame = logging_binary.Encoder().encode({"message": "truncated"})
+        with self.assertRaises(logging_binary.BinaryFormatError):
+            list(logging_binary.read_records(io.BytesIO(logging_binary.MAGIC + frame[:-2])))
+
+    def test_cli_writes_json_lines(self):
+        handler = logging_binary.CAFBinaryFileHandler(self.path)
+        handler.handle(logging.makeLogRecord({'msg': "converted", 'name': "MDAL.binarytest"}))
+        handler.close()
+        output = self.path + '.json'
+        self.addCleanup(os.remove, output)
+        logging_binary.main([self.path, '-o', output])
+        with open(output) as converted:
+            lines = converted.read().splitlines()
+        self.assertEqual(1, len(lines))
+        self.assertEqual("converted", json.loads(lines[0])['message'])
+        self.assertEqual("MDAL.binarytest", json.loads(lines[0])['logger_name'])
+
+
+if __name__ == '__main__':
+    unittest.main()
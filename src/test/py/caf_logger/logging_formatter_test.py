@@ -0,0 +1,95 @@
+import json
+import logging
+import platform
+import sys
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from pythonjsonlogger import jsonlogger
+
+from caf_logger import logging_formatter
+from logging_helpers import make_record
+
+_FORMAT = "%(message)%(levelname)%(name)%(asctime)%(threadName)"
+_DATEFMT = "%Y-%m-%dT%H:%M:%SZ"
+_NAME = "MDAL.formatter_test"
+
+
+class _ReferenceFormatter(jsonlogger.JsonFormatter):
+    # the formatter as it was before the rewrite, kept to check the output did not change
+
+    def process_log_record(self, log_record):
+        log_record['HOSTNAME'] = platform.node()
+        for k, v in logging_formatter._ATTR_MAP.items():
+            if k in log_record:
+                log_record[v] = log_record.pop(k)
+        return jsonlogger.JsonFormatter.process_log_record(self, log_record)
+
+
+class TestCAFJsonFormatter(unittest.TestCase):
+
+    def setUp(self):
+        self.reference = _ReferenceFormatter(_FORMAT, _DATEFMT)
+        self.formatter = logging_formatter.CAFJsonFormatter(_FORMAT, _DATEFMT)
+
+    def _records(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            exc_info = sys.exc_info()
+        return [
+            make_record("Event recorded", name=_NAME, log_id='MDALEVENT', corr_id='cid1',
+                        event={'name': 'eventA', 'status': 'started'}, STUDY='1.2.3', **{'WHI-CONTEXT': 'ctx1|ctx2'}),
+            make_record("Logging a test message with arguments: %s", "arg1", name=_NAME, log_id='CAFLOGTEST001',
+                        corr_id='', security_level=1),
+            make_record("no extras", name=_NAME),
+            make_record("failed", name=_NAME, level=logging.ERROR, exc_info=exc_info, log_id='CAFLOG001',
+                        corr_id='cid2'),
+            make_record({'custom': 'dict message', 'name': 'renamed from the message'}, name=_NAME),
+        ]
+
+    def test_output_matches_previous_formatter(self):
+        for record in self._records():
+            self.assertEqual(self.reference.format(record), self.formatter.format(record))
+
+    def test_hostname_and_renamed_fields(self):
+        output = json.loads(self.formatter.format(self._records()[0]))
+        self.assertEqual(platform.node(), output['HOSTNAME'])
+        self.assertEqual('cid1', output['WHI-CORRID'])
+        self.assertEqual('INFO', output['level'])
+        self.assertEqual('MDAL.formatter_test', output['logger_name'])
+        self.assertFalse('corr_id' in output)
+        self.assertFalse('levelname' in output)
+
+    def test_timestamp_field(self):
+        now = mock.Mock(**{'utcnow.return_value': datetime(2020, 1, 2, 3, 4, 5, 678000)})
+        with mock.patch.object(jsonlogger, 'datetime', now), mock.patch.object(logging_formatter, 'datetime', now):
+            for timestamp in (True, 'logged_at'):
+                reference = _ReferenceFormatter(_FORMAT, _DATEFMT, timestamp=timestamp)
+                formatter = logging_formatter.CAFJsonFormatter(_FORMAT, _DATEFMT, timestamp=timestamp)
+                for record in self._records():
+                    self.assertEqual(reference.format(record), formatter.format(record))
+            output = json.loads(formatter.format(self._records()[0]))
+        self.assertEqual("2020-01-02T03:04:05.678000", output['logged_at'])
+
+    @unittest.skipIf(logging_formatter.orjson is None, "orjson is not installed")
+    def test_orjson_encoder_keeps_field_names(self):
+        formatter = logging_formatter.CAFJsonFormatter(_FORMAT, _DATEFMT,
+                                                       json_encoder_name=logging_formatter.JSON_ENCODER_ORJSON)
+        for record in self._records():
+            expected = json.loads(self.reference.format(record))
+            output = json.loads(formatter.format(record))
+            self.assertEqual(list(expected.keys()), list(output.keys()))
+            self.assertEqual(expected, output)
+
+    @unittest.skipIf(logging_formatter.orjson is None, "orjson is not installed")
+    def test_orjson_encoder_falls_back_for_unsupported_values(self):
+        formatter = logging_formatter.CAFJsonFormatter(_FORMAT, _DATEFMT,
+                                                       json_encoder_name=logging_formatter.JSON_ENCODER_ORJSON)
+        record = make_record("Event recorded", name=_NAME, event={1: 'integer key', 'big': 2 ** 70})
+        self.assertEqual(self.reference.format(record), formatter.format(record))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+import gzip
+import logging
+import logging.config
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from caf_logger import logging_handler
+from logging_helpers import CountingStream, make_record
+
+
+class _BlockingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.unblock = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.started.set()
+        self.unblock.wait(5)
+        self.records.append(record.getMessage())
+
+
+_BUFFERED_CONFIG = """
+[loggers]
+keys=root
+
+[handlers]
+keys=bufferedHandler
+
+[formatters]
+keys=plain
+
+[logger_root]
+level=INFO
+handlers=bufferedHandler
+
+[handler_bufferedHandler]
+class=caf_logger.logging_handler.CAFBufferedStreamHandler
+level=INFO
+formatter=plain
+args=(sys.stdout, 4096, 0)
+
+[formatter_plain]
+format=%(message)s
+"""
+
+
+class TestQueueHandler(unittest.TestCase):
+
+    def _start_blocked(self, overflow_policy):
+        target = _BlockingHandler()
+        handler = logging_handler.CAFQueueHandler([target], queue_size=2, overflow_policy=overflow_policy)
+        handler.handle(make_record("in flight"))
+        self.assertTrue(target.started.wait(5))
+        return target, handler
+
+    def test_records_are_written_by_background_thread(self):
+        target = _BlockingHandler()
+        target.unblock.set()
+        handler = logging_handler.CAFQueueHandler([target])
+        for i in range(100):
+            handler.handle(make_record("message {}".format(i)))
+        handler.close()
+        self.assertEqual(["message {}".format(i) for i in range(100)], target.records)
+
+    def test_drop_newest_policy(self):
+        target, handler = self._start_blocked(logging_handler.OVERFLOW_DROP_NEWEST)
+        handler.handle(make_record("queued1"))
+        handler.handle(make_record("queued2"))
+        handler.handle(make_record("dropped", level=logging.ERROR))
+        target.unblock.set()
+        handler.close()
+        self.assertEqual(["in flight", "queued1", "queued2"], target.records)
+        self.assertEqual({"ERROR": 1}, handler.dropped)
+        self.assertEqual(1, handler.dropped_count())
+
+    def test_drop_lowest_policy(self):
+        target, handler = self._start_blocked(logging_handler.OVERFLOW_DROP_LOWEST)
+        handler.handle(make_record("warning", level=logging.WARNING))
+        handler.handle(make_record("info"))
+        handler.handle(make_record("error", level=logging.ERROR))
+        handler.handle(make_record("debug", level=logging.DEBUG))
+        target.unblock.set()
+        handler.close()
+        self.assertEqual(["in flight", "warning", "error"], target.records)
+        self.assertEqual({"INFO": 1, "DEBUG": 1}, handler.dropped)
+
+    def test_block_policy_waits_for_room(self):
+        target, handler = self._start_blocked(logging_handler.OVERFLOW_BLOCK)
+        handler.handle(make_record("queued1"))
+        handler.handle(make_record("queued2"))
+        producer = threading.Thread(target=handler.handle, args=(make_record("queued3"),))
+        producer.start()
+        producer.join(0.1)
+        self.assertTrue(producer.is_alive())
+        target.unblock.set()
+        producer.join(5)
+        handler.close()
+        self.assertEqual(["in flight", "queued1", "queued2", "queued3"], target.records)
+        self.assertEqual(0, handler.dropped_count())
+
+    def test_install_replaces_logger_handlers(self):
+        logger = logging.getLogger("WHI.queue_handler_test")
+        target = _BlockingHandler()
+        target.unblock.set()
+        logger.addHandler(target)
+        queue_handler = logging_handler.install_queue_handler(logger)
+        try:
+            self.assertEqual([queue_handler], logger.handlers)
+            logger.warning("routed through the queue")
+            queue_handler.flush()
+            self.assertEqual(["routed through the queue"], target.records)
+        finally:
+            logger.removeHandler(queue_handler)
+            queue_handler.close()
+
+    def test_invalid_overflow_policy(self):
+        with self.assertRaises(ValueError):
+            logging_handler.CAFQueueHandler([], overflow_policy="unknown")
+
+
+class TestBufferedStreamHandler(unittest.TestCase):
+
+    def _handler(self, **kwargs):
+        stream = CountingStream()
+        handler = logging_handler.CAFBufferedStreamHandler(stream, **kwargs)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.addCleanup(handler.close)
+        return stream, handler
+
+    def test_flushes_when_buffer_is_full(self):
+        stream, handler = self._handler(buffer_size=20, flush_interval=0)
+        handler.handle(make_record("message1"))
+        handler.handle(make_record("message2"))
+        self.assertEqual("", stream.getvalue())
+        handler.handle(make_record("message3"))
+        self.assertEqual("message1\nmessage2\nmessage3\n", stream.getvalue())
+        self.assertEqual(1, stream.writes)
+
+    def test_error_record_flushes_immediately(self):
+        stream, handler = self._handler(flush_interval=0)
+        handler.handle(make_record("info"))
+        self.assertEqual("", stream.getvalue())
+        handler.handle(make_record("error", level=logging.ERROR))
+        self.assertEqual("info\nerror\n", stream.getvalue())
+
+    def test_flushes_after_interval(self):
+        stream, handler = self._handler(flush_interval=0.05)
+        handler.handle(make_record("buffered"))
+        for _ in range(100):
+            if stream.getvalue():
+                break
+            threading.Event().wait(0.05)
+        self.assertEqual("buffered\n", stream.getvalue())
+
+    def test_close_writes_remaining_records(self):
+        stream, handler = self._handler(flush_interval=0)
+        logging_handler.handle_batch(handler, [make_record("batch1"), make_record("batch2")])
+        self.assertEqual("", stream.getvalue())
+        handler.close()
+        self.assertEqual("batch1\nbatch2\n", stream.getvalue())
+        self.assertEqual(1, stream.writes)
+
+    def test_usable_from_file_config(self):
+        root = logging.getLogger()
+        saved_handlers, saved_level = root.handlers[:], root.level
+        with tempfile.NamedTemporaryFile('w', suffix='.conf', delete=False) as config:
+            config.write(_BUFFERED_CONFIG)
+        self.addCleanup(os.remove, config.name)
+        try:
+            logging.config.fileConfig(config.name, disable_existing_loggers=False)
+            handler = root.handlers[0]
+            self.assertIsInstance(handler, logging_handler.CAFBufferedStreamHandler)
+            self.assertEqual(4096, handler.buffer_size)
+            self.assertEqual(0, handler.flush_interval)
+            handler.close()
+        finally:
+            root.handlers = saved_handlers
+            root.setLevel(saved_level)
+
+
+class TestRotatingFileHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "caf.log")
+
+    def _handler(self, **kwargs):
+        handler = logging_handler.CAFRotatingFileHandler(self.path, **kwargs)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.addCleanup(handler.close)
+        return handler
+
+    def _segment_lines(self, handler):
+        lines = []
+        for segment in handler.rotated_segments():
+            with (gzip.open(segment, 'rt') if segment.endswith(".gz") else open(segment)) as content:
+                lines.extend(content.read().splitlines())
+        return lines
+
+    def test_size_rollover_keeps_backup_count_compressed_segments(self):
+        handler = self._handler(max_bytes=100, backup_count=2)
+        for index in range(30):
+            handler.handle(make_record("message {:02d}".format(index)))
+        handler.wait_for_segments()
+        segments = handler.rotated_segments()
+        self.assertEqual(2, len(segments))
+        self.assertTrue(all(segment.endswith(".gz") for segment in segments))
+        with open(self.path) as current:
+            current_lines = current.read().splitlines()
+        self.assertLessEqual(os.path.getsize(self.path), 100)
+        lines = self._segment_lines(handler) + current_lines
+        self.assertEqual(["message {:02d}".format(index) for index in range(30 - len(lines), 30)], lines)
+
+    def test_time_rollover(self):
+        handler = self._handler(interval=60, compress=False)
+        handler.handle(make_record("before"))
+        later = make_record("after")
+        later.created = time.time() + 61
+        logging_handler.handle_batch(handler, [later])
+        handler.wait_for_segments()
+        self.assertEqual(["before"], self._segment_lines(handler))
+        with open(self.path) as current:
+            self.assertEqual("after\n", current.read())
+
+    def test_compression_runs_on_background_thread(self):
+        threads = []
+        compress_segment = logging_handler._compress_segment
+
+        def compress(segment):
+            threads.append(threading.current_thread().name)
+            return compress_segment(segment)
+
+        with open(self.path + ".20200101-000000-000000", 'w') as leftover:
+            leftover.write("left by an earlier process\n")
+        handler = self._handler(max_bytes=10)
+        with mock.patch.object(logging_handler, '_compress_segment', compress):
+            handler.handle(make_record("first record"))
+            handler.handle(make_record("second record"))
+            handler.wait_for_segments()
+        self.assertEqual(["CAFSegmentWorker", "CAFSegmentWorker"], threads)
+        self.assertEqual(["left by an earlier process", "first record"], self._segment_lines(handler))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import logging
+from io import StringIO
+
+
+class RecordingHandler(logging.Handler):
+    # keeps the records it handles
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class CountingStream(StringIO):
+    # counts the write calls, records written as a batch take a single one
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super().write(s)
+
+
+def make_record(msg, *args, name="WHI.test", level=logging.INFO, exc_info=None, **attributes):
+    # a record of the installed record factory, the attributes are set like the extra of a logging call
+    record = logging.getLogRecordFactory()(name, level, __file__, 1, msg, args, exc_info)
+    for key, value in attributes.items():
+        setattr(record, key, value)
+    return record
@@ -0,0 +1,59 @@
+import asyncio
+import json
+import unittest
+
+import asynctest
+from aiohttp import web, test_utils
+
+from caf_logger.mdal import client
+from caf_logger.mdal import constants
+from caf_logger.mdal import corrid_store
+
+
+async def _echo_correlation_header(request):
+    return web.json_response({'header': request.headers.get(constants.CORRID_HEADER_NAME)})
+
+
+class TestCorrelationClient(asynctest.TestCase):
+
+    async def _received_header(self, session, server, **kwargs):
+        async with session.get(server.make_url('/'), **kwargs) as resp:
+            return (await resp.json())['header']
+
+    async def test_session_sends_correlation_header(self):
+        app = web.Application()
+        app.router.add_route('GET', '/', _echo_correlation_header)
+        async with test_utils.TestServer(app) as server, client.client_session() as session:
+            corrid_store.set_headers(["corrid:cid1,attr:STUDY:1.2.3"])
+            received = await self._received_header(session, server)
+            self.assertEqual(["corrid:cid1", "attr:STUDY:1.2.3"], json.loads(received))
+
+            corrid_store.set_attr("ORDER", "4.5.6")
+            received = await self._received_header(session, server)
+            self.assertEqual(["corrid:cid1", "attr:STUDY:1.2.3", "attr:ORDER:4.5.6"], json.loads(received))
+
+            received = await self._received_header(session, server,
+                                                   headers={constants.CORRID_HEADER_NAME: "corrid:explicit"})
+            self.assertEqual("corrid:explicit", received)
+
+    async def test_concurrent_requests_send_their_own_context(self):
+        app = web.Application()
+        app.router.add_route('GET', '/', _echo_correlation_header)
+        async with test_utils.TestServer(app) as server, client.client_session() as session:
+            async def request(corr_id):
+                corrid_store.set_headers(["corrid:" + corr_id])
+                return json.loads(await self._received_header(session, server))
+
+            received = await asyncio.gather(request("cid1"), request("cid2"))
+            self.assertEqual([["corrid:cid1"], ["corrid:cid2"]], received)
+
+    def test_header_value_is_cached_until_the_context_changes(self):
+        corrid_store.set_headers(["corrid:cid1,attr:STUDY:1.2.3"])
+        value = corrid_store.get_headers_value()
+        self.assertIs(value, corrid_store.get_headers_value())
+        corrid_store.set_attr("ORDER", "4.5.6")
+        self.assertIsNot(value, corrid_store.get_headers_value())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import concurrent.futures
+import pickle
+import unittest
+
+import asynctest
+
+from caf_logger.mdal import corrid_store
+from caf_logger.mdal import executor
+
+
+def _caf_context():
+    return corrid_store.get_rendered_corr_id(), corrid_store.get_attrs(), corrid_store.get_current_context()
+
+
+def _set_request_context(corr_id):
+    corrid_store.set_headers(["corrid:{},attr:STUDY:1.2.3".format(corr_id)])
+    corrid_store.add_context("study")
+    corrid_store.add_context("series")
+
+
+def _expected_context(corr_id):
+    return "{}/study|series".format(corr_id), ["STUDY:1.2.3"], ["study", "series"]
+
+
+def _modify_context():
+    corrid_store.set_corr_id("changed")
+    corrid_store.add_context("changed")
+    return _caf_context()
+
+
+class TestContextSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        corrid_store.clean()
+
+    def test_restore_applies_a_snapshot(self):
+        _set_request_context("cid1")
+        context_snapshot = corrid_store.snapshot()
+        corrid_store.clean()
+        self.assertEqual(("", [], []), _caf_context())
+        corrid_store.restore(context_snapshot)
+        self.assertEqual(_expected_context("cid1"), _caf_context())
+
+    def test_snapshot_is_picklable(self):
+        _set_request_context("cid1")
+        context_snapshot = pickle.loads(pickle.dumps(corrid_store.snapshot()))
+        corrid_store.clean()
+        corrid_store.restore(context_snapshot)
+        self.assertEqual(_expected_context("cid1"), _caf_context())
+
+    def test_context_call_does_not_leak_into_the_caller(self):
+        _set_request_context("cid1")
+        call = executor.with_context(_modify_context)
+        corrid_store.set_headers(["corrid:cid2"])
+        self.assertEqual(("changed/study|series|changed", ["STUDY:1.2.3"], ["study", "series", "changed"]), call())
+        self.assertEqual(("cid2", [], []), _caf_context())
+
+
+class TestThreadPoolExecutor(unittest.TestCase):
+
+    def setUp(self):
+        corrid_store.clean()
+
+    def test_tasks_run_in_the_context_of_the_submitter(self):
+        with executor.CAFThreadPoolExecutor(max_workers=1) as pool:
+            _set_request_context("cid1")
+            first = pool.submit(_caf_context)
+            modified = pool.submit(_modify_context)
+            _set_request_context("cid2")
+            second = pool.submit(_caf_context)
+            mapped = list(pool.map(lambda _: _caf_context(), range(2)))
+        self.assertEqual(_expected_context("cid1"), first.result())
+        self.assertEqual("changed/study|series|changed", modified.result()[0])
+        self.assertEqual(_expected_context("cid2"), second.result())
+        self.assertEqual([_expected_context("cid2")] * 2, mapped)
+
+    def test_plain_executor_does_not_propagate_the_context(self):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            _set_request_context("cid1")
+            self.assertEqual(("", [], []), pool.submit(_caf_context).result())
+            self.assertEqual(_expected_context("cid1"),
+                             pool.submit(executor.with_context(_caf_context)).result())
+
+
+class TestProcessPoolExecutor(unittest.TestCase):
+
+    def setUp(self):
+        corrid_store.clean()
+
+    def test_tasks_run_in_the_context_of_the_submitter(self):
+        # library functions only, the worker processes import them by name
+        with executor.CAFProcessPoolExecutor(max_workers=1) as pool:
+            _set_request_context("cid1")
+            first = pool.submit(corrid_store.get_rendered_corr_id)
+            _set_request_context("cid2")
+            second = pool.submit(corrid_store.get_headers)
+        self.assertEqual("cid1/study|series", first.result())
+        self.assertEqual(["corrid:cid2", "attr:STUDY:1.2.3"], second.result())
+
+    def test_tasks_see_the_context_stack(self):
+        with executor.CAFProcessPoolExecutor(max_workers=1) as pool:
+            _set_request_context("cid1")
+            self.assertEqual(["study", "series"], pool.submit(corrid_store.get_current_context).result())
+            self.assertEqual(["STUDY:1.2.3"], pool.submit(corrid_store.get_attrs).result())
+
+
+class TestRunInExecutor(asynctest.TestCase):
+
+    async def test_default_executor_keeps_the_context_of_the_task(self):
+        async def request(corr_id):
+            _set_request_context(corr_id)
+            await asyncio.sleep(0)
+            return await executor.run_in_executor(None, _caf_context)
+
+        received = await asyncio.gather(request("cid1"), request("cid2"))
+        self.assertEqual([_expected_context("cid1"), _expected_context("cid2")], received)
+
+    async def test_process_pool_keeps_the_context_of_the_task(self):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
+            corrid_store.set_headers(["corrid:cid1"])
+            received = await executor.run_in_executor(pool, corrid_store.get_rendered_corr_id)
+        self.assertEqual("cid1", received)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ import importlib
 import uuid
 from aiohttp import web, test_utils
 from caf_logger.mdal import constants
+from caf_logger.mdal import corrid_store
 import json
 import caf_logger.logger
 
@@ -27,3 +28,48 @@ class TestMiddleware(asynctest.TestCase):
         print(json.loads(resp.headers[constants.CORRID_HEADER_NAME])[0])
         assert constants.UUID_CORRID_LABEL+uuid_str == json.loads(resp.headers[constants.CORRID_HEADER_NAME])[0]
 
+    async def test_response_header_includes_attributes_added_by_handler(self):
+        async def func(request):
+            corrid_store.set_attr("STUDY", "1.2.3")
+            return web.Response(text="successful")
+
+        headers = {constants.CORRID_HEADER_NAME: "corrid:cid1,attr:ORDER:4.5.6"}
+        req = test_utils.make_mocked_request('GET', '/', headers)
+
+        resp = await middleware.read_write_mdal(req, func)
+        assert ["corrid:cid1", "attr:ORDER:4.5.6", "attr:STUDY:1.2.3"] == \
+            json.loads(resp.headers[constants.CORRID_HEADER_NAME])
+
+    async def test_response_without_correlation_header(self):
+        async def func(request):
+            return web.Response(text="successful")
+
+        req = test_utils.make_mocked_request('GET', '/', {})
+
+        resp = await middleware.read_write_mdal(req, func)
+        corr_ids = json.loads(resp.headers[constants.CORRID_HEADER_NAME])
+        assert 1 == len(corr_ids)
+        assert corr_ids[0].startswith(constants.UUID_CORRID_LABEL)
+
+    async def test_logging_metrics_route(self):
+        req = test_utils.make_mocked_request('GET', '/logging/metrics', {})
+
+        resp = await middleware.logging_metrics(req)
+        snapshot = json.loads(resp.text)
+        assert {'records', 'handlers', 'internal_errors', 'truncated_events', 'queues'} == set(snapshot)
+
+    async def test_logging_control_route(self):
+        app = web.Application()
+        app.router.add_route('*', '/logging/control', middleware.logging_control)
+        async with test_utils.TestClient(test_utils.TestServer(app)) as client:
+            resp = await client.put('/logging/control', json={'levels': {'MDAL': 'WARNING'}})
+            assert 200 == resp.status
+            assert 'WARNING' == (await resp.json())['levels']['MDAL']
+
+            resp = await client.get('/logging/control')
+            assert 'WARNING' == (await resp.json())['levels']['MDAL']
+
+            resp = await client.put('/logging/control', json={'levels': {'MDAL': 'LOUD'}})
+            assert 400 == resp.status
+            resp = await client.put('/logging/control', json={'unknown': {}})
+            assert 400 == resp.status
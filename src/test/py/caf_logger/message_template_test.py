@@ -0,0 +1,47 @@
+import unittest
+
+from caf_logger import message_template
+
+
+class TestMessageTemplate(unittest.TestCase):
+
+    def test_render_matches_str_format(self):
+        for template, args in [("Logging a test message with arguments: {}", ("arg1",)),
+                               ('[ attribute: {{"{}": "{}"}} ]', ("attr1", "value1")),
+                               ("{1} before {0}", ("a", "b")),
+                               ("{name} is {value!r:>8}", {'name': 'x', 'value': 1}),
+                               ("no fields {{escaped}}", ("unused",))]:
+            compiled = message_template.compile_template(template)
+            self.assertIsNone(compiled.check(args))
+            expected = template.format(**args) if isinstance(args, dict) else template.format(*args)
+            self.assertEqual(expected, compiled.render(args))
+
+    def test_arity(self):
+        self.assertEqual(2, message_template.compile_template('[ event: {{"name": "{}", "status": "{}"}}]').arity)
+        self.assertEqual(3, message_template.compile_template("{2}{0}").arity)
+        self.assertEqual(0, message_template.compile_template("constant").arity)
+        self.assertIsNone(message_template.compile_template("{:{}}").arity)
+
+    def test_errors_are_detected_at_compile_time(self):
+        self.assertEqual("template expects 2 arguments, got 1",
+                         message_template.compile_template("{} and {}").check(("a",)))
+        self.assertEqual("template expects named arguments",
+                         message_template.compile_template("{name}").check(("a",)))
+        self.assertIsNotNone(message_template.compile_template("{0} and {}").check(("a", "b")))
+        self.assertIsNotNone(message_template.compile_template("unbalanced }").check(("a",)))
+
+    def test_render_falls_back_for_invalid_templates(self):
+        self.assertEqual("{} and {} ('a',)", message_template.compile_template("{} and {}").render(("a",)))
+        self.assertEqual("{json: 1} {} ('a',)", message_template.compile_template("{json: 1} {}").render(("a",)))
+        self.assertEqual("apm {} {'k': 1}", message_template.compile_template("apm {}").render({'k': 1}))
+
+    def test_cache_is_bounded(self):
+        message_template.compile_template.cache_clear()
+        for i in range(message_template.TEMPLATE_CACHE_SIZE + 10):
+            message_template.compile_template("template {} " + str(i))
+        self.assertEqual(message_template.TEMPLATE_CACHE_SIZE, message_template.compile_template.cache_info().currsize)
+        self.assertIs(message_template.compile_template("{}"), message_template.compile_template("{}"))
+
+
+if __name__ == '__main__':
+    unittest.main()
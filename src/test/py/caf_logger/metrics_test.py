@@ -0,0 +1,75 @@
+import functools
+import logging
+import unittest
+from io import StringIO
+
+from caf_logger import logging_handler
+from caf_logger import metrics
+from logging_helpers import make_record
+
+_record = functools.partial(make_record, name="WHI.metrics_test")
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = StringIO()
+        self.handler = logging.StreamHandler(self.stream)
+        self.handler.set_name("metrics_test_handler")
+        self.stats = metrics.instrument_handler(self.handler)
+
+    def tearDown(self):
+        self.handler.close()
+
+    def test_records_bytes_and_latency(self):
+        self.handler.handle(_record("first", level=logging.INFO, log_id="CAFLOGTEST001"))
+        self.handler.handle(_record("second", level=logging.ERROR, log_id="CAFLOGTEST001"))
+        self.handler.handle(_record("café", level=logging.INFO))
+
+        snapshot = metrics.snapshot()['handlers']["metrics_test_handler"]
+        self.assertEqual({"CAFLOGTEST001": {"INFO": 1, "ERROR": 1}, "": {"INFO": 1}}, snapshot['records'])
+        self.assertEqual(len(self.stream.getvalue().encode('utf-8')), snapshot['bytes'])
+        self.assertEqual(3, snapshot['format_latency']['count'])
+        self.assertEqual(3, snapshot['emit_latency']['count'])
+        self.assertEqual(3, sum(snapshot['emit_latency']['buckets'].values()))
+
+    def test_batch_writes_are_counted(self):
+        logging_handler.handle_batch(self.handler, [_record("batch", level=logging.INFO, log_id="MDALEVENT")] * 3)
+        snapshot = metrics.snapshot()
+        self.assertEqual({"MDALEVENT": {"INFO": 3}}, snapshot['handlers']["metrics_test_handler"]['records'])
+        self.assertEqual(3, snapshot['records']["MDALEVENT"]["INFO"])
+        self.assertEqual(3, snapshot['handlers']["metrics_test_handler"]['emit_latency']['count'])
+        self.assertEqual(len(self.stream.getvalue()), snapshot['handlers']["metrics_test_handler"]['bytes'])
+
+    def test_batch_writes_of_handlers_with_handle_batch_are_timed(self):
+        stream = StringIO()
+        handler = logging_handler.CAFBufferedStreamHandler(stream)
+        handler.set_name("metrics_test_buffered")
+        metrics.instrument_handler(handler)
+        try:
+            logging_handler.handle_batch(handler, [_record("batch", level=logging.INFO, log_id="MDALEVENT")] * 4)
+            handler.flush()
+            snapshot = metrics.snapshot()['handlers']["metrics_test_buffered"]
+        finally:
+            handler.close()
+        self.assertEqual(4, snapshot['format_latency']['count'])
+        self.assertEqual(4, snapshot['emit_latency']['count'])
+        self.assertEqual(len(stream.getvalue()), snapshot['bytes'])
+
+    def test_instrumenting_twice_keeps_one_wrapper(self):
+        self.assertIs(self.stats, metrics.instrument_handler(self.handler))
+        self.handler.handle(_record("once", level=logging.INFO, log_id="CAFLOGTEST001"))
+        self.assertEqual({"CAFLOGTEST001": {"INFO": 1}}, self.stats.snapshot()['records'])
+
+    def test_queue_stats(self):
+        queue_handler = logging_handler.CAFQueueHandler([self.handler], queue_size=5)
+        queue_handler.set_name("metrics_test_queue")
+        try:
+            stats = metrics.snapshot()['queues']["metrics_test_queue"]
+            self.assertEqual({'depth': 0, 'capacity': 5, 'dropped': {}}, stats)
+        finally:
+            queue_handler.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
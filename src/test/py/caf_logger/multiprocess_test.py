@@ -0,0 +1,161 @@
+import contextlib
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from caf_logger import multiprocess
+
+WORKERS = 4
+RECORDS_PER_WORKER = 200
+PAYLOAD_SIZE = 8192
+
+_WORKER = """
+import sys
+import caf_logger.logger as caflogger
+worker = int(sys.argv[1])
+logger = caflogger.get_logger("multiprocess_test")
+for index in range({records}):
+    logger.info(("CAFLOGMP001", "worker {{}} record {{}} payload {{}}"), worker, index, str(worker) * {payload})
+""".format(records=RECORDS_PER_WORKER, payload=PAYLOAD_SIZE)
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _wait_for(path):
+    for _ in range(100):
+        if os.path.exists(path):
+            return
+        time.sleep(0.05)
+    raise AssertionError("{} was not created".format(path))
+
+
+class TestMultiprocess(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.address = os.path.join(directory, "collector.sock")
+        self.addCleanup(os.rmdir, directory)
+
+    def test_records_are_sent_to_the_collector(self):
+        received = logging.getLogger("multiprocess_test.received")
+        received.propagate = False
+        target = _ListHandler()
+        received.addHandler(target)
+        self.addCleanup(received.removeHandler, target)
+
+        collector = multiprocess.CAFRecordCollector(self.address)
+        thread = threading.Thread(target=collector.serve_forever)
+        thread.start()
+        handler = multiprocess.CAFSocketHandler(self.address)
+        try:
+            handler.handle(received.makeRecord(received.name, logging.INFO, __file__, 1, "rendered %s", ("here",),
+                                               None, extra={'log_id': "CAFLOGMP001"}))
+            try:
+                raise ValueError("sent")
+            except ValueError:
+                handler.handle(received.makeRecord(received.name, logging.ERROR, __file__, 2, "failed", (),
+                                                   sys.exc_info()))
+            handler.close()
+            for _ in range(100):
+                if len(target.records) == 2:
+                    break
+                time.sleep(0.05)
+        finally:
+            collector.stop()
+            thread.join()
+
+        self.assertEqual(2, len(target.records))
+        self.assertEqual("rendered here", target.records[0].getMessage())
+        self.assertEqual("CAFLOGMP001", target.records[0].log_id)
+        self.assertEqual(os.getpid(), target.records[0].process)
+        self.assertTrue("ValueError: sent" in target.records[1].exc_text)
+        self.assertFalse(os.path.exists(self.address))
+
+    def test_logging_does_not_block_without_a_collector(self):
+        logger = logging.getLogger("multiprocess_test.unreachable")
+        handler = multiprocess.CAFSocketHandler(self.address, batch_size=1, queue_size=2, connect_timeout=0.2,
+                                                put_timeout=0.05)
+        stderr = io.StringIO()
+        start = time.monotonic()
+        with contextlib.redirect_stderr(stderr):
+            for index in range(50):
+                handler.handle(logger.makeRecord(logger.name, logging.INFO, __file__, 1, "record %s", (index,), None))
+            elapsed = time.monotonic() - start
+            handler.close()
+        self.assertLess(elapsed, 2)
+        self.assertEqual(50, handler.dropped)
+        lines = stderr.getvalue().splitlines()
+        self.assertIn("record 49", lines)
+        self.assertEqual(50, len([line for line in lines if line.startswith("record ")])
+                         + sum(int(line.split(" ")[3]) for line in lines if line.startswith("Failed to send")))
+
+    def test_collector_socket_is_private_and_other_files_are_kept(self):
+        with open(self.address, 'w') as existing:
+            existing.write("not a socket")
+        with self.assertRaises(OSError):
+            multiprocess.CAFRecordCollector(self.address)
+        with open(self.address) as existing:
+            self.assertEqual("not a socket", existing.read())
+        os.remove(self.address)
+
+        # a socket left behind by a collector that was killed is replaced
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(self.address)
+        collector = multiprocess.CAFRecordCollector(self.address)
+        mode = os.stat(self.address).st_mode
+        self.assertTrue(stat.S_ISSOCK(mode))
+        self.assertEqual(0o600, stat.S_IMODE(mode))
+        collector.stop()
+        collector.serve_forever()
+        self.assertFalse(os.path.exists(self.address))
+
+    def test_worker_processes_write_whole_lines(self):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path), WHI_CAF_LOGGING_DEFAULT_FORMAT="Json")
+        # a file rather than a pipe nobody reads while the workers run, which would block the collector
+        output = tempfile.TemporaryFile('w+')
+        self.addCleanup(output.close)
+        collector = subprocess.Popen([sys.executable, "-m", "caf_logger.multiprocess", self.address],
+                                     stdout=output, stderr=subprocess.PIPE, text=True, env=env)
+        try:
+            _wait_for(self.address)
+            worker_env = dict(env, WHI_CAF_LOGGING_COLLECTOR_ADDRESS=self.address)
+            workers = [subprocess.Popen([sys.executable, "-c", _WORKER, str(worker)], stdout=subprocess.DEVNULL,
+                                        env=worker_env) for worker in range(WORKERS)]
+            for worker in workers:
+                self.assertEqual(0, worker.wait(60))
+        finally:
+            collector.send_signal(signal.SIGTERM)
+            _, errors = collector.communicate(timeout=60)
+        self.assertEqual(0, collector.returncode, errors)
+        output.seek(0)
+
+        received = {}
+        for line in output.read().splitlines():
+            if line.startswith("loading logging configuration from: "):
+                continue
+            record = json.loads(line)
+            worker, index, payload = record['message'].split(" ")[1::2]
+            self.assertEqual(worker * PAYLOAD_SIZE, payload)
+            received.setdefault(worker, []).append(int(index))
+        self.assertEqual({str(worker): list(range(RECORDS_PER_WORKER)) for worker in range(WORKERS)}, received)
+
+
+if __name__ == '__main__':
+    unittest.main()
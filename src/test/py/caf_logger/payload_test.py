@@ -0,0 +1,69 @@
+import json
+import unittest
+
+from caf_logger import payload
+
+
+class _CountingDict(dict):
+    # counts the items the encoder looked at
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.visited = 0
+
+    def items(self):
+        for item in super().items():
+            self.visited += 1
+            yield item
+
+
+class TestPayloadLimits(unittest.TestCase):
+
+    def test_payload_within_limits_is_not_copied(self):
+        event_info = {"name": "eventA", "items": [{"id": 1, "tags": ("a", "b")}, None, True, 1.5], "count": 3}
+        self.assertIs(event_info, payload.bound(event_info, payload.PayloadLimits(4, 4, 16, 1024)))
+
+    def test_strings_are_truncated(self):
+        event_info = {"name": "eventA", "text": "x" * 100}
+        truncated = payload.bound(event_info, payload.PayloadLimits(max_string_length=10))
+        self.assertEqual({"name": "eventA", "text": "x" * 10 + "...[truncated: 90 more characters]"}, truncated)
+        self.assertEqual("x" * 100, event_info["text"])
+
+    def test_keys_and_items_are_truncated(self):
+        event_info = {"keys": {str(i): i for i in range(5)}, "items": list(range(5))}
+        truncated = payload.bound(event_info, payload.PayloadLimits(max_keys=3))
+        self.assertEqual({"keys": {"0": 0, "1": 1, "2": 2, payload.TRUNCATED_KEY: "2 more keys"},
+                          "items": [0, 1, 2, "[truncated: 2 more items]"]}, truncated)
+
+    def test_nesting_is_truncated(self):
+        event_info = {"a": {"b": [{"c": 1}]}, "d": 2}
+        truncated = payload.bound(event_info, payload.PayloadLimits(max_depth=2))
+        self.assertEqual({"a": {"b": "[truncated: nested deeper than 2]"}, "d": 2}, truncated)
+
+    def test_size_limit_stops_the_walk(self):
+        event_info = {"resource": _CountingDict(("entry{}".format(i), "value" * 20) for i in range(10000))}
+        truncated = payload.bound(event_info, payload.PayloadLimits(max_size=1000))
+        encoded = json.dumps(truncated)
+        self.assertLess(len(encoded), 1100)
+        self.assertLess(event_info["resource"].visited, 20)
+        self.assertTrue(truncated["resource"][payload.TRUNCATED_KEY].endswith(" more keys"))
+
+    def test_last_string_is_cut_to_the_size_limit(self):
+        truncated = payload.bound(["x" * 2000], payload.PayloadLimits(max_size=100))
+        self.assertLess(len(json.dumps(truncated)), 150)
+
+    def test_truncated_events_are_counted(self):
+        truncated_events = payload.truncated_events()
+        payload.bound({"name": "eventA"}, payload.PayloadLimits(max_string_length=10))
+        self.assertEqual(truncated_events, payload.truncated_events())
+        payload.bound({"name": "x" * 11}, payload.PayloadLimits(max_string_length=10))
+        self.assertEqual(truncated_events + 1, payload.truncated_events())
+
+    def test_zero_is_unlimited(self):
+        event_info = {"text": "x" * 100000, "items": list(range(100000))}
+        self.assertIs(event_info, payload.bound(event_info, payload.PayloadLimits(0, 0, 0, 0)))
+        self.assertIs(event_info, payload.bound(event_info, payload.PayloadLimits(max_depth=2, max_keys=0,
+                                                                                  max_string_length=0, max_size=0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+import unittest
+from unittest import mock
+
+from caf_logger import sampling
+from logging_helpers import RecordingHandler
+
+
+class TestSampling(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.summary_logger = logging.getLogger(sampling.SUMMARY_LOGGER_NAME)
+        self.summary_logger.addHandler(self.handler)
+
+    def tearDown(self):
+        sampling.clear_rules()
+        self.summary_logger.removeHandler(self.handler)
+
+    def test_no_rules_allows_everything(self):
+        sampling.clear_rules()
+        self.assertTrue(all(sampling.allow("CAFLOGTEST001", logging.INFO) for _ in range(100)))
+
+    def test_ratio_per_log_id(self):
+        sampling.set_rules(ratios={"CAFLOGTEST001": 0.25})
+        allowed = [sampling.allow("CAFLOGTEST001", logging.INFO) for _ in range(8)]
+        self.assertEqual([True, False, False, False, True, False, False, False], allowed)
+        self.assertTrue(sampling.allow("CAFLOGTEST002", logging.INFO))
+        self.assertEqual({"CAFLOGTEST001": 6}, sampling.suppressed_counts())
+
+    def test_log_id_rule_takes_precedence_over_level_rule(self):
+        sampling.set_rules(ratios={"INFO": 0.0, "CAFLOGTEST001": 1.0})
+        self.assertTrue(sampling.allow("CAFLOGTEST001", logging.INFO))
+        self.assertFalse(sampling.allow("CAFLOGTEST002", logging.INFO))
+        self.assertTrue(sampling.allow("CAFLOGTEST002", logging.ERROR))
+
+    def test_rate_limit(self):
+        with mock.patch.object(sampling.time, 'monotonic', return_value=100.0) as monotonic:
+            sampling.set_rules(rate_limits={"CAFLOGTEST001": "2/3"})
+            self.assertEqual([True, True, True, False], [sampling.allow("CAFLOGTEST001", logging.INFO)
+                                                         for _ in range(4)])
+            monotonic.return_value = 101.0
+            self.assertEqual([True, True, False], [sampling.allow("CAFLOGTEST001", logging.INFO) for _ in range(3)])
+
+    def test_summary_reports_suppressed_records(self):
+        with mock.patch.object(sampling.time, 'monotonic', return_value=100.0) as monotonic:
+            sampling.set_rules(ratios={"CAFLOGTEST001": 0.0}, summary_interval=10)
+            for _ in range(5):
+                sampling.allow("CAFLOGTEST001", logging.INFO)
+            self.assertEqual([], self.handler.records)
+            monotonic.return_value = 110.0
+            sampling.allow("CAFLOGTEST001", logging.INFO)
+        self.assertEqual(1, len(self.handler.records))
+        record = self.handler.records[0]
+        self.assertEqual("CAFLOG003", record.log_id)
+        self.assertEqual((6, "CAFLOGTEST001", 10), record.args)
+        self.assertEqual({}, sampling.suppressed_counts())
+
+    def test_summary_is_reported_without_further_records(self):
+        sampling.set_rules(ratios={"CAFLOGTEST001": 0.0}, summary_interval=0.05)
+        for _ in range(3):
+            sampling.allow("CAFLOGTEST001", logging.INFO)
+        deadline = time.monotonic() + 5
+        while not self.handler.records and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(1, len(self.handler.records))
+        self.assertEqual((3, "CAFLOGTEST001"), self.handler.records[0].args[:2])
+        self.assertEqual(1, len([thread for thread in threading.enumerate() if thread.name == "CAFSamplingSummary"]))
+
+        sampling.clear_rules()
+        time.sleep(0.1)
+        self.assertEqual([], [thread for thread in threading.enumerate() if thread.name == "CAFSamplingSummary"])
+
+    def test_configure_from_caf_options(self):
+        sampling.configure({'sampling': 'CORRIDNOTPRESENT:0, WARNING:0.5', 'rate_limit': 'ERROR:10'})
+        self.assertFalse(sampling.allow("CORRIDNOTPRESENT", logging.INFO))
+        self.assertTrue(sampling.allow("CAFLOGTEST001", logging.INFO))
+        rules = sampling._rules
+        self.assertEqual(0.5, rules.by_level[logging.WARNING].ratio)
+        self.assertEqual(10, rules.by_level[logging.ERROR].burst)
+
+    def test_invalid_spec(self):
+        with self.assertRaises(ValueError):
+            sampling.parse_spec("CORRIDNOTPRESENT")
+        with self.assertRaises(ValueError):
+            sampling.set_rules(ratios={"CORRIDNOTPRESENT": 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import json
+import logging
+import sys
+import traceback
+import unittest
+from unittest import mock
+
+from caf_logger import tracebacks
+from caf_logger.logging_formatter import CAFFormatter, CAFJsonFormatter
+from logging_helpers import make_record
+
+
+def _fail(key):
+    try:
+        {}[key]
+    except KeyError:
+        return sys.exc_info()
+
+
+def _fail_other_line(key):
+    try:
+        [][key]
+    except IndexError:
+        return sys.exc_info()
+
+
+def _fail_chained(key):
+    try:
+        try:
+            {}[key]
+        except KeyError as error:
+            raise ValueError("lookup of {} failed".format(key)) from error
+    except ValueError:
+        return sys.exc_info()
+
+
+def _record(exc_info):
+    return make_record("failed", name="WHI.tracebacks_test", level=logging.ERROR, exc_info=exc_info)
+
+
+class TestTracebackCache(unittest.TestCase):
+
+    def setUp(self):
+        tracebacks.configure(cache_size=2, window=0)
+        tracebacks.get_cache().clear()
+        self.addCleanup(tracebacks.configure)
+
+    def test_cached_text_is_the_formatted_traceback(self):
+        formatter = CAFFormatter()
+        for exc_info in (_fail("a"), _fail("a"), _fail_chained("b"), _fail_chained("b")):
+            self.assertEqual("".join(traceback.format_exception(*exc_info)).rstrip("\n"),
+                             formatter.formatException(exc_info))
+        cache = tracebacks.get_cache()
+        self.assertEqual((2, 2), (cache.hits, cache.misses))
+
+    def test_messages_are_not_shared_between_exceptions_of_a_location(self):
+        formatter = CAFFormatter()
+        self.assertTrue(formatter.formatException(_fail("a")).endswith("KeyError: 'a'"))
+        self.assertTrue(formatter.formatException(_fail("b")).endswith("KeyError: 'b'"))
+
+    def test_cache_is_bounded(self):
+        formatter = CAFFormatter()
+        for key in range(5):
+            formatter.formatException(_fail(key))
+        self.assertEqual(2, len(tracebacks.get_cache()))
+
+    def test_fingerprint_depends_on_type_and_locations_only(self):
+        fingerprint = tracebacks.exception_fingerprint(_fail("a"))
+        self.assertEqual(fingerprint, tracebacks.exception_fingerprint(_fail("b")))
+        self.assertNotEqual(fingerprint, tracebacks.exception_fingerprint(_fail_other_line(1)))
+        self.assertNotEqual(fingerprint, tracebacks.exception_fingerprint(_fail_chained("a")))
+
+    def test_exceptions_that_cannot_be_converted_to_text_are_formatted(self):
+        class Unprintable(Exception):
+            def __str__(self):
+                raise RuntimeError("no text")
+
+        try:
+            raise Unprintable()
+        except Unprintable:
+            exc_info = sys.exc_info()
+        self.assertIn("Traceback (most recent call last)", CAFFormatter().formatException(exc_info))
+
+
+class TestTracebackWindow(unittest.TestCase):
+
+    def setUp(self):
+        tracebacks.configure(cache_size=16, window=60)
+        self.addCleanup(tracebacks.configure)
+        self.monotonic = mock.patch.object(tracebacks.time, 'monotonic', return_value=100.0).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_repeats_refer_to_the_first_traceback(self):
+        formatter = CAFFormatter("{message}", style='{')
+        fingerprint = tracebacks.exception_fingerprint(_fail("a"))
+        first = formatter.format(_record(_fail("a")))
+        self.assertIn("Traceback (most recent call last)", first)
+        self.assertTrue(first.endswith("Traceback fingerprint: {}".format(fingerprint)))
+
+        repeated = formatter.format(_record(_fail("b")))
+        self.assertEqual("failed\nKeyError: 'b'\nTraceback fingerprint: {} (repeated, the full traceback was logged "
+                         "before)".format(fingerprint), repeated)
+
+        self.assertIn("Traceback (most recent call last)", formatter.format(_record(_fail_other_line(1))))
+
+        self.monotonic.return_value = 160.0
+        self.assertIn("Traceback (most recent call last)", formatter.format(_record(_fail("c"))))
+
+    def test_window_is_kept_per_formatter(self):
+        exc_info = _fail("a")
+        CAFFormatter().formatException(exc_info)
+        self.assertIn("Traceback (most recent call last)", CAFFormatter().formatException(exc_info))
+
+    def test_json_formatter_refers_to_the_first_traceback(self):
+        formatter = CAFJsonFormatter()
+        first = json.loads(formatter.format(_record(_fail("a"))))
+        repeated = json.loads(formatter.format(_record(_fail("b"))))
+        self.assertIn("Traceback (most recent call last)", first['exc_info'])
+        self.assertTrue(repeated['exc_info'].startswith("KeyError: 'b'\nTraceback fingerprint: "))
+        self.assertLess(len(repeated['exc_info']), len(first['exc_info']))
+
+
+if __name__ == '__main__':
+    unittest.main()